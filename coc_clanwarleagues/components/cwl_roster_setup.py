@@ -569,7 +569,7 @@ class CWLRosterMenu(DefaultView):
                 ))
         
         clan_participants = [p.tag for p in self.all_participants if p.roster_clan_tag == self.clan.tag]
-        participants = [p async for p in self.coc_client.get_players(clan_participants)]
+        participants = [p async for p in self.coc_client.get_players(clan_participants,max_age=300)]
         _add_main_menu(participants)
     
     ##################################################
@@ -735,7 +735,7 @@ class CWLRosterMenu(DefaultView):
                 return league_player.league_group in self.group_filter
             return True
         
-        participants = [p async for p in self.coc_client.get_players([p.tag for p in self.all_participants])]
+        participants = [p async for p in self.coc_client.get_players([p.tag for p in self.all_participants],max_age=300)]
 
         all_participants = sorted(participants,key=lambda x:(x.town_hall.level,x.hero_strength),reverse=True)
         eligible_participants = sorted(
@@ -747,7 +747,7 @@ class CWLRosterMenu(DefaultView):
     async def autofill_participants(self,max_participants:int):
         eligible_participants = [p for p in self.all_participants if p.league_group <= CWLLeagueGroups.from_league_name(self.clan.league) and p.league_group < 99]
         
-        unrostered_players = [p async for p in self.coc_client.get_players([p.tag for p in eligible_participants if p.roster_clan_tag == None])]
+        unrostered_players = [p async for p in self.coc_client.get_players([p.tag for p in eligible_participants if p.roster_clan_tag == None],max_age=300)]
         unrostered_players.sort(key=lambda p:(p.town_hall.level,p.war_elo,p.hero_strength),reverse=True)
 
         a_iter = AsyncIter(unrostered_players)
@@ -780,7 +780,7 @@ class CWLRosterMenu(DefaultView):
             show_author=False,
             )
         
-        participants = [p async for p in self.coc_client.get_players([p.tag for p in self.all_participants if p.roster_clan_tag == self.clan.tag][:35])]
+        participants = [p async for p in self.coc_client.get_players([p.tag for p in self.all_participants if p.roster_clan_tag == self.clan.tag][:35],max_age=300)]
 
         a_participants = AsyncIter(participants)
         async for i,p in a_participants.enumerate(start=1):
@@ -920,10 +920,10 @@ class CWLRosterMenu(DefaultView):
         header_text += f"\n**Status:** {clan.status}"
         header_text += f"\n**League:** {EmojisLeagues.get(clan.league)}{clan.league}"
         if clan.status in ["CWL Started"]:
-            roster_players = [p async for p in GlobalClient.coc_client.get_players([p.tag for p in clan.master_roster])]
+            roster_players = [p async for p in GlobalClient.coc_client.get_players([p.tag for p in clan.master_roster],max_age=300)]
             header_text += f"\n\n**Participants:** {len([p for p in roster_players if p.clan.tag == clan.tag])} In Clan / {len([p for p in clan.master_roster])} in CWL"
         else:
-            roster_players = [p async for p in GlobalClient.coc_client.get_players([p.tag for p in clan.participants])]
+            roster_players = [p async for p in GlobalClient.coc_client.get_players([p.tag for p in clan.participants],max_age=300)]
             header_text += f"\n\n**Rostered:** {len([p for p in roster_players if p.clan.tag == clan.tag])} In Clan / {len([p for p in clan.participants])} Rostered"
 
         header_text += f"\n"
@@ -933,12 +933,12 @@ class CWLRosterMenu(DefaultView):
         header_text += f"{EmojisUI.LOGOUT}: this player is not in the in-game Clan.\n\n"
             
         if clan.status in ["CWL Started"]:
-            ref_members = [p async for p in GlobalClient.coc_client.get_players([p.tag for p in clan.master_roster])]
+            ref_members = [p async for p in GlobalClient.coc_client.get_players([p.tag for p in clan.master_roster],max_age=300)]
         else:
-            ref_members = [p async for p in GlobalClient.coc_client.get_players([p.tag for p in clan.participants])]
+            ref_members = [p async for p in GlobalClient.coc_client.get_players([p.tag for p in clan.participants],max_age=300)]
         
-            full_clan = await GlobalClient.coc_client.get_clan(clan.tag)                                               
-            async for mem in GlobalClient.coc_client.get_players([p.tag for p in full_clan.members]):
+            full_clan = await GlobalClient.coc_client.get_clan(clan.tag,max_age=300)                                               
+            async for mem in GlobalClient.coc_client.get_players([p.tag for p in full_clan.members],max_age=300):
                 if mem.tag not in [p.tag for p in ref_members]:
                     ref_members.append(mem)
 
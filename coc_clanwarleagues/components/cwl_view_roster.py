@@ -36,11 +36,15 @@ class CWLRosterDisplayMenu(MenuPaginator):
         self.waiting_for = False
         self.stop()
 
+    def _count_in_clan(self,roster:list) -> int:
+        roster_tags = set([p.tag for p in roster])
+        return len([p for p in self.reference_list if p.tag in roster_tags and getattr(p.clan,'tag',None) == self.league_clan.tag])
+
     async def start(self):
-        self.clan = await self.coc_client.get_clan(self.league_clan.tag)
+        self.clan = await self.coc_client.get_clan(self.league_clan.tag,max_age=300)
 
         if self.league_clan.status == 'CWL Started':            
-            self.reference_list = [p async for p in self.coc_client.get_players([p.tag for p in self.league_clan.master_roster])]
+            self.reference_list = [p async for p in self.coc_client.get_players([p.tag for p in self.league_clan.master_roster],max_age=300)]
             self.reference_list.sort(
                 key=lambda x:(x.town_hall.level,x.hero_strength),
                 reverse=True)
@@ -60,12 +64,12 @@ class CWLRosterDisplayMenu(MenuPaginator):
                     await self.ctx.reply(embed=embed,view=None)
                 return
             
-            self.reference_list = [p async for p in self.coc_client.get_players([p.tag for p in self.league_clan.participants])]
+            self.reference_list = [p async for p in self.coc_client.get_players([p.tag for p in self.league_clan.participants],max_age=300)]
             self.reference_list.sort(
                 key=lambda x:(x.town_hall.level,x.hero_strength),
                 reverse=True)
             
-            async for mem in self.coc_client.get_players([p.tag for p in self.clan.members]):
+            async for mem in self.coc_client.get_players([p.tag for p in self.clan.members],max_age=300):
                 if mem.tag not in [p.tag for p in self.reference_list]:
                     self.reference_list.append(mem)
         self.is_active = True
@@ -145,10 +149,10 @@ class CWLRosterDisplayMenu(MenuPaginator):
             header_text += f"\n**Status:** {self.league_clan.status}"
             header_text += f"\n**League:** {EmojisLeagues.get(self.league_clan.league)}{self.league_clan.league}"
             if self.league_clan.status in ["CWL Started"]:
-                header_text += f"\n**Participants:** {len([p async for p in self.coc_client.get_players([p.tag for p in self.league_clan.master_roster]) if getattr(p.clan,'tag',None) == self.league_clan.tag])} In Clan / {len(self.league_clan.master_roster)} in CWL"
+                header_text += f"\n**Participants:** {self._count_in_clan(self.league_clan.master_roster)} In Clan / {len(self.league_clan.master_roster)} in CWL"
                 header_text += f"\n*Only showing players in the in-game master roster.*"
             else:
-                header_text += f"\n**Rostered:** {len([p async for p in self.coc_client.get_players([p.tag for p in self.league_clan.participants]) if getattr(p.clan,'tag',None) == self.league_clan.tag])} In Clan / {len(self.league_clan.participants)} Rostered"
+                header_text += f"\n**Rostered:** {self._count_in_clan(self.league_clan.participants)} In Clan / {len(self.league_clan.participants)} Rostered"
 
             header_text += f"\n\n"
             header_text += (f"{EmojisUI.YES}: a Rostered CWL Player\n" if self.league_clan.status in ["Roster Finalized","Roster Pending"] else "")
@@ -199,10 +203,10 @@ class CWLRosterDisplayMenu(MenuPaginator):
             header_text += f"\n**Status:** {self.league_clan.status}"
             header_text += f"\n**League:** {EmojisLeagues.get(self.league_clan.league)}{self.league_clan.league}"
             if self.league_clan.status in ["CWL Started"]:
-                header_text += f"\n**Participants:** {len([p async for p in self.coc_client.get_players([p.tag for p in self.league_clan.master_roster]) if getattr(p.clan,'tag',None) == self.league_clan.tag])} In Clan / {len(self.league_clan.master_roster)} in CWL"
+                header_text += f"\n**Participants:** {self._count_in_clan(self.league_clan.master_roster)} In Clan / {len(self.league_clan.master_roster)} in CWL"
                 header_text += f"\n*Only showing players in the in-game master roster.*"
             else:
-                header_text += f"\n**Rostered:** {len([p async for p in self.coc_client.get_players([p.tag for p in self.league_clan.participants]) if getattr(p.clan,'tag',None) == self.league_clan.tag])} In Clan / {len(self.league_clan.participants)} Rostered"
+                header_text += f"\n**Rostered:** {self._count_in_clan(self.league_clan.participants)} In Clan / {len(self.league_clan.participants)} Rostered"
 
             header_text += f"\n\n"
             header_text += f"{EmojisUI.YES}: This player is rostered to play in CWL."
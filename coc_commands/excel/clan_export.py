@@ -115,7 +115,7 @@ class ClanExcelExport(GlobalClient):
             if stats.is_member and getattr(stats.home_clan,'tag','') != self.clan.tag:
                 continue
 
-            war_log = await self.coc_client.get_clan_wars_for_player(m.tag,season=self.season)
+            war_log = await self.coc_client.get_war_participation_for_player(m.tag,season=self.season)
             war_stats = aClanWarSummary.for_player(m.tag,war_log)
 
             raid_log = await aRaidWeekend.for_player(m.tag,season=self.season)
@@ -169,8 +169,9 @@ class ClanExcelExport(GlobalClient):
     async def war_report(self):
         bold = self.workbook.add_format({'bold': True})
 
-        clan_wars = await self.coc_client.get_clan_wars_for_clan(self.clan.tag,season=self.season)
-        async for war in AsyncIter(clan_wars):
+        war_history = self.coc_client.get_war_history_for_clan(self.clan.tag,season=self.season)
+        async for entry in war_history:
+            war = await entry.hydrate(self.clan.tag)
             war_clan = war.get_clan(self.clan.tag)
             war_opponent = war.get_opponent(self.clan.tag)
 
@@ -46,9 +46,9 @@ class ClanMembersMenu(MenuPaginator):
     async def start(self):
         registered_members = []
         if self.clan.is_alliance_clan and self.clan.alliance_member_count > 0:
-            registered_members = [p async for p in self.coc_client.get_players(self.clan.alliance_members)]
+            registered_members = [p async for p in self.coc_client.get_players(self.clan.alliance_members,max_age=300)]
 
-        self.members_in_clan = [p async for p in self.coc_client.get_players([m.tag for m in self.clan.members])]
+        self.members_in_clan = [p async for p in self.coc_client.get_players([m.tag for m in self.clan.members],max_age=300)]
         self.members_not_in_clan = [member for member in registered_members if member not in self.members_in_clan]
         self.all_clan_members = self.members_in_clan + self.members_not_in_clan
         self.is_active = True
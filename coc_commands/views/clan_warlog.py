@@ -12,18 +12,39 @@ from coc_main.utils.constants.ui_emojis import EmojisUI
 
 from coc_main.coc_objects.clans.clan import aClan
 from coc_main.coc_objects.events.helpers import clan_war_embed
-from coc_main.coc_objects.events.clan_war_v2 import bClanWar
-from coc_main.coc_objects.events.war_summary import aClanWarSummary
 
 class ClanWarLog(DefaultView):
+    # fields read by the overview and the selector, hydrate() fetches the full war when one is selected
+    summary_projection = {
+        'type':1,
+        'state':1,
+        'teamSize':1,
+        'attacksPerMember':1,
+        'startTime':1,
+        'endTime':1,
+        'clan.tag':1,
+        'clan.name':1,
+        'clan.stars':1,
+        'clan.destructionPercentage':1,
+        'clan.attacks':1,
+        'opponent.tag':1,
+        'opponent.name':1,
+        'opponent.stars':1,
+        'opponent.destructionPercentage':1,
+        'opponent.attacks':1
+        }
+
     def __init__(self,
         context:discord.Interaction,
         clan:aClan):
         
         self.clan = clan
-        self.war_selector = None
-        self.war_summary = None
-        self.war_index = -1
+        self.history = None
+        self.select_page = []
+        self.page_anchors = [None]
+        self.recent_wars = []
+        self.war_stats = None
+        self.selected_war = None
 
 
         super().__init__(context,timeout=600)
@@ -45,6 +66,30 @@ class ClanWarLog(DefaultView):
             emoji=EmojisUI.EXIT,
             row=0
             )
+    @property
+    def newer_button(self):
+        button = DiscordButton(
+            function=self._callback_newer,
+            style=discord.ButtonStyle.gray,
+            emoji=EmojisUI.GREEN_PREVIOUS,
+            label="Newer",
+            row=0
+            )
+        if len(self.page_anchors) <= 1:
+            button.disabled = True
+        return button
+    @property
+    def older_button(self):
+        button = DiscordButton(
+            function=self._callback_older,
+            style=discord.ButtonStyle.gray,
+            emoji=EmojisUI.GREEN_NEXT,
+            label="Older",
+            row=0
+            )
+        if len(self.page_anchors) * self.history.page_size >= self.war_stats['wars']:
+            button.disabled = True
+        return button
     
     # def view_clan_button(self,war:aClanWar):
     #     return DiscordButton(
@@ -73,32 +118,28 @@ class ClanWarLog(DefaultView):
     #####
     ####################################################################################################    
     async def overview_embed(self):
-        min_prep_start = min([w.start_time.int_timestamp for w in self.war_summary.war_log])
-        war_wins = len([w for w in self.war_summary.war_log if w.get_clan(self.clan.tag).result in [WarResult.WINNING,WarResult.WON]])
-        war_losses = len([w for w in self.war_summary.war_log if w.get_clan(self.clan.tag).result in [WarResult.LOSING,WarResult.LOST]])
-        war_ties = len([w for w in self.war_summary.war_log if w.get_clan(self.clan.tag).result in [WarResult.TIED]])
-
-        avg_war_size = round(sum([w.team_size for w in self.war_summary.war_log])/len(self.war_summary.war_log),1)
-        avg_townhall = round(sum([w.get_clan(self.clan.tag).average_townhall for w in self.war_summary.war_log])/len(self.war_summary.war_log),1)
-        total_attacks = sum([w.attacks_per_member * w.team_size for w in self.war_summary.war_log])
+        stats = self.war_stats
+        avg_war_size = round(stats['team_size']/stats['wars'],1)
+        avg_townhall = round(stats['townhall']/stats['wars'],1)
+        total_attacks = stats['attacks']
 
         embed = await clash_embed(
             context=self.ctx,
             title=f"**{self.clan.title}**",
-            message=f"**{len(self.war_summary.war_log)} Clan War(s) recorded since <t:{min_prep_start-86400}:R>.**"
+            message=f"**{stats['wars']} Clan War(s) recorded since <t:{stats['first_start']-86400}:R>.**"
                 + f"\n\n**__War Performance__**"
-                + f"\n`{'Wins:':<10}` {war_wins} ({war_wins/len(self.war_summary.war_log)*100:.0f}%)"
-                + f"\n`{'Losses:':<10}` {war_losses} ({war_losses/len(self.war_summary.war_log)*100:.0f}%)"
-                + f"\n`{'Ties:':<10}` {war_ties} ({war_ties/len(self.war_summary.war_log)*100:.0f}%)"
+                + f"\n`{'Wins:':<10}` {stats['wins']} ({stats['wins']/stats['wars']*100:.0f}%)"
+                + f"\n`{'Losses:':<10}` {stats['losses']} ({stats['losses']/stats['wars']*100:.0f}%)"
+                + f"\n`{'Ties:':<10}` {stats['ties']} ({stats['ties']/stats['wars']*100:.0f}%)"
                 + f"\n\n**__War Stats__**"
                 + f"\n{EmojisClash.CLANWAR} `{'Avg War Size:':<15}` {avg_war_size}"
                 + f"\n{EmojisTownHall.get(int(avg_townhall))} `{'Avg Townhall:':<15}` {avg_townhall}"
-                + f"\n{EmojisClash.THREESTARS} `{'% Triples:':<15}` {self.war_summary.triples/total_attacks*100:.0f}%"
-                + f"\n{EmojisClash.UNUSEDATTACK} `{'% Unused Hits:':<15}` {self.war_summary.unused_attacks/total_attacks*100:.0f}%"
+                + f"\n{EmojisClash.THREESTARS} `{'% Triples:':<15}` {stats['triples']/total_attacks*100:.0f}%"
+                + f"\n{EmojisClash.UNUSEDATTACK} `{'% Unused Hits:':<15}` {stats['unused']/total_attacks*100:.0f}%"
                 + f"\n\n*Most recent 5 wars shown below.*",
             thumbnail=self.clan.badge,
             )
-        a_iter = AsyncIter(self.war_summary.war_log[:5])
+        a_iter = AsyncIter(self.recent_wars)
         async for war in a_iter:
             clan = war.get_clan(self.clan.tag)
             opponent = war.get_opponent(self.clan.tag)
@@ -117,9 +158,14 @@ class ClanWarLog(DefaultView):
     ### START / STOP 
     ##################################################
     async def start(self):
-        get_all_wars = await self.coc_client.get_clan_wars_for_clan(self.clan.tag)
+        self.history = self.coc_client.get_war_history_for_clan(self.clan.tag,projection=self.summary_projection,page_size=25)
+
+        # totals are aggregated in the database, only the first selector page is read
+        self.war_stats = await self.history.clan_summary(self.clan.tag)
+        self.select_page = await self.history.page()
+        self.recent_wars = self.select_page[:5]
 
-        if len(get_all_wars) == 0:
+        if self.war_stats['wars'] == 0:
             embed = await clash_embed(
                 context=self.ctx,
                 title=f"**{self.clan.title}**",
@@ -133,16 +179,6 @@ class ClanWarLog(DefaultView):
             return
         
         self.is_active = True
-
-        self.war_summary = await self.run_in_thread(aClanWarSummary.for_clan,self.clan.tag,get_all_wars)
-        self.war_selector = [
-            discord.SelectOption(
-                label=f"{w.get_clan(self.clan.tag).name} vs {w.get_opponent(self.clan.tag).name}",
-                value=i-1,
-                description=(f"War ended {w.end_time.format('MMM DD, YYYY')}" if w.state == WarState.WAR_ENDED else f"War ends {w.end_time.format('MMM DD, YYYY')}"),
-                emoji=WarResult.WINEMOJI if w.get_clan(self.clan.tag).result in [WarResult.WON,WarResult.WINNING] else WarResult.LOSEEMOJI if w.get_clan(self.clan.tag).result in [WarResult.LOST,WarResult.LOSING] else WarResult.TIEEMOJI)
-            for i,w in enumerate(self.war_summary.war_log,1)
-            ]
         
         embed = await self.overview_embed()
         self._build_war_select_menu()
@@ -154,7 +190,7 @@ class ClanWarLog(DefaultView):
             self.message = await self.ctx.reply(embed=embed,view=self)
     
     async def _callback_home(self,interaction:discord.Interaction,button:discord.Button):
-        self.war_index = -1
+        self.selected_war = None
         embed = await self.overview_embed()
         self._build_war_select_menu()
         await interaction.response.edit_message(embed=embed,view=self)
@@ -171,34 +207,40 @@ class ClanWarLog(DefaultView):
             await interaction.edit_original_response(embed=embed,view=self)
             return
         
-        self.war_index = int(select.values[0])
-        select_war = self.war_summary.war_log[self.war_index]
+        self.selected_war = select.values[0]
+        select_war = await self.coc_client.get_war_by_id(self.selected_war,clan_tag=self.clan.tag)
         self._build_war_select_menu()
         embed = await clan_war_embed(context=interaction,clan_war=select_war)
 
         await interaction.edit_original_response(embed=embed,view=self)
  
+    async def _callback_newer(self,interaction:discord.Interaction,button:discord.Button):
+        await interaction.response.defer()
+        self.page_anchors.pop()
+        self.select_page = await self.history.page(after=self.page_anchors[-1])
+        self._build_war_select_menu()
+        await interaction.edit_original_response(view=self)
+
+    async def _callback_older(self,interaction:discord.Interaction,button:discord.Button):
+        await interaction.response.defer()
+        self.page_anchors.append(self.select_page[-1])
+        self.select_page = await self.history.page(after=self.page_anchors[-1])
+        self._build_war_select_menu()
+        await interaction.edit_original_response(view=self)
+
     def _build_war_select_menu(self):
         self.clear_items()
 
-        if len(self.war_selector) > 25:
-            minus_diff = None
-            plus_diff = 25
-            if 12 < self.war_index < len(self.war_selector) - 25:
-                minus_diff = self.war_index - 12
-                plus_diff = self.war_index + 13
-            elif self.war_index >= len(self.war_selector) - 25:
-                minus_diff = len(self.war_selector) - 25
-                plus_diff = None
-            options = self.war_selector[minus_diff:plus_diff]
-        else:
-            options = self.war_selector[:25]
-        
-        for option in options:
-            if option.value == self.war_index:
-                option.default = True
-            else:
-                option.default = False
+        options = []
+        for w in self.select_page:
+            clan = w.get_clan(self.clan.tag)
+            options.append(discord.SelectOption(
+                label=f"{clan.name} vs {w.get_opponent(self.clan.tag).name}",
+                value=w._id,
+                description=(f"War ended {w.end_time.format('MMM DD, YYYY')}" if w.state == WarState.WAR_ENDED else f"War ends {w.end_time.format('MMM DD, YYYY')}"),
+                emoji=WarResult.WINEMOJI if clan.result in [WarResult.WON,WarResult.WINNING] else WarResult.LOSEEMOJI if clan.result in [WarResult.LOST,WarResult.LOSING] else WarResult.TIEEMOJI,
+                default=w._id == self.selected_war
+                ))
             
         select_menu = DiscordSelectMenu(
             function=self._callback_select_war,
@@ -209,5 +251,7 @@ class ClanWarLog(DefaultView):
             row=1
             )
         self.add_item(self.home_button)
+        self.add_item(self.newer_button)
+        self.add_item(self.older_button)
         self.add_item(self.close_button)
         self.add_item(select_menu)
\ No newline at end of file
@@ -98,7 +98,7 @@ class NewMemberMenu(DefaultView):
     async def _get_accounts_select(self):
         main_embed = await self.new_member_embed()
 
-        player_accounts = [p async for p in self.coc_client.get_players(self.member.account_tags)]
+        player_accounts = [p async for p in self.coc_client.get_players(self.member.account_tags,max_age=300)]
         player_accounts.sort(
             key=lambda x:(x.town_hall.level,x.hero_strength,x.exp_level,x.clean_name),
             reverse=True)
@@ -214,7 +214,7 @@ class NewMemberMenu(DefaultView):
     ### COLLATE ACCOUNTS
     ##################################################    
     async def _collate_player_accounts(self,tags:List[str]):
-        self.accounts = [p async for p in self.coc_client.get_players(tags)]
+        self.accounts = [p async for p in self.coc_client.get_players(tags,max_age=300)]
         self.accounts.sort(key=lambda x:(x.town_hall.level,x.hero_strength,x.exp_level,x.clean_name),reverse=True)
         await self._get_home_clans()
     
@@ -242,7 +242,7 @@ class NewMemberMenu(DefaultView):
     async def _select_home_clan(self,account:aPlayer):
         await aPlayer._sync_cache(account,force=True)
         linked_clans = await ClanGuildLink.get_for_guild(self.guild.id)
-        guild_clans = [a async for a in self.coc_client.get_clans([c.tag for c in linked_clans]) if a.is_alliance_clan]
+        guild_clans = [a async for a in self.coc_client.get_clans([c.tag for c in linked_clans],max_age=300) if a.is_alliance_clan]
 
         alliance_clans = sorted([c for c in guild_clans if c.is_alliance_clan],key=lambda x:(x.level,x.max_recruitment_level,x.capital_hall),reverse=True)
         if len(alliance_clans) == 0:
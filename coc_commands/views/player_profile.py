@@ -11,7 +11,7 @@ from redbot.core.utils import AsyncIter
 from coc_main.coc_objects.season.season import aClashSeason
 
 from coc_main.coc_objects.players.player import aPlayer
-from coc_main.coc_objects.events.clan_war_v2 import bClanWar
+from coc_main.coc_objects.clans.clan import BasicClan
 from coc_main.coc_objects.events.raid_weekend import aRaidWeekend
 from coc_main.coc_objects.events.war_summary import aClanWarSummary
 from coc_main.coc_objects.events.raid_summary import aSummaryRaidStats
@@ -84,7 +84,7 @@ class PlayerProfileMenu(DefaultView):
     ### START / STOP
     ##################################################
     async def start(self):        
-        war_log = await self.coc_client.get_clan_wars_for_player(
+        war_log = await self.coc_client.get_war_participation_for_player(
             player_tag=self.current_account.tag,
             season=aClashSeason.current()
             )
@@ -177,7 +177,7 @@ class PlayerProfileMenu(DefaultView):
         await interaction.response.defer()
         self.current_account = [account for account in self.accounts if account.tag == menu.values[0]][0]
 
-        war_log = await self.coc_client.get_clan_wars_for_player(
+        war_log = await self.coc_client.get_war_participation_for_player(
             player_tag=self.current_account.tag,
             season=aClashSeason.current()
             )
@@ -298,16 +298,17 @@ class PlayerProfileMenu(DefaultView):
             if war_count >= 5:
                 break
 
-            war_member = war.get_member(player.tag)
-            war_attacks = sorted(war_member.attacks,key=lambda x:(x.order))
+            war_clan = await BasicClan(war.clan_tag)
+            clan_emoji = war_clan.emoji if war_clan.is_alliance_clan else EmojisClash.CLANWAR
+            war_attacks = war.attacks
             attack_str = "\n".join(
                 [f"{EmojisClash.ATTACK}\u3000{EmojisTownHall.get(att.attacker.town_hall)} vs {EmojisTownHall.get(att.defender.town_hall)}\u3000{EmojisClash.STAR} `{att.stars:^3}`\u3000{EmojisClash.DESTRUCTION} `{att.destruction:>3}%`"
                 for att in war_attacks]
                 )
             embed.add_field(
-                name=f"{war_member.clan.emoji} {war_member.clan.clean_name} vs {war_member.opponent.clean_name}",
-                value=f"{WarResult.emoji(war_member.clan.result)}\u3000{EmojisClash.ATTACK} `{len(war_member.attacks):^3}`\u3000{EmojisClash.UNUSEDATTACK} `{war_member.unused_attacks:^3}`"
-                    + (f"\u3000{EmojisUI.ELO} `{round(sum([att.elo_effect for att in war_member.attacks]),1):^3}`\n" if war_member.clan.is_alliance_clan and war_member.war.type == 'random' else "\n")
+                name=f"{clan_emoji} {war.clean_clan_name} vs {war.clean_opponent_name}",
+                value=f"{WarResult.emoji(war.result)}\u3000{EmojisClash.ATTACK} `{len(war.attacks):^3}`\u3000{EmojisClash.UNUSEDATTACK} `{war.unused_attacks:^3}`"
+                    + (f"\u3000{EmojisUI.ELO} `{round(war.elo_effect,1):^3}`\n" if war_clan.is_alliance_clan and war.type == 'random' else "\n")
                     + (f"*War Ends <t:{war.end_time.int_timestamp}:R>.*\n" if war.start_time < pendulum.now() < war.end_time else "")
                     + (f"*War Starts <t:{war.start_time.int_timestamp}:R>.*\n" if war.start_time > pendulum.now() else "")
                     + (f"{attack_str}\n" if len(war_attacks) > 0 else "")
@@ -96,7 +96,7 @@ class UserProfileMenu(DefaultView):
     ##################################################
     @staticmethod
     async def profile_embed(ctx:Union[discord.Interaction,commands.Context],member:aMember):
-        m_accounts = [p async for p in GlobalClient.coc_client.get_players(member.account_tags)]
+        m_accounts = [p async for p in GlobalClient.coc_client.get_players(member.account_tags,max_age=300)]
 
         m_accounts.sort(
             key=lambda x:(ClanRanks.get_number(x.alliance_rank),x.town_hall_level,x.exp_level),
@@ -17,11 +17,12 @@ from redbot.core.utils import AsyncIter
 
 from coc_main.cog_coc_main import ClashOfClansMain as coc_main
 from coc_main.client.global_client import GlobalClient
+from coc_main.client.coc_client import DiscoveryPriority
 
 from coc_main.coc_objects.season.season import aClashSeason
 from coc_main.coc_objects.players.player import BasicPlayer, aPlayer, aPlayerSeason
 from coc_main.coc_objects.players.player_activity import aPlayerActivity
-from coc_main.coc_objects.clans.clan import aClan
+from coc_main.coc_objects.clans.clan import BasicClan, aClan
 from coc_main.coc_objects.events.clan_war_leagues import WarLeagueGroup
 from coc_main.coc_objects.events.clan_war import aClanWar
 from coc_main.coc_objects.events.clan_war_v2 import bClanWar, bWarLeagueGroup
@@ -36,7 +37,9 @@ from .tasks.raid_tasks import ClanRaidLoop
 
 default_global = {
     "global_scope": 0,
-    "cycle_id": -1
+    "cycle_id": -1,
+    "player_workers": 4,
+    "clan_workers": 2
     }
 
 # NEBULA CYCLE ID = -10
@@ -68,8 +71,9 @@ class ClashOfClansData(commands.Cog,GlobalClient):
         self.cycle_id = -1
 
         self._leaderboard_discovery_lock = asyncio.Lock()
-        self.player_cache = None
-        self.clan_cache = None
+        self.player_cache = []
+        self.clan_cache = []
+        self._cache_worker_stats = {}
 
         #PLAYER LOOP
         self._player_loop_lock = asyncio.Lock()
@@ -124,6 +128,12 @@ class ClashOfClansData(commands.Cog,GlobalClient):
         data_log_handler.setFormatter(log_formatter)
         LOG.addHandler(data_log_handler)
 
+        # open before any activity can be queued, so that every queued activity is spilled
+        aPlayerActivity.open_spill(
+            f"{cog_data_path(self)}/player_activity.spill",
+            on_insert=self.aggregate_player_activities
+            )
+
         self.is_global = await self.config.global_scope() == 1
         self.cycle_id = await self.config.cycle_id()
         asyncio.create_task(self.start_task_cog())
@@ -159,8 +169,10 @@ class ClashOfClansData(commands.Cog,GlobalClient):
 
         self.coc_client._use_discovery = True
         
-        self.player_cache = asyncio.create_task(self._player_cache_task())
-        self.clan_cache = asyncio.create_task(self._clan_cache_task())
+        self.start_cache_workers(
+            player_workers=await self.config.player_workers(),
+            clan_workers=await self.config.clan_workers()
+            )
 
         self.coc_client.add_events(
             self.player_loop_start,
@@ -195,12 +207,14 @@ class ClashOfClansData(commands.Cog,GlobalClient):
     ##################################################
     async def cog_unload(self):
         self.coc_client._use_discovery = False
-        self.player_cache.cancel()
-        self.clan_cache.cancel()
+        self.stop_cache_workers()
         self.leaderboard_discovery.cancel()
         self.refresh_player_snapshot.cancel()
         
         await self.unload_event_tasks()
+        await aPlayerActivity.close_writes()
+        await BasicPlayer.flush_writes()
+        await BasicClan.flush_writes()
         try:
             self.update_player_loop.stop()
         except:
@@ -237,26 +251,7 @@ class ClashOfClansData(commands.Cog,GlobalClient):
         
         elif self.cycle_id >= 0:
             self.coc_client.add_events(
-                PlayerTasks.on_player_update_name,
-                PlayerTasks.on_player_update_war_opted_in,
-                PlayerTasks.on_player_update_labels,
-                PlayerTasks.on_player_upgrade_townhall,
-                PlayerTasks.on_player_upgrade_hero,
-                PlayerTasks.on_player_upgrade_troops,
-                PlayerTasks.on_player_upgrade_spells,
-                PlayerTasks.on_player_update_clan,
-                PlayerTasks.on_player_update_trophies,
-                PlayerTasks.on_player_update_attack_wins,
-                PlayerTasks.on_player_update_defense_wins,
-                PlayerTasks.on_player_update_war_stars,
-                PlayerTasks.on_player_update_donations,
-                PlayerTasks.on_player_update_received,
-                PlayerTasks.on_player_update_capital_contributions,
-                PlayerTasks.on_player_update_loot_capital_gold,
-                PlayerTasks.on_player_update_loot_gold,
-                PlayerTasks.on_player_update_loot_elixir,
-                PlayerTasks.on_player_update_loot_darkelixir,
-                PlayerTasks.on_player_update_clan_games,
+                PlayerTasks.on_player_update,
                 ClanTasks.on_clan_member_join_capture,
                 ClanTasks.on_clan_member_leave_capture,
                 DefaultWarTasks.save_war_on_new_attack,
@@ -278,26 +273,7 @@ class ClashOfClansData(commands.Cog,GlobalClient):
         elif self.cycle_id >= 0:
             self.coc_client.remove_events(
                 PlayerTasks.on_player_check_snapshot,
-                PlayerTasks.on_player_update_name,
-                PlayerTasks.on_player_update_war_opted_in,
-                PlayerTasks.on_player_update_labels,
-                PlayerTasks.on_player_upgrade_townhall,
-                PlayerTasks.on_player_upgrade_hero,
-                PlayerTasks.on_player_upgrade_troops,
-                PlayerTasks.on_player_upgrade_spells,
-                PlayerTasks.on_player_update_clan,
-                PlayerTasks.on_player_update_trophies,
-                PlayerTasks.on_player_update_attack_wins,
-                PlayerTasks.on_player_update_defense_wins,
-                PlayerTasks.on_player_update_war_stars,
-                PlayerTasks.on_player_update_donations,
-                PlayerTasks.on_player_update_received,
-                PlayerTasks.on_player_update_capital_contributions,
-                PlayerTasks.on_player_update_loot_capital_gold,
-                PlayerTasks.on_player_update_loot_gold,
-                PlayerTasks.on_player_update_loot_elixir,
-                PlayerTasks.on_player_update_loot_darkelixir,
-                PlayerTasks.on_player_update_clan_games,
+                PlayerTasks.on_player_update,
                 ClanTasks.on_clan_activity,
                 ClanTasks.on_clan_member_join_capture,
                 ClanTasks.on_clan_member_leave_capture,
@@ -322,23 +298,19 @@ class ClashOfClansData(commands.Cog,GlobalClient):
             if self.coc_client.maintenance:
                 return
             
+            # release registered members from general cycles, for the controller to reassign to cycle 0
             query = {
-                "_cycle_id": 1,
+                "_cycle_id": {"$gte": 1},
                 "discord_user": {"$exists":True,"$gt":0},
                 "is_member": True
                 }
+            await self.database.db__player.update_many(query,{"$unset": {"_cycle_id": 1}})
             
+            # general cycles poll their own players, every other process polls all general cycles (1 to max_cycle)
+            query = {"_cycle_id": self.cycle_id if self.cycle_id >= 1 else {"$gte": 1}}
             db_query = self.database.db__player.find(query,{'_id':1})
             async for p in db_query:
-                await self.database.db__player.update_one(
-                    {"_id": p['_id']},
-                    {"$unset": {"_cycle_id": 1}}
-                    )
-            
-            query = {"_cycle_id": 1}
-            db_query = self.database.db__player.find(query,{'_id':1})
-            async for p in db_query:
-                await self.coc_client._player_cache_queue.put(p['_id'])
+                await self.coc_client._player_cache_queue.put(p['_id'],DiscoveryPriority.TRACKED)
                 
             if self.cycle_id in [0]:
                 current = list(self.coc_client._player_updates)
@@ -358,7 +330,7 @@ class ClashOfClansData(commands.Cog,GlobalClient):
             if self.coc_client.maintenance:
                 return            
             
-            if self.cycle_id == 1:
+            if self.cycle_id >= 1:
                 current = list(self.coc_client._clan_updates)
                    
                 clans = []
@@ -387,12 +359,13 @@ class ClashOfClansData(commands.Cog,GlobalClient):
                     if p['_id'] in current_war:
                         self.coc_client.remove_war_updates(p['_id'])
 
-                    await self.database.db__clan.update_one(
-                        {"_id": p['_id']},
+                if len(db_query) > 0:
+                    await self.database.db__clan.update_many(
+                        {"_id": {"$in": [p['_id'] for p in db_query]},"_cycle_id": {"$gte": 1}},
                         {"$unset": {"_cycle_id": 1}}
                         )
             
-            if self.cycle_id in [0,1]:
+            if self.cycle_id >= 0:
                 current_clan = list(self.coc_client._clan_updates)
                 query = {
                     "$and": [
@@ -486,21 +459,48 @@ class ClashOfClansData(commands.Cog,GlobalClient):
     ##### CACHE REFRESH
     #####
     ############################################################    
-    async def _player_cache_task(self):
+    def start_cache_workers(self,player_workers:int,clan_workers:int):
+        self.stop_cache_workers()
+        self.player_cache = [asyncio.create_task(self._player_cache_task(i)) for i in range(player_workers)]
+        self.clan_cache = [asyncio.create_task(self._clan_cache_task(i)) for i in range(clan_workers)]
+    
+    def stop_cache_workers(self):
+        for task in self.player_cache + self.clan_cache:
+            task.cancel()
+        self.player_cache = []
+        self.clan_cache = []
+        self._cache_worker_stats = {}
+    
+    async def _cache_backpressure(self,family:str):
+        # discovery is lower priority than the data loops: only fetch when the endpoint family has spare capacity
+        throttler = self.coc_client.http_throttler
+        while not throttler.has_capacity(family):
+            await asyncio.sleep(throttler.sleep_time)
+    
+    async def _player_cache_task(self,worker_id:int):
+        queue = self.coc_client._player_cache_queue
+        stats = self._cache_worker_stats[f"player-{worker_id}"] = {'processed':0,'errors':0,'busy':False}
+
         while True:
             try:
                 if self.coc_client.maintenance:
                     await asyncio.sleep(600)
-                    return
+                    continue
 
-                tag = await self.coc_client._player_cache_queue.get()
+                tag = await queue.get()
+                stats['busy'] = True
+                requeue = False
 
                 try:
+                    await self._cache_backpressure('players')
                     player = await self.coc_client.get_player(tag)
+                    await aPlayer._sync_cache(player)
+                    await player._update_snapshots()
 
-                except coc.NotFound:
-                    self.coc_client._player_cache_queue.task_done()
+                    if player.clan:
+                        await self.coc_client._clan_cache_queue.put(player.clan.tag,DiscoveryPriority.for_player(player))
 
+                except coc.NotFound:
                     basic_player = await BasicPlayer(tag)
                     await basic_player._attributes.load_data()
 
@@ -511,15 +511,20 @@ class ClashOfClansData(commands.Cog,GlobalClient):
                         await basic_player.remove_member()
                 
                 except (coc.Maintenance,coc.GatewayError):
-                    await self.coc_client._player_cache_queue.put(tag)
+                    requeue = True
                 
-                else:            
-                    self.coc_client._player_cache_queue.task_done()
-                    await aPlayer._sync_cache(player)
-                    await player._update_snapshots()
-
-                    if player.clan:
-                        await self.coc_client._clan_cache_queue.put(player.clan.tag)
+                except Exception:
+                    stats['errors'] += 1
+                    LOG.exception(f"Error in Player Discovery: {tag}")
+                
+                finally:
+                    priority = queue.release(tag)
+                    stats['busy'] = False
+                
+                if requeue:
+                    await queue.put(tag,priority)
+                else:
+                    stats['processed'] += 1
             
             except asyncio.CancelledError:
                 return
@@ -527,30 +532,47 @@ class ClashOfClansData(commands.Cog,GlobalClient):
             except Exception:
                 LOG.exception("Error in Player Discovery.")
         
-    async def _clan_cache_task(self):
+    async def _clan_cache_task(self,worker_id:int):
+        queue = self.coc_client._clan_cache_queue
+        stats = self._cache_worker_stats[f"clan-{worker_id}"] = {'processed':0,'errors':0,'busy':False}
+
         while True:
             try:
                 if self.coc_client.maintenance:
                     await asyncio.sleep(600)
-                    return
+                    continue
 
-                tag = await self.coc_client._clan_cache_queue.get()
+                tag = await queue.get()
+                stats['busy'] = True
+                requeue = False
 
                 try:
+                    await self._cache_backpressure('clans')
                     clan = await self.coc_client.get_clan(tag)
+                    await aClan._sync_cache(clan)
+
+                    member_priority = DiscoveryPriority.TRACKED if clan.is_alliance_clan else DiscoveryPriority.DISCOVERY
+                    save_members = [self.coc_client._player_cache_queue.put(m.tag,member_priority) for m in clan.members]
+                    await asyncio.gather(*save_members)
 
                 except coc.NotFound:
-                    self.coc_client._clan_cache_queue.task_done()
+                    pass
                     
                 except (coc.Maintenance,coc.GatewayError):
-                    await self.coc_client._clan_cache_queue.put(tag)
+                    requeue = True
                 
-                else:            
-                    self.coc_client._clan_cache_queue.task_done()
-                    await aClan._sync_cache(clan)
-
-                save_members = [self.coc_client._player_cache_queue.put(m.tag) for m in clan.members]
-                await asyncio.gather(*save_members)
+                except Exception:
+                    stats['errors'] += 1
+                    LOG.exception(f"Error in Clan Discovery: {tag}")
+                
+                finally:
+                    priority = queue.release(tag)
+                    stats['busy'] = False
+                
+                if requeue:
+                    await queue.put(tag,priority)
+                else:
+                    stats['processed'] += 1
                 
             except asyncio.CancelledError:
                 return
@@ -601,7 +623,16 @@ class ClashOfClansData(commands.Cog,GlobalClient):
                 + "```",
             inline=True
             )
-        embed.add_field(name="\u200b",value="\u200b",inline=True)
+        cpu_mean, cpu_max = PlayerTasks.cpu_stats()
+        embed.add_field(
+            name="**Player Diff**",
+            value="```ini"
+                + f"\n{'[Polls]':<10} {PlayerTasks.stats['polls']:,}"
+                + f"\n{'[Activity]':<10} {PlayerTasks.stats['activities']:,}"
+                + f"\n{'[CPU]':<10} {cpu_mean:.3f}ms (max {cpu_max:.3f}ms)"
+                + "```",
+            inline=True
+            )
         embed.add_field(
             name="**Clan Wars**",
             value="Last: " + (f"<t:{getattr(self.war_loop_last,'int_timestamp',0)}:R>" if self.war_loop_last else "None")
@@ -624,6 +655,84 @@ class ClashOfClansData(commands.Cog,GlobalClient):
             inline=True
             )
         embed.add_field(name="\u200b",value="\u200b",inline=True)
+
+        for label,queue,prefix in [('Player Discovery',self.coc_client._player_cache_queue,'player-'),('Clan Discovery',self.coc_client._clan_cache_queue,'clan-')]:
+            workers = [v for k,v in self._cache_worker_stats.items() if k.startswith(prefix)]
+            queue_stats = queue.stats
+            embed.add_field(
+                name=f"**{label}**",
+                value="```ini"
+                    + f"\n{'[Queue]':<10} {len(queue):,}"
+                    + f"\n{'[Oldest]':<10} {queue.oldest_age:.0f}s"
+                    + f"\n{'[Workers]':<10} {len([w for w in workers if w['busy']])} / {len(workers)} busy"
+                    + f"\n{'[Done]':<10} " + " / ".join([f"{w['processed']:,}" for w in workers])
+                    + f"\n{'[Errors]':<10} {sum([w['errors'] for w in workers]):,}"
+                    + "".join([f"\n{'['+DiscoveryPriority.labels[p]+']':<10} {c['depth']:,} ({c['oldest']:.0f}s)" for p,c in queue_stats.items()])
+                    + f"\n{'[Promoted]':<10} {sum([c['promoted'] for c in queue_stats.values()]):,}"
+                    + f"\n{'[Overdue]':<10} {sum([c['overdue'] for c in queue_stats.values()]):,}"
+                    + "```",
+                inline=True
+                )
+        embed.add_field(name="\u200b",value="\u200b",inline=True)
+
+        for label,stats,sync in [('Player Cache',BasicPlayer.cache_stats(),BasicPlayer.sync_stats()),('Clan Cache',BasicClan.cache_stats(),BasicClan.sync_stats())]:
+            embed.add_field(
+                name=f"**{label}**",
+                value="```ini"
+                    + f"\n{'[Size]':<10} {stats['size']:,} / {stats['max_size']:,}"
+                    + f"\n{'[HitRate]':<10} {stats['hit_rate']:.1%}"
+                    + f"\n{'[Evicted]':<10} {stats['evictions']:,}"
+                    + f"\n{'[Expired]':<10} {stats['expirations']:,}"
+                    + f"\n{'[Revived]':<10} {stats['revived']:,}"
+                    + f"\n{'[Locks]':<10} {stats['locks']:,}"
+                    + f"\n{'[SyncSkip]':<10} " + (f"{sync['skip_rate']:.1%} ({sync['skips']:,} / {sync['checks']:,})" if sync['ready'] else "warming")
+                    + "```",
+                inline=True
+                )
+        embed.add_field(name="\u200b",value="\u200b",inline=True)
+
+        for label,stats in [('Player Writes',BasicPlayer.write_stats()),('Clan Writes',BasicClan.write_stats())]:
+            embed.add_field(
+                name=f"**{label}**",
+                value="```ini"
+                    + f"\n{'[Pending]':<10} {stats['pending']:,}"
+                    + f"\n{'[Flushes]':<10} {stats['flushes']:,}"
+                    + f"\n{'[Writes]':<10} {stats['writes']:,}"
+                    + f"\n{'[Errors]':<10} {stats['errors']:,}"
+                    + f"\n{'[AvgSize]':<10} {stats['avg_size']:.1f}"
+                    + f"\n{'[RunTime]':<10} {stats['avg_runtime']:.3f}s"
+                    + "```",
+                inline=True
+                )
+        activity_stats = aPlayerActivity.write_stats()
+        embed.add_field(
+            name="**Activity Writes**",
+            value="```ini"
+                + f"\n{'[Pending]':<10} {activity_stats['pending']:,}"
+                + f"\n{'[Inserted]':<10} {activity_stats['inserted']:,}"
+                + f"\n{'[Replayed]':<10} {activity_stats['replayed']:,}"
+                + f"\n{'[Dupes]':<10} {activity_stats['duplicates']:,}"
+                + f"\n{'[Overflow]':<10} {activity_stats['overflowed']:,}"
+                + f"\n{'[Dropped]':<10} {activity_stats['dropped']:,}"
+                + f"\n{'[RunTime]':<10} {activity_stats['avg_runtime']:.3f}s (max {activity_stats['max_runtime']:.3f}s)"
+                + "```",
+            inline=True
+            )
+
+        snapshot_stats = self.coc_client.snapshot_stats
+        for label,stats in [('Player Snapshots',snapshot_stats['player']),('Clan Snapshots',snapshot_stats['clan'])]:
+            embed.add_field(
+                name=f"**{label}**",
+                value="```ini"
+                    + f"\n{'[Size]':<10} {stats['size']:,} / {stats['max_size']:,}"
+                    + f"\n{'[HitRate]':<10} {stats['hit_rate']:.1%}"
+                    + f"\n{'[Hits]':<10} {stats['hits']:,}"
+                    + f"\n{'[Shared]':<10} {stats['coalesced']:,}"
+                    + f"\n{'[Fetched]':<10} {stats['misses']:,}"
+                    + "```",
+                inline=True
+                )
+        embed.add_field(name="\u200b",value="\u200b",inline=True)
         return embed
 
     @commands.command(name="convwar")
@@ -688,6 +797,46 @@ class ClashOfClansData(commands.Cog,GlobalClient):
 
         await ctx.reply("Data Loops reset.")
     
+    @command_group_clash_data.command(name="workers")
+    @commands.is_owner()
+    async def subcommand_clash_data_workers(self,ctx:commands.Context,player_workers:int,clan_workers:int):
+        """Set the number of Player and Clan discovery workers."""
+
+        if player_workers < 1 or clan_workers < 1:
+            return await ctx.reply("Each queue needs at least 1 worker.")
+
+        await self.config.player_workers.set(player_workers)
+        await self.config.clan_workers.set(clan_workers)
+        self.start_cache_workers(player_workers,clan_workers)
+        await ctx.reply(f"Discovery restarted with {player_workers} player worker(s) and {clan_workers} clan worker(s).")
+    
+    @command_group_clash_data.command(name="clearcache")
+    @commands.is_owner()
+    async def subcommand_clash_data_clearcache(self,ctx:commands.Context):
+        """Clear the Player and Clan attribute caches."""
+
+        players = BasicPlayer.clear_cache()
+        clans = BasicClan.clear_cache()
+        await ctx.reply(f"Cleared {players:,} player(s) and {clans:,} clan(s) from cache.")
+    
+    @command_group_clash_data.command(name="rebuildstats")
+    @commands.is_owner()
+    async def subcommand_clash_data_rebuildstats(self,ctx:commands.Context,tag:str):
+        """Rebuild a Player's Season Stats from the Activity Log."""
+
+        player = await self.coc_client.get_player(tag)
+        await player._rebuild_snapshots()
+        await ctx.reply(f"Season Stats for {player} rebuilt for {len(aClashSeason.all_seasons())} season(s).")
+    
+    @command_group_clash_data.command(name="migratestats")
+    @commands.is_owner()
+    async def subcommand_clash_data_migratestats(self,ctx:commands.Context):
+        """Rebuild Season Stats snapshots created before incremental aggregation."""
+
+        async with ctx.typing():
+            count = await aPlayerSeason.migrate_stats_snapshots()
+        await ctx.reply(f"Migrated {count:,} Season Stats snapshot(s).")
+    
     @command_group_clash_data.command(name="stream")
     @commands.is_owner()
     async def subcommand_clash_data_stream(self,ctx:commands.Context):
@@ -751,25 +900,15 @@ class ClashOfClansData(commands.Cog,GlobalClient):
     
     @coc.ClientEvents.player_loop_finish()
     async def insert_player_activities(self,iteration_number:int):
-        async with aPlayerActivity._queue_lock:
-            pending = list(aPlayerActivity._queue)
-            aPlayerActivity._queue.clear()
-
-        if len(pending) > 0:
-            st = pendulum.now()
-            await self.database.db__player_activity.insert_many(pending)
-            LOG.info(f"Inserted {len(pending)} Player Activities. Took {pendulum.now().diff(st).in_seconds()}s.")
-
-            handled_tags = []
-            p_iter = AsyncIter(pending)
-            async for p in p_iter:
-                tag = p['tag']
-                season = aClashSeason.current()
-                if tag in handled_tags:
-                    continue
-
-                await aPlayerSeason.create_stats_snapshot(tag,season)
-                handled_tags.append(tag)
+        # activities are also flushed by size and age, independently of the player loop
+        inserted = await aPlayerActivity.flush_writes()
+        if inserted > 0:
+            LOG.info(f"Inserted {inserted} Player Activities at end of player loop {iteration_number}.")
+
+    async def aggregate_player_activities(self,inserted:List[dict]):
+        st = pendulum.now()
+        await aPlayerSeason.aggregate_activities(inserted)
+        LOG.info(f"Aggregated {len(inserted)} Player Activities into Season Stats. Took {pendulum.now().diff(st).in_seconds()}s.")
 
     @coc.ClientEvents.clan_loop_start()
     async def clan_loop_start(self,iteration_number:int):
@@ -4,6 +4,7 @@ import coc
 from typing import *
 
 from coc_main.client.global_client import GlobalClient
+from coc_main.client.coc_client import DiscoveryPriority
 from coc_main.coc_objects.clans.clan import aClan
 
 ############################################################
@@ -24,9 +25,9 @@ class ClanTasks():
     @coc.ClanEvents.member_join()
     async def on_clan_member_join_capture(member:coc.ClanMember,clan:aClan):
         if GlobalClient.coc_client._use_discovery:
-            await GlobalClient.coc_client._player_cache_queue.put(member.tag)
+            await GlobalClient.coc_client._player_cache_queue.put(member.tag,DiscoveryPriority.TRACKED)
 
     @coc.ClanEvents.member_leave()
     async def on_clan_member_leave_capture(member:coc.ClanMember,clan:aClan):
         if GlobalClient.coc_client._use_discovery:
-            await GlobalClient.coc_client._player_cache_queue.put(member.tag)
\ No newline at end of file
+            await GlobalClient.coc_client._player_cache_queue.put(member.tag,DiscoveryPriority.TRACKED)
\ No newline at end of file
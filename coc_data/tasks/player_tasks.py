@@ -1,8 +1,10 @@
 import coc
 import logging
 import asyncio
+import time
 
 from typing import *
+from collections import deque
 from redbot.core.utils import AsyncIter, bounded_gather
 
 from coc_main.client.global_client import GlobalClient
@@ -11,8 +13,7 @@ from coc_main.coc_objects.season.season import aClashSeason
 from coc_main.coc_objects.players.player import aPlayer
 from coc_main.coc_objects.players.player_season import aPlayerSeason
 from coc_main.coc_objects.players.player_activity import aPlayerActivity
-
-from coc_main.utils.constants.coc_constants import HeroAvailability, TroopAvailability, SpellAvailability, PetAvailability
+from coc_main.coc_objects.players.unit_levels import UnitLevelTable
 
 default_sleep = 60
 LOG = logging.getLogger("coc.data")
@@ -25,6 +26,48 @@ LOG = logging.getLogger("coc.data")
 ############################################################
 ############################################################
 class PlayerTasks():
+    """
+    Player activity capture.
+
+    Each player poll is diffed once, in `on_player_update`: all activities for that poll are built in a single pass, and queued together.
+    """
+    # (attribute, activity, allow negative change)
+    counters = [
+        ('trophies','trophies',True),
+        ('attack_wins','attack_wins',False),
+        ('defense_wins','defense_wins',False),
+        ('war_stars','war_stars',False),
+        ('donations','donations_sent',False),
+        ('received','donations_received',False),
+        ('clan_capital_contributions','capital_contribution',False),
+        ('capital_gold_looted','loot_capital_gold',False),
+        ('loot_gold','loot_gold',False),
+        ('loot_elixir','loot_elixir',False),
+        ('loot_darkelixir','loot_darkelixir',False),
+        ('clan_games','clan_games',False)
+        ]
+
+    upgrade_activities = {
+        'hero': 'upgrade_hero',
+        'troop': 'upgrade_troop',
+        'pet': 'upgrade_troop',
+        'spell': 'upgrade_spell'
+        }
+
+    _cpu_time = deque(maxlen=10000)
+    stats = {
+        'polls': 0,
+        'activities': 0
+        }
+
+    @classmethod
+    def cpu_stats(cls) -> Tuple[float,float]:
+        """
+        Mean and max CPU milliseconds spent per player poll, over the last 10,000 polls.
+        """
+        if len(cls._cpu_time) == 0:
+            return 0,0
+        return sum(cls._cpu_time) / len(cls._cpu_time) * 1000, max(cls._cpu_time) * 1000
 
     @coc.PlayerEvents._create_snapshot()
     async def on_player_check_snapshot(old_player:aPlayer,new_player:aPlayer):
@@ -48,334 +91,77 @@ class PlayerTasks():
 
         LOG.debug(f"{new_player.tag} {new_player.name}: Created player snapshots.")
     
-    @coc.PlayerEvents.name()
-    async def on_player_update_name(old_player:aPlayer,new_player:aPlayer):        
-        
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="change_name",
-            new_value=new_player.name
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Name Change from {old_player.name} to {new_player.name}.")
-    
-    @coc.PlayerEvents.war_opted_in()
-    async def on_player_update_war_opted_in(old_player:aPlayer,new_player:aPlayer):
-        if old_player.war_opted_in != None and new_player.war_opted_in != None:         
-            await aPlayerActivity.create_new(
-                player=new_player,
-                timestamp=new_player.timestamp,
-                activity="change_war_option",
-                new_value=new_player.war_opted_in
-                )
-            LOG.debug(f"{new_player.tag} {new_player.name}: War Opt In from {old_player.war_opted_in} to {new_player.war_opted_in}.")
-    
-    @coc.PlayerEvents.label_ids()
-    async def on_player_update_labels(old_player:aPlayer,new_player:aPlayer):
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="change_label",
-            new_value=new_player.label_ids
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Labels changed to {new_player.label_ids}.")
-    
-    @coc.PlayerEvents.town_hall_level()
-    async def on_player_upgrade_townhall(old_player:aPlayer,new_player:aPlayer):        
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="upgrade_townhall",
-            change=new_player.town_hall.level - old_player.town_hall.level,
-            new_value=new_player.town_hall.level
-            )        
-        LOG.debug(f"{new_player.tag} {new_player.name}: Townhall upgraded to {new_player.town_hall.description}.")
-    
-    @coc.PlayerEvents.town_hall_weapon()
-    async def on_player_upgrade_townhall_weapon(old_player:aPlayer,new_player:aPlayer):
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="upgrade_townhall_weapon",
-            change=max(0,new_player.town_hall.weapon - old_player.town_hall.weapon),
-            new_value=new_player.town_hall.weapon
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Townhall Weapon upgraded to {new_player.town_hall.description}.")
-    
-    @coc.PlayerEvents.hero_strength()
-    async def on_player_upgrade_hero(old_player:aPlayer,new_player:aPlayer):        
-        
-        heroes = HeroAvailability.return_all_unlocked(new_player.town_hall.level)
-        tasks = [PlayerTasks._check_hero_upgrade(old_player,new_player,h) for h in heroes]
-        await bounded_gather(*tasks,return_exceptions=True)
-    
-    async def _check_hero_upgrade(old_player:aPlayer,new_player:aPlayer,hero:str):
-        old_hero = old_player.get_hero(hero)
-        new_hero = new_player.get_hero(hero)
-
-        if getattr(new_hero,'level',0) > getattr(old_hero,'level',0):
-            await aPlayerActivity.create_new(
-                player=new_player,
-                timestamp=new_player.timestamp,
-                activity="upgrade_hero",
-                stat=hero,
-                change=getattr(new_hero,'level',0) - getattr(old_hero,'level',0),
-                new_value=new_hero.level
-                )
-            LOG.debug(f"{new_player.tag} {new_player.name}: {hero} upgraded to {new_hero.level}.")
-    
-    @coc.PlayerEvents.troop_strength()
-    async def on_player_upgrade_troops(old_player:aPlayer,new_player:aPlayer):
-        troops = TroopAvailability.return_all_unlocked(new_player.town_hall.level)
-        pets = PetAvailability.return_all_unlocked(new_player.town_hall.level)
-        
-        tasks = []
-        tasks.extend([PlayerTasks._check_troop_upgrade(old_player,new_player,t) for t in troops])
-        tasks.extend([PlayerTasks._check_pet_upgrade(old_player,new_player,p) for p in pets])
-        await bounded_gather(*tasks,return_exceptions=True)
-    
-    async def _check_troop_upgrade(old_player:aPlayer,new_player:aPlayer,troop:str):        
-        old_troop = old_player.get_troop(troop)
-        new_troop = new_player.get_troop(troop)
-
-        if getattr(new_troop,'level',0) > getattr(old_troop,'level',0):
-            await aPlayerActivity.create_new(
-                player=new_player,
-                timestamp=new_player.timestamp,
-                activity="upgrade_troop",
-                stat=troop,
-                change=getattr(new_troop,'level',0) - getattr(old_troop,'level',0),
-                new_value=new_troop.level
-                )
-            LOG.debug(f"{new_player.tag} {new_player.name}: {troop} upgraded to {new_troop.level}.")
-    
-    async def _check_pet_upgrade(old_player:aPlayer,new_player:aPlayer,pet:str):
-        old_troop = old_player.get_pet(pet)
-        new_troop = new_player.get_pet(pet)
-
-        if getattr(new_troop,'level',0) > getattr(old_troop,'level',0):
-            await aPlayerActivity.create_new(
-                player=new_player,
-                timestamp=new_player.timestamp,
-                activity="upgrade_troop",
-                stat=pet,
-                change=getattr(new_troop,'level',0) - getattr(old_troop,'level',0),
-                new_value=new_troop.level
-                )
-            LOG.debug(f"{new_player.tag} {new_player.name}: {pet} upgraded to {new_troop.level}.")       
-    
-    @coc.PlayerEvents.spell_strength()
-    async def on_player_upgrade_spells(old_player:aPlayer,new_player:aPlayer):
-        spells = SpellAvailability.return_all_unlocked(new_player.town_hall.level)
-            
-        tasks = [PlayerTasks._check_spell_upgrade(old_player,new_player,s) for s in spells]
-        await bounded_gather(*tasks,return_exceptions=True)
-
-    async def _check_spell_upgrade(old_player:aPlayer,new_player:aPlayer,spell:str):            
-        old_spell = old_player.get_spell(spell)
-        new_spell = new_player.get_spell(spell)
-
-        if getattr(new_spell,'level',0) > getattr(old_spell,'level',0):
-            await aPlayerActivity.create_new(
-                player=new_player,
-                timestamp=new_player.timestamp,
-                activity="upgrade_spell",
-                stat=spell,
-                change=getattr(new_spell,'level',0) - getattr(old_spell,'level',0),
-                new_value=new_spell.level
-                )
-            LOG.debug(f"{new_player.tag} {new_player.name}: {spell} upgraded to {new_spell.level}.")
-    
-    @coc.PlayerEvents.clan_tag()
-    async def on_player_update_clan(old_player:aPlayer,new_player:aPlayer):
-        if old_player.clan_tag:            
-            await aPlayerActivity.create_new(
-                player=old_player,
-                timestamp=new_player.timestamp,
-                activity="leave_clan"
-                )            
-            LOG.debug(f"{old_player.tag} {old_player.name}: Left Clan {old_player.clan.tag} {old_player.clan.name}.")
-        
-        if new_player.clan_tag:
-            await aPlayerActivity.create_new(
-                player=new_player,
-                timestamp=new_player.timestamp,
-                activity="join_clan",
-                )
-            LOG.debug(f"{new_player.tag} {new_player.name}: Joined Clan {new_player.clan.tag} {new_player.clan.name}.")
-    
-    @coc.PlayerEvents.trophies()
-    async def on_player_update_trophies(old_player:aPlayer,new_player:aPlayer):
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="trophies",
-            change=new_player.trophies - old_player.trophies,
-            new_value=new_player.trophies
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Trophies changed to {new_player.trophies} ({new_player.trophies - old_player.trophies}).")
-    
-    @coc.PlayerEvents.attack_wins()
-    async def on_player_update_attack_wins(old_player:aPlayer,new_player:aPlayer):
-        #last_stat = await aPlayerActivity.get_last_for_player_by_type(new_player.tag,'attack_wins')
-        last_stat = None
-        ref_value = last_stat.new_value if last_stat else old_player.attack_wins
-        change = max(0,new_player.attack_wins - ref_value)
-
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="attack_wins",
-            change=change,
-            new_value=new_player.attack_wins
-            )            
-        LOG.debug(f"{new_player.tag} {new_player.name}: Attack Wins changed to {new_player.attack_wins} (+{change}).")
-
-    @coc.PlayerEvents.defense_wins()
-    async def on_player_update_defense_wins(old_player:aPlayer,new_player:aPlayer):
-        #last_stat = await aPlayerActivity.get_last_for_player_by_type(new_player.tag,'defense_wins')
-        last_stat = None
-        ref_value = last_stat.new_value if last_stat else old_player.defense_wins
-        change = max(0,new_player.defense_wins - ref_value)
-
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="defense_wins",
-            change=change,
-            new_value=new_player.defense_wins
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Defense Wins changed to {new_player.defense_wins} (+{change}).")
-    
-    @coc.PlayerEvents.war_stars()
-    async def on_player_update_war_stars(old_player:aPlayer,new_player:aPlayer):
-        #last_stat = await aPlayerActivity.get_last_for_player_by_type(new_player.tag,'war_stars')
-        last_stat = None
-        ref_value = last_stat.new_value if last_stat else old_player.war_stars
-        change = max(0,new_player.war_stars - ref_value)
-
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="war_stars",
-            change=change,
-            new_value=new_player.war_stars
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: War Stars changed to {new_player.war_stars} (+{change}).")
-    
-    @coc.PlayerEvents.donations()
-    async def on_player_update_donations(old_player:aPlayer,new_player:aPlayer):
-        #last_stat = await aPlayerActivity.get_last_for_player_by_type(new_player.tag,'donations_sent')
-        last_stat = None
-        ref_value = last_stat.new_value if last_stat else old_player.donations
-        change = max(0,new_player.donations - ref_value)
-
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="donations_sent",
-            change=change,
-            new_value=new_player.donations
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Donations Sent changed to {new_player.donations} (+{change}).")
-
-    
-    @coc.PlayerEvents.received()
-    async def on_player_update_received(old_player:aPlayer,new_player:aPlayer):
-        #last_stat = await aPlayerActivity.get_last_for_player_by_type(new_player.tag,'donations_received')
-        last_stat = None
-        ref_value = last_stat.new_value if last_stat else old_player.received
-        change = max(0,new_player.received - ref_value)
-
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="donations_received",
-            change=change,
-            new_value=new_player.received
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Donations Rcvd changed to {new_player.received} (+{change}).")
-    
-    @coc.PlayerEvents.clan_capital_contributions()
-    async def on_player_update_capital_contributions(old_player:aPlayer,new_player:aPlayer):        
-        #last_stat = await aPlayerActivity.get_last_for_player_by_type(new_player.tag,'capital_contribution')
-        last_stat = None
-        ref_value = last_stat.new_value if last_stat else old_player.clan_capital_contributions
-        change = max(0,new_player.clan_capital_contributions - ref_value)
-
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="capital_contribution",
-            change=change,
-            new_value=new_player.clan_capital_contributions
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Capital Contribution changed to {new_player.clan_capital_contributions} (+{change}).")
-    
-    @coc.PlayerEvents.capital_gold_looted()
-    async def on_player_update_loot_capital_gold(old_player:aPlayer,new_player:aPlayer):
-        ref_value = old_player.capital_gold_looted
-        change = max(0,new_player.capital_gold_looted - ref_value)
-
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="loot_capital_gold",
-            change=change,
-            new_value=new_player.capital_gold_looted
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Capital Gold Looted changed to {new_player.capital_gold_looted} (+{change}).")
-    
-    @coc.PlayerEvents.loot_gold()
-    async def on_player_update_loot_gold(old_player:aPlayer,new_player:aPlayer):
-        ref_value = old_player.loot_gold
-        change = max(0,new_player.loot_gold - ref_value)
-
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="loot_gold",
-            change=change,
-            new_value=new_player.loot_gold
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Loot Gold changed to {new_player.loot_gold} (+{change}).")
-    
-    @coc.PlayerEvents.loot_gold()
-    async def on_player_update_loot_elixir(old_player:aPlayer,new_player:aPlayer):
-        ref_value = old_player.loot_elixir
-        change = max(0,new_player.loot_elixir - ref_value)
-
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="loot_elixir",
-            change=change,
-            new_value=new_player.loot_elixir
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Loot Elixir changed to {new_player.loot_elixir} (+{change}).")
-        
-    @coc.PlayerEvents.loot_darkelixir()
-    async def on_player_update_loot_darkelixir(old_player:aPlayer,new_player:aPlayer):
-        ref_value = old_player.loot_darkelixir
-        change = max(0,new_player.loot_darkelixir - ref_value)
-
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="loot_darkelixir",
-            change=change,
-            new_value=new_player.loot_darkelixir
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Loot Dark Elixir changed to {new_player.loot_darkelixir} (+{change}).")
-    
-    @coc.PlayerEvents.clan_games()
-    async def on_player_update_clan_games(old_player:aPlayer,new_player:aPlayer):
-        ref_value = old_player.clan_games
-        await aPlayerActivity.create_new(
-            player=new_player,
-            timestamp=new_player.timestamp,
-            activity="clan_games",
-            change=max(0,new_player.clan_games - ref_value),
-            new_value=new_player.clan_games
-            )
-        LOG.debug(f"{new_player.tag} {new_player.name}: Clan Games changed to {new_player.clan_games} (+{max(0,new_player.clan_games - ref_value)}).")
\ No newline at end of file
+    @coc.PlayerEvents.timestamp()
+    async def on_player_update(old_player:aPlayer,new_player:aPlayer):
+        # queueing activities doesn't yield, so thread time is this handler's own CPU time
+        start = time.thread_time()
+
+        activities = PlayerTasks.diff_player(old_player,new_player)
+        if len(activities) > 0:
+            await aPlayerActivity.create_batch(new_player,new_player.timestamp,activities)
+
+        PlayerTasks._cpu_time.append(time.thread_time() - start)
+        PlayerTasks.stats['polls'] += 1
+        PlayerTasks.stats['activities'] += len(activities)
+
+        if len(activities) > 0 and LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug(f"{new_player.tag} {new_player.name}: " + ", ".join([f"{a['activity']} {a.get('stat','')} {a.get('new_value','')}".replace('  ',' ') for a in activities]))
+
+    @staticmethod
+    def diff_player(old_player:aPlayer,new_player:aPlayer) -> List[dict]:
+        """
+        Compares two polls of a player, and returns the `aPlayerActivity.create_new` arguments for every change.
+        """
+        activities = []
+
+        if new_player.name != old_player.name:
+            activities.append({'activity':'change_name','new_value':new_player.name})
+
+        if new_player.war_opted_in != old_player.war_opted_in:
+            if old_player.war_opted_in != None and new_player.war_opted_in != None:
+                activities.append({'activity':'change_war_option','new_value':new_player.war_opted_in})
+
+        new_labels = new_player.label_ids
+        if new_labels != old_player.label_ids:
+            activities.append({'activity':'change_label','new_value':new_labels})
+
+        new_th = new_player.town_hall_level
+        if new_th != old_player.town_hall_level:
+            activities.append({
+                'activity':'upgrade_townhall',
+                'change':new_th - old_player.town_hall_level,
+                'new_value':new_th
+                })
+
+        if new_player.town_hall_weapon != old_player.town_hall_weapon:
+            activities.append({
+                'activity':'upgrade_townhall_weapon',
+                'change':max(0,new_player.town_hall_weapon - old_player.town_hall_weapon),
+                'new_value':new_player.town_hall_weapon
+                })
+
+        for category,name,change,new_level in UnitLevelTable.upgrades(old_player.level_vector,new_player.level_vector,new_th):
+            activities.append({
+                'activity':PlayerTasks.upgrade_activities[category],
+                'stat':name,
+                'change':change,
+                'new_value':new_level
+                })
+
+        if new_player.clan_tag != old_player.clan_tag:
+            if old_player.clan_tag:
+                activities.append({'activity':'leave_clan','player':old_player})
+            if new_player.clan_tag:
+                activities.append({'activity':'join_clan'})
+
+        for attribute,activity,allow_negative in PlayerTasks.counters:
+            new_value = getattr(new_player,attribute)
+            old_value = getattr(old_player,attribute)
+            if new_value != old_value:
+                change = new_value - old_value
+                activities.append({
+                    'activity':activity,
+                    'change':change if allow_negative else max(0,change),
+                    'new_value':new_value
+                    })
+        return activities
@@ -8,8 +8,10 @@ from redbot.core.utils import AsyncIter, bounded_gather
 
 from .default import TaskLoop, GlobalClient
 
+from coc_main.client.coc_client import DiscoveryPriority
 from coc_main.coc_objects.clans.clan import aClan
 from coc_main.coc_objects.events.clan_war_v2 import bClanWar, bWarAttack
+from coc_main.coc_objects.events.war_stats import aSeasonWarStats
 from coc_main.discord.clan_link import ClanGuildLink
 
 from coc_main.utils.constants.coc_constants import WarResult, ClanWarType
@@ -111,7 +113,9 @@ class DefaultWarTasks():
     @coc.WarEvents.state_change()
     async def save_war_on_change(war:bClanWar):
         if war.state in ['preparation','inWar','warEnded']:
-            await war.save_to_database()    
+            await war.save_to_database()
+        if war.state == 'warEnded':
+            await aSeasonWarStats.record_war(war)
     
     @coc.WarEvents.state_change()
     async def sync_clan_war_leagues(war:bClanWar):
@@ -123,13 +127,12 @@ class DefaultWarTasks():
                 await league_group.save_to_database()
 
                 for clan in league_group.clans:
-                    await GlobalClient.coc_client._clan_cache_queue.put(clan.tag)
+                    await GlobalClient.coc_client._clan_cache_queue.put(clan.tag,DiscoveryPriority.TRACKED)
     
     @coc.WarEvents.new_war()
     async def sync_war_participants(war:bClanWar):
-        all_war_participants = GlobalClient.coc_client.get_players([m.tag for m in war.members])
-        async for member in all_war_participants:
-            await GlobalClient.coc_client._player_cache_queue.put(member.tag)
+        for member in war.members:
+            await GlobalClient.coc_client._player_cache_queue.put(member.tag,DiscoveryPriority.TRACKED)
     
     @coc.WarEvents.new_war()
     async def check_war_role(war:bClanWar):
@@ -3,10 +3,14 @@ import os
 import discord
 import pendulum
 import logging
+import zlib
 
 from typing import *
+from collections import defaultdict
+from time import perf_counter
 
 from discord.ext import tasks
+from pymongo import UpdateMany
 
 from redbot.core import Config, commands
 from redbot.core.bot import Red
@@ -46,6 +50,14 @@ class ClashOfClansDataController(commands.Cog,GlobalClient):
             }
         self.config.register_global(**default_global)
         self.control_lock = asyncio.Lock()
+        self.cycle_stats = {}
+
+        self._unassigned = {
+            "$or": [
+                {"_cycle_id": {"$exists": False}},
+                {"_cycle_id": {"$lt": 0}}
+                ]
+            }
 
     def format_help_for_context(self, ctx: commands.Context) -> str:
         context = super().format_help_for_context(ctx)
@@ -119,129 +131,201 @@ class ClashOfClansDataController(commands.Cog,GlobalClient):
             return
         
         async with self.control_lock:
-            await self.cleanup_cycle()
+            max_cycle = await self.config.max_cycle()
+            batch_size = await self.config.slots_per_cycle()
 
-            cycles = [0,1]
-            c_iter = AsyncIter(cycles)
-            async for cycle_num in c_iter:
-                await self.assign_to_cycle(cycle_num)
+            await self.cleanup_cycle(max_cycle)
+            await self.assign_registered()
+            await self.assign_to_cycles(max_cycle,batch_size)
 
-    async def assign_to_cycle(self,cycle_num:int):
-        # 0 = Registered Players & Clans
-        if cycle_num == 0:
-            query = {
-                "$and": [
-                    {"$or": [
-                        {"_cycle_id": {"$exists": False}},
-                        {"_cycle_id": {"$lt": 0}}
-                        ]
-                    },
-                    {"$or": [
-                        {"discord_user": {"$exists":True,"$gt":0}},
-                        {"is_member": True}
-                        ]}
-                    ]
-                }
-            count = 0
-            find_players = self.database.db__player.find(query).limit(1000)
-            async for player in find_players:
-                await self.database.db__player.update_one(
-                    {"_id": player['_id']},
-                    {"$set": {"_cycle_id": cycle_num}}
-                    )
-                count += 1
-            if count > 0:
-                LOG.info(f"Assigned {count} Players to Cycle {cycle_num}.")
-
-            count = 0                    
-            clans = []
-            try:
-                registered_clans = await self.coc_client.get_registered_clans()
-            except:
-                pass
-            else:
-                clans.extend([c.tag for c in registered_clans])
-                            
-            try:
-                war_league_clans = await self.coc_client.get_war_league_clans()
-            except:
-                pass
-            else:
-                clans.extend([c.tag for c in war_league_clans])
+    ##################################################
+    ### CYCLE ASSIGNMENT
+    ### 0 = Registered Players & Clans
+    ### 1 to max_cycle = All other Players / Clans, balanced by hashed tag
+    ##################################################
+    @staticmethod
+    def cycle_for_tag(tag:str,max_cycle:int) -> int:
+        return 1 + zlib.crc32(tag.encode()) % max(1,max_cycle)
+
+    def _record_cycle(self,cycle_num:int,players:int,clans:int,runtime:float):
+        stats = self.cycle_stats.setdefault(cycle_num,{'players':0,'clans':0,'runtime':0,'last':None})
+        stats['players'] = players
+        stats['clans'] = clans
+        stats['runtime'] = runtime
+        stats['last'] = pendulum.now()
+        if players > 0 or clans > 0:
+            LOG.info(f"Cycle {cycle_num}: assigned {players} Players and {clans} Clans in {runtime:.3f}s.")
+
+    async def assign_registered(self):
+        st = perf_counter()
+        query = {
+            "$and": [
+                self._unassigned,
+                {"$or": [
+                    {"discord_user": {"$exists":True,"$gt":0}},
+                    {"is_member": True}
+                    ]}
+                ]
+            }
+        players = await self.database.db__player.update_many(query,{"$set": {"_cycle_id": 0}})
+
+        clans = []
+        try:
+            registered_clans = await self.coc_client.get_registered_clans()
+        except:
+            pass
+        else:
+            clans.extend([c.tag for c in registered_clans])
+                        
+        try:
+            war_league_clans = await self.coc_client.get_war_league_clans()
+        except:
+            pass
+        else:
+            clans.extend([c.tag for c in war_league_clans])
+
+        clan_count = 0
+        if len(clans) > 0:
             query = {
                 "$and": [
-                    {"$or": [
-                        {"_cycle_id": {"$exists": False}},
-                        {"_cycle_id": {"$lt": 0}}
-                        ]
-                    },
+                    self._unassigned,
                     {"_id": {"$in": clans}}
                     ]
                 }
+            result = await self.database.db__clan.update_many(query,{"$set": {"_cycle_id": 0}})
+            clan_count = result.modified_count
+        
+        self._record_cycle(0,players.modified_count,clan_count,perf_counter()-st)
 
-            find_clans = self.database.db__clan.find(query).limit(1000)
-            async for clan in find_clans:
-                await self.database.db__clan.update_one(
-                    {"_id": clan['_id']},
-                    {"$set": {"_cycle_id": cycle_num}}
-                    )
-                count += 1
-            if count > 0:
-                LOG.info(f"Assigned {count} Clans to Cycle {cycle_num}.")
-
-        # 1 = All other Players / Clans
-        elif cycle_num == 1:
-            query = {
-                "$or": [
-                    {"_cycle_id": {"$exists": False}},
-                    {"_cycle_id": {"$lt": 0}}
-                    ]
-                }        
-            count = 0
-            find_players = self.database.db__player.find(query).limit(1000)
-            async for player in find_players:
-                await self.database.db__player.update_one(
-                    {"_id": player['_id']},
-                    {"$set": {"_cycle_id": cycle_num}}
-                    )
-                count += 1
-            if count > 0:
-                LOG.info(f"Assigned {count} Players to Cycle {cycle_num}.")
+    async def _assign_collection(self,collection:str,max_cycle:int,batch_size:int) -> Dict[int,int]:
+        db_query = self.database[collection].find(self._unassigned,{'_id':1}).limit(batch_size)
+        by_cycle = defaultdict(list)
+        async for doc in db_query:
+            by_cycle[self.cycle_for_tag(doc['_id'],max_cycle)].append(doc['_id'])
         
-            query = {
-                "$or": [
-                    {"_cycle_id": {"$exists": False}},
-                    {"_cycle_id": {"$lt": 0}}
-                    ]
-                }        
-            count = 0
-            find_clans = self.database.db__clan.find(query).limit(1000)
-            async for clan in find_clans:
-                await self.database.db_clan.update_one(
-                    {"_id": clan['_id']},
-                    {"$set": {"_cycle_id": cycle_num}}
-                    )
-                count += 1
-            if count > 0:
-                LOG.info(f"Assigned {count} Clans to Cycle {cycle_num}.")
-
-    async def cleanup_cycle(self):
-        query = {
-            "$and": [
-                {"_cycle_id": {"$exists": True}},
-                {"_cycle_id": {"$gt": 1}}
-                ]
-            }
-        find_players = self.database.db__player.find(query).limit(1000)
-        async for player in find_players:
-            await self.database.db__player.update_one(
-                {"_id": player['_id']},
-                {"$unset": {"_cycle_id": 1}}
+        counts = {}
+        for cycle_num,tags in by_cycle.items():
+            result = await self.database[collection].update_many(
+                {"$and": [self._unassigned,{"_id": {"$in": tags}}]},
+                {"$set": {"_cycle_id": cycle_num}}
+                )
+            counts[cycle_num] = result.modified_count
+        return counts
+
+    async def assign_to_cycles(self,max_cycle:int,batch_size:int):
+        st = perf_counter()
+        players = await self._assign_collection('db__player',max_cycle,batch_size)
+        clans = await self._assign_collection('db__clan',max_cycle,batch_size)
+        runtime = perf_counter() - st
+
+        for cycle_num in range(1,max_cycle+1):
+            self._record_cycle(cycle_num,players.get(cycle_num,0),clans.get(cycle_num,0),runtime)
+
+    async def cleanup_cycle(self,max_cycle:int):
+        query = {"_cycle_id": {"$gt": max_cycle}}
+        players = await self.database.db__player.update_many(query,{"$unset": {"_cycle_id": 1}})
+        clans = await self.database.db__clan.update_many(query,{"$unset": {"_cycle_id": 1}})
+        if players.modified_count > 0 or clans.modified_count > 0:
+            LOG.info(f"Released {players.modified_count} Players and {clans.modified_count} Clans from retired cycles.")
+
+    async def rebalance_cycles(self,max_cycle:int) -> Dict[int,int]:
+        """
+        Moves Players and Clans in general cycles to the cycle their tag hashes to.
+        """
+        moved = defaultdict(int)
+        for collection in ['db__player','db__clan']:
+            by_cycle = defaultdict(list)
+            db_query = self.database[collection].find({"_cycle_id": {"$gte": 1}},{'_id':1,'_cycle_id':1})
+            async for doc in db_query:
+                target = self.cycle_for_tag(doc['_id'],max_cycle)
+                if doc['_cycle_id'] != target:
+                    by_cycle[target].append(doc['_id'])
+            
+            for cycle_num,tags in by_cycle.items():
+                ops = [UpdateMany({"_id": {"$in": tags[i:i+10000]}},{"$set": {"_cycle_id": cycle_num}}) for i in range(0,len(tags),10000)]
+                result = await self.database[collection].bulk_write(ops,ordered=False)
+                moved[cycle_num] += result.modified_count
+        return moved
+
+    async def cycle_counts(self) -> Dict[int,Dict[str,int]]:
+        counts = defaultdict(lambda: {'players':0,'clans':0})
+        pipeline = [{"$group": {"_id": "$_cycle_id","count": {"$sum": 1}}}]
+        async for doc in self.database.db__player.aggregate(pipeline):
+            counts[doc['_id'] if doc['_id'] is not None else -1]['players'] += doc['count']
+        async for doc in self.database.db__clan.aggregate(pipeline):
+            counts[doc['_id'] if doc['_id'] is not None else -1]['clans'] += doc['count']
+        return counts
+    
+    ############################################################
+    #####
+    ##### COMMANDS
+    #####
+    ############################################################
+    async def status_embed(self):
+        max_cycle = await self.config.max_cycle()
+        counts = await self.cycle_counts()
+
+        embed = await clash_embed(self.bot,
+            title="**Clash of Clans Data Controller**",
+            message=f"### {pendulum.now().format('dddd, DD MMM YYYY HH:mm:ssZZ')}"
+                + f"\n\nGeneral Cycles: {max_cycle}"
+                + f"\nAssignment Batch: {await self.config.slots_per_cycle():,}",
+            timestamp=pendulum.now()
+            )
+        
+        for cycle_num in sorted(set(counts.keys()) | set(self.cycle_stats.keys())):
+            stats = self.cycle_stats.get(cycle_num,{})
+            embed.add_field(
+                name=f"**Cycle {cycle_num}**" if cycle_num >= 0 else "**Unassigned**",
+                value="```ini"
+                    + f"\n{'[Players]':<10} {counts[cycle_num]['players']:,}"
+                    + f"\n{'[Clans]':<10} {counts[cycle_num]['clans']:,}"
+                    + (f"\n{'[Added]':<10} {stats['players']:,} / {stats['clans']:,}"
+                    + f"\n{'[Runtime]':<10} {stats['runtime']:.3f}s" if stats else "")
+                    + "```"
+                    + (f"Last: <t:{stats['last'].int_timestamp}:R>" if stats.get('last') else ""),
+                inline=True
                 )
+        return embed
+
+    @commands.group(name="coccontrol")
+    @commands.is_owner()
+    async def command_group_data_controller(self,ctx):
+        """Manage the Clash of Clans Data Controller."""
+        if not ctx.invoked_subcommand:
+            pass
+
+    @command_group_data_controller.command(name="status")
+    @commands.is_owner()
+    async def subcommand_data_controller_status(self,ctx:commands.Context):
+        """Data Controller Status."""
+
+        embed = await self.status_embed()
+        await ctx.reply(embed=embed)
+
+    @command_group_data_controller.command(name="cycles")
+    @commands.is_owner()
+    async def subcommand_data_controller_cycles(self,ctx:commands.Context,max_cycle:int):
+        """Set the number of general cycles, and rebalance existing assignments."""
+
+        if max_cycle < 1:
+            return await ctx.reply("There must be at least 1 general cycle.")
+        
+        async with ctx.typing():
+            async with self.control_lock:
+                await self.config.max_cycle.set(max_cycle)
+                await self.cleanup_cycle(max_cycle)
+                moved = await self.rebalance_cycles(max_cycle)
+        
+        await ctx.reply(f"General cycles set to {max_cycle}. Rebalanced {sum(moved.values()):,} Players/Clans.")
+
+    @command_group_data_controller.command(name="batch")
+    @commands.is_owner()
+    async def subcommand_data_controller_batch(self,ctx:commands.Context,batch_size:int):
+        """Set the maximum number of Players/Clans assigned per pass."""
+
+        if batch_size < 1:
+            return await ctx.reply("Batch size must be at least 1.")
         
-        find_clans = self.database.db__clan.find(query).limit(1000)
-        async for clan in find_clans:
-            await self.database.db__clan.update_one(
-                {"_id": clan['_id']},
-                {"$unset": {"_cycle_id": 1}}
-                )
\ No newline at end of file
+        await self.config.slots_per_cycle.set(batch_size)
+        await ctx.reply(f"Assignment batch size set to {batch_size:,}.")
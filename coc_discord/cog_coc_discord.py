@@ -22,6 +22,7 @@ from coc_main.coc_objects.clans.clan import aClan
 from coc_main.discord.clan_link import ClanGuildLink
 from coc_main.discord.member import aMember
 from coc_main.discord.guild import aGuild
+from coc_main.discord.render_cache import MessageRenderCache
 
 from coc_main.utils.constants.coc_emojis import EmojisClash, EmojisCapitalHall, EmojisLeagues
 from coc_main.utils.constants.ui_emojis import EmojisUI
@@ -38,6 +39,8 @@ from .panels.clan_panel import GuildClanPanel
 from .feeds.tasks import FeedTasks
 from .feeds.clan_feed import ClanDataFeed
 from .feeds.reminders import EventReminder
+from .feeds.reminder_scheduler import WarReminderScheduler
+from .feeds.send_queue import FeedSendQueue
 
 from .exceptions import InvalidApplicationChannel
 from .autocomplete import autocomplete_guild_apply_panels, autocomplete_guild_clan_panels
@@ -54,7 +57,7 @@ class ClashOfClansDiscord(commands.Cog,GlobalClient):
 
     def __init__(self):
         self.loop_update_lock = asyncio.Lock()
-        self.war_reminder_lock = asyncio.Lock()
+        self.war_reminders = WarReminderScheduler()
     
     def format_help_for_context(self, ctx: commands.Context) -> str:
         context = super().format_help_for_context(ctx)
@@ -91,8 +94,10 @@ class ClashOfClansDiscord(commands.Cog,GlobalClient):
             FeedTasks.on_clan_donation_change,
             FeedTasks.on_clan_member_join_feed,
             FeedTasks.on_clan_member_leave_feed,
-            FeedTasks.on_clan_member_join_role 
+            FeedTasks.on_clan_member_join_role,
+            self.war_reminders.on_war_state_change
             )
+        EventReminder.scheduler = self.war_reminders
     
         ClanRaidLoop.add_raid_ongoing_event(FeedTasks._setup_raid_reminder)
         ClanRaidLoop.add_raid_end_event(FeedTasks._raid_ended_feed)
@@ -111,7 +116,8 @@ class ClashOfClansDiscord(commands.Cog,GlobalClient):
         tasks = [_update_app_panels_start(guild) async for guild in guild_iter]
         await bounded_gather(*tasks)
 
-        self.run_war_reminders.start()
+        self.war_reminders.start()
+        self.reconcile_war_reminders.start()
         self.update_application_panels.start()
         self.update_clan_panels.start()
         self.update_guild_clocks.start()
@@ -124,16 +130,20 @@ class ClashOfClansDiscord(commands.Cog,GlobalClient):
         self.save_member_roles.stop()
         self.update_guild_clocks.stop()
         self.update_clan_loop.stop()
-        self.run_war_reminders.stop()
+        self.reconcile_war_reminders.stop()
+        self.war_reminders.stop()
+        EventReminder.scheduler = None
 
         self.coc_client.remove_events(
             FeedTasks.on_clan_donation_change,
             FeedTasks.on_clan_member_join_feed,
             FeedTasks.on_clan_member_leave_feed,
-            FeedTasks.on_clan_member_join_role 
+            FeedTasks.on_clan_member_join_role,
+            self.war_reminders.on_war_state_change
             )
         ClanRaidLoop.remove_raid_ongoing_event(FeedTasks._setup_raid_reminder)
         ClanRaidLoop.remove_raid_end_event(FeedTasks._raid_ended_feed)
+        await FeedSendQueue.close()
         LOG.handlers.clear()
     
     ############################################################
@@ -188,6 +198,33 @@ class ClashOfClansDiscord(commands.Cog,GlobalClient):
 
         return f"{user.display_name} completed the application process, but the ticket channel could not be found."
 
+    ############################################################
+    #####
+    ##### FEED QUEUE STATUS
+    #####
+    ############################################################
+    @commands.command(name="feedqueue")
+    @commands.is_owner()
+    async def command_feed_queue_status(self,ctx:commands.Context):
+        """Status of the outbound Clan Feed queue."""
+
+        stats = FeedSendQueue.stats
+        mean_latency, max_latency = FeedSendQueue.latency()
+        embed = await clash_embed(
+            context=ctx,
+            title="**Clan Feed Queue**",
+            message="```ini"
+                + f"\n{'[Depth]':<14} {FeedSendQueue.queue_depth():,} ({len(FeedSendQueue._queues):,} channels)"
+                + f"\n{'[Queued]':<14} {stats['queued']:,}"
+                + f"\n{'[Sent]':<14} {stats['embeds']:,} embeds in {stats['messages']:,} messages"
+                + f"\n{'[Rate Limited]':<14} {stats['rate_limited']:,}"
+                + f"\n{'[Failed]':<14} {stats['failed']:,}"
+                + f"\n{'[Latency]':<14} {mean_latency:.1f}s mean / {max_latency:.1f}s max"
+                + "```",
+            timestamp=pendulum.now()
+            )
+        await ctx.reply(embed=embed)
+    
     ############################################################
     #####
     ##### APPLICATION CHANNEL LISTENER
@@ -207,6 +244,20 @@ class ClashOfClansDiscord(commands.Cog,GlobalClient):
             except Exception as e:
                 LOG.exception(f"Error in recruiting_ticket_listener: {e}")
     
+    @commands.Cog.listener("on_raw_message_delete")
+    async def panel_message_delete(self,payload:discord.RawMessageDeleteEvent):
+        try:
+            await MessageRenderCache.invalidate(payload.message_id)
+        except Exception:
+            LOG.exception("Error in panel_message_delete.")
+    
+    @commands.Cog.listener("on_raw_bulk_message_delete")
+    async def panel_message_bulk_delete(self,payload:discord.RawBulkMessageDeleteEvent):
+        try:
+            await MessageRenderCache.invalidate(*payload.message_ids)
+        except Exception:
+            LOG.exception("Error in panel_message_bulk_delete.")
+    
     @commands.Cog.listener("on_member_update")
     async def member_role_sync(self,before:discord.Member,after:discord.Member):
         try:
@@ -860,27 +911,14 @@ class ClashOfClansDiscord(commands.Cog,GlobalClient):
             self.coc_client.add_war_updates(*[reminder.tag for reminder in reminders])
             self.coc_data._raid_loop.add_to_loop(*loop_tags)
     
-    @tasks.loop(minutes=1)
-    async def run_war_reminders(self):
-        if self.war_reminder_lock.locked():
-            return
-        
-        async with self.war_reminder_lock:
-            reminders = await EventReminder.get_war_reminders()
-            a_iter = AsyncIter(reminders)
-            async for reminder in a_iter:
-                try:
-                    try:
-                        war = await self.coc_client.get_current_war(reminder.tag)
-                    except (coc.Maintenance,coc.NotFound,coc.GatewayError):
-                        continue
-                    else:
-                        if war.type in reminder.sub_type:
-                            war_clan = war.get_clan(reminder.tag)
-                            remind_members = [m for m in war_clan.members if m.unused_attacks > 0]
-                            await reminder.send_reminder(war,*remind_members)
-                except Exception:
-                    LOG.exception(f"Error sending War Reminder for {reminder.tag}")
+    @tasks.loop(minutes=60)
+    async def reconcile_war_reminders(self):
+        # War Reminders fire from the scheduler at their deadlines.
+        # This only picks up reminders and wars that were missed by events.
+        try:
+            await self.war_reminders.reconcile()
+        except Exception:
+            LOG.exception(f"Error reconciling War Reminders.")
     
     @tasks.loop(minutes=5)
     async def save_member_roles(self):
@@ -888,9 +926,10 @@ class ClashOfClansDiscord(commands.Cog,GlobalClient):
             lock = ClashOfClansDiscord._guild_locks[guild.id]
             async with lock:
                 try:
-                    a_iter = AsyncIter(guild.members)
-                    tasks = [aMember.save_user_roles(member.id,guild.id) async for member in a_iter if not member.bot]
-                    await bounded_gather(*tasks,limit=10)
+                    m_guild = aGuild(guild.id)
+                    stats = await m_guild.sync_member_roles()
+                    if stats['edited'] > 0:
+                        LOG.info(f"{guild.id} {guild.name}: Synced roles for {stats['edited']} of {stats['members']} members.")
 
                 except coc.ClashOfClansException:
                     pass
@@ -4,15 +4,16 @@ import logging
 
 from typing import *
 
-from redbot.core.utils import AsyncIter, bounded_gather
+from redbot.core.utils import AsyncIter
 
 from coc_main.client.global_client import GlobalClient
 from coc_main.coc_objects.clans.clan import aClan
 
 from coc_main.utils.constants.coc_emojis import EmojisClash
-from coc_main.utils.components import clash_embed, get_bot_webhook
+from coc_main.utils.components import clash_embed
 
 from .clan_feed import ClanDataFeed
+from .send_queue import FeedSendQueue
 
 LOG = logging.getLogger("coc.discord")
 type = 2
@@ -53,9 +54,8 @@ class ClanDonationFeed(ClanDataFeed):
 
                 if len([m for m in calc_member_donation if (m.donated_chg + m.received_chg) > 0]) > 0:
                     embed = await cls.donation_embed(clan,calc_member_donation)
-                    a_iter = AsyncIter(clan_feeds)
-                    tasks = [feed.send_to_discord(clan,embed) async for feed in a_iter]
-                    await bounded_gather(*tasks,return_exceptions=True,limit=1)
+                    async for feed in AsyncIter(clan_feeds):
+                        await feed.send_to_discord(clan,embed)
 
         except Exception:
             LOG.exception(f"Error building Donation Feed.")
@@ -86,19 +86,11 @@ class ClanDonationFeed(ClanDataFeed):
     async def send_to_discord(self,clan,embed):
         try:
             if self.channel:
-                webhook = await get_bot_webhook(self.bot,self.channel)
-                if isinstance(self.channel,discord.Thread):
-                    await webhook.send(
-                        username=clan.name,
-                        avatar_url=clan.badge,
-                        embed=embed,
-                        thread=self.channel
-                        )
-                else:
-                    await webhook.send(
-                        username=clan.name,
-                        avatar_url=clan.badge,
-                        embed=embed
-                        )
+                FeedSendQueue.enqueue(
+                    self.channel,
+                    embed,
+                    username=clan.name,
+                    avatar_url=clan.badge
+                    )
         except Exception:
             LOG.exception(f"Error sending Donation Feed to Discord.")
\ No newline at end of file
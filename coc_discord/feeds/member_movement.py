@@ -4,16 +4,17 @@ import pendulum
 import logging
 
 from typing import *
-from redbot.core.utils import AsyncIter, bounded_gather
+from redbot.core.utils import AsyncIter
 
 from coc_main.client.global_client import GlobalClient
 from coc_main.coc_objects.players.player import aPlayer
 from coc_main.coc_objects.clans.clan import aClan
 
 from coc_main.utils.constants.coc_emojis import EmojisClash, EmojisLeagues
-from coc_main.utils.components import clash_embed, get_bot_webhook
+from coc_main.utils.components import clash_embed
 
 from .clan_feed import ClanDataFeed
+from .send_queue import FeedSendQueue
 
 LOG = logging.getLogger("coc.discord")
 type = 1
@@ -36,9 +37,8 @@ class ClanMemberFeed(ClanDataFeed):
                 p = await cls.coc_client.get_player(player.tag)
 
                 embed = await cls.join_embed(clan,p)
-                a_iter = AsyncIter(clan_feeds)
-                tasks = [feed.send_to_discord(clan,embed) async for feed in a_iter]
-                await bounded_gather(*tasks,return_exceptions=True,limit=1)
+                async for feed in AsyncIter(clan_feeds):
+                    await feed.send_to_discord(clan,embed)
 
         except Exception:
             LOG.exception(f"Error building Member Join Feed.")
@@ -72,9 +72,8 @@ class ClanMemberFeed(ClanDataFeed):
                 p = await cls.coc_client.get_player(player.tag)
 
                 embed = await cls.leave_embed(clan,p)
-                a_iter = AsyncIter(clan_feeds)
-                tasks = [feed.send_to_discord(clan,embed) async for feed in a_iter]
-                await bounded_gather(*tasks,return_exceptions=True,limit=1)
+                async for feed in AsyncIter(clan_feeds):
+                    await feed.send_to_discord(clan,embed)
 
         except Exception:
             LOG.exception(f"Error building Member Leave Feed.")
@@ -105,19 +104,11 @@ class ClanMemberFeed(ClanDataFeed):
         try:
             if not self.channel:
                 return
-            webhook = await get_bot_webhook(self.bot,self.channel)
-            if isinstance(self.channel,discord.Thread):
-                await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    embed=embed,
-                    thread=self.channel
-                    )
-            else:
-                await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    embed=embed
-                    )
+            FeedSendQueue.enqueue(
+                self.channel,
+                embed,
+                username=clan.name,
+                avatar_url=clan.badge
+                )
         except Exception:
             LOG.exception(f"Error sending Member Feed to Discord.")
\ No newline at end of file
@@ -0,0 +1,91 @@
+import io
+import threading
+
+from typing import *
+
+from pathlib import Path
+from PIL import Image, ImageDraw, ImageFont
+
+##################################################
+#####
+##### RAID RESULTS IMAGE
+#####
+##################################################
+# Runs in the bot's thread pool: PIL releases the GIL while it draws and encodes.
+# Template images and fonts are loaded once, by `load_assets`, and shared. Renders are serialized, as fonts aren't safe to share across concurrent draws.
+ASSET_PATH = str(Path(__file__).parent) + '/ImgGen'
+
+_assets:Dict[str,Any] = {}
+_render_lock = threading.Lock()
+
+def load_assets(asset_path:str=ASSET_PATH):
+    font = asset_path + '/SCmagic.ttf'
+    background = Image.open(asset_path + '/raidweek.png')
+    background.load()
+    arix_logo = Image.open(asset_path + '/arix_logo_mid.PNG')
+    arix_logo.load()
+
+    _assets.update({
+        'background': background,
+        'arix_logo': arix_logo,
+        'arix_logo_mask': arix_logo.convert("RGBA"),
+        'clan_name': ImageFont.truetype(font, 30),
+        'total_medal': ImageFont.truetype(font, 60),
+        'boxes': ImageFont.truetype(font, 30),
+        'split_medal': ImageFont.truetype(font, 25)
+        })
+
+def render_results_image(
+    fp:str,
+    clan_name:str,
+    date_str:str,
+    badge_data:Optional[bytes],
+    is_emoji_badge:bool,
+    values:Dict[str,int]) -> str:
+    """
+    Composes the Raid Weekend results image, and saves it to `fp`.
+    """
+    with _render_lock:
+        if len(_assets) == 0:
+            load_assets()
+        return _render(fp,clan_name,date_str,badge_data,is_emoji_badge,values)
+
+def _render(
+    fp:str,
+    clan_name:str,
+    date_str:str,
+    badge_data:Optional[bytes],
+    is_emoji_badge:bool,
+    values:Dict[str,int]) -> str:
+
+    background = _assets['background'].copy()
+    draw = ImageDraw.Draw(background)
+    stroke = 2
+    white = (255, 255, 255)
+    black = (0, 0, 0)
+
+    badge = Image.open(io.BytesIO(badge_data)).resize((200,200)) if badge_data else None
+    if badge and is_emoji_badge:
+        background.paste(badge, (115, 100), badge.convert("RGBA"))
+        draw.text((500, 970), f"{clan_name}\n{date_str}", anchor="lm", fill=white, stroke_width=stroke, stroke_fill=black, font=_assets['clan_name'])
+    elif badge:
+        background.paste(badge, (125, 135), badge.convert("RGBA"))
+        draw.text((225, 110), f"{clan_name}", anchor="mm", fill=white, stroke_width=stroke, stroke_fill=black, font=_assets['clan_name'])
+        draw.text((500, 970), f"{date_str}", anchor="lm", fill=white, stroke_width=stroke, stroke_fill=black, font=_assets['clan_name'])
+
+    background.paste(_assets['arix_logo'], (400, 920), _assets['arix_logo_mask'])
+
+    draw.text((750, 250), f"{values['total_medals']:,}", anchor="mm", fill=white, stroke_width=4, stroke_fill=black, font=_assets['total_medal'])
+
+    draw.text((155, 585), f"{values['total_loot']:,}", anchor="lm", fill=white, stroke_width=stroke, stroke_fill=black, font=_assets['boxes'])
+    draw.text((870, 585), f"{values['offense_raids_completed']}", anchor="lm", fill=white, stroke_width=stroke, stroke_fill=black, font=_assets['boxes'])
+    draw.text((1115, 585), f"{values['defense_raids_completed']}", anchor="lm", fill=white, stroke_width=stroke, stroke_fill=black, font=_assets['boxes'])
+
+    draw.text((155, 817), f"{values['attack_count']}", anchor="lm", fill=white, stroke_width=stroke, stroke_fill=black, font=_assets['boxes'])
+    draw.text((870, 817), f"{values['destroyed_district_count']}", anchor="lm", fill=white, stroke_width=stroke, stroke_fill=black, font=_assets['boxes'])
+
+    draw.text((550, 370), f"{values['offensive_medals']}", anchor="lm", fill=white, stroke_width=stroke, stroke_fill=black, font=_assets['split_medal'])
+    draw.text((1245, 370), f"{values['defensive_medals']}", anchor="lm", fill=white, stroke_width=stroke, stroke_fill=black, font=_assets['split_medal'])
+
+    background.save(fp, format="png", compress_level=1)
+    return fp
@@ -0,0 +1,218 @@
+import asyncio
+import coc
+import heapq
+import itertools
+import pendulum
+import logging
+import time
+
+from typing import *
+
+from coc_main.client.global_client import GlobalClient
+from coc_main.coc_objects.events.clan_war_v2 import bClanWar
+
+from .reminders import EventReminder
+
+LOG = logging.getLogger("coc.discord")
+
+class WarReminderScheduler(GlobalClient):
+    """
+    Fires War Reminders at their deadlines.
+
+    A reminder's next deadline is computed from its clan's current war end time and the largest interval still pending. The scheduler keeps a heap of deadlines, and sleeps until the earliest one is due.
+
+    War end times are kept from war state changes, and from `reconcile()`. It only queries clans that don't have a known ongoing war.
+
+    The live war is fetched only when a reminder fires, to find the members who still have unused attacks.
+    """
+    valid_states = ['preparation','inWar']
+
+    def __init__(self):
+        self._reminders:Dict[str,EventReminder] = {}
+        self._wars:Dict[str,dict] = {}
+        self._heap:List[Tuple[float,int,str]] = []
+        self._deadlines:Dict[str,float] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+        self.fired = 0
+        self.api_calls = 0
+
+    @property
+    def stats(self) -> dict:
+        next_deadline = min(self._deadlines.values()) if len(self._deadlines) > 0 else None
+        return {
+            'reminders': len(self._reminders),
+            'wars': len(self._wars),
+            'scheduled': len(self._deadlines),
+            'next': pendulum.from_timestamp(next_deadline) if next_deadline else None,
+            'fired': self.fired,
+            'api_calls': self.api_calls
+            }
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    def _reminders_for_clan(self,tag:str) -> List[EventReminder]:
+        return [r for r in self._reminders.values() if r.tag == tag]
+
+    ##################################################
+    ##### SCHEDULING
+    ##################################################
+    def _schedule(self,reminder:EventReminder,fire_at:Optional[float]=None):
+        if fire_at is None:
+            war = self._wars.get(reminder.tag)
+            if not war or war['type'] not in reminder.sub_type or not reminder.next_reminder:
+                self._deadlines.pop(reminder.id,None)
+                return
+            # 1s past the crossing, so that the interval has been crossed when the reminder fires
+            fire_at = war['end_time'].int_timestamp - (reminder.next_reminder * 3600) + 1
+
+        if self._deadlines.get(reminder.id) == fire_at:
+            return
+        self._deadlines[reminder.id] = fire_at
+        heapq.heappush(self._heap,(fire_at,next(self._seq),reminder.id))
+        self._wakeup.set()
+
+    async def add_reminder(self,reminder:EventReminder):
+        self._reminders[reminder.id] = reminder
+        war = self._wars.get(reminder.tag)
+        if war:
+            await reminder.refresh_intervals(war['end_time'] - pendulum.now())
+        self._schedule(reminder)
+
+    def remove_reminder(self,reminder_id:str):
+        self._reminders.pop(reminder_id,None)
+        self._deadlines.pop(reminder_id,None)
+
+    async def update_war(self,tag:str,war:Optional[bClanWar]):
+        reminders = self._reminders_for_clan(tag)
+
+        if not war or war.state not in self.valid_states:
+            self._wars.pop(tag,None)
+            for r in reminders:
+                self._deadlines.pop(r.id,None)
+            return
+
+        previous = self._wars.get(tag)
+        self._wars[tag] = {
+            'id': war._id,
+            'type': war.type,
+            'end_time': war.end_time
+            }
+        if not previous or previous['id'] != war._id:
+            # new war: all intervals still ahead of us are pending again
+            for r in reminders:
+                await r.refresh_intervals(war.end_time - pendulum.now())
+        for r in reminders:
+            self._schedule(r)
+
+    async def reconcile(self):
+        """
+        Reloads War Reminders, and looks up the current war for clans without a known ongoing war.
+        """
+        async with self._lock:
+            reminders = await EventReminder.get_war_reminders()
+            self._reminders = {r.id:r for r in reminders}
+            for rid in [k for k in self._deadlines if k not in self._reminders]:
+                del self._deadlines[rid]
+
+            now = pendulum.now()
+            for tag in set([r.tag for r in reminders]):
+                known = self._wars.get(tag)
+                if known and known['end_time'] > now:
+                    for r in self._reminders_for_clan(tag):
+                        self._schedule(r)
+                    continue
+                try:
+                    war = await self.coc_client.get_current_war(tag)
+                except (coc.Maintenance,coc.NotFound,coc.GatewayError,coc.PrivateWarLog):
+                    continue
+                finally:
+                    self.api_calls += 1
+                await self.update_war(tag,war)
+
+    @coc.WarEvents.state_change()
+    async def on_war_state_change(self,war:bClanWar):
+        for tag in [war.clan_1.tag,war.clan_2.tag]:
+            if len(self._reminders_for_clan(tag)) > 0:
+                await self.update_war(tag,war)
+
+    ##################################################
+    ##### RUNNER
+    ##################################################
+    async def _run(self):
+        while True:
+            try:
+                while len(self._heap) > 0 and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+
+                self._wakeup.clear()
+                if len(self._heap) == 0:
+                    await self._wakeup.wait()
+                    continue
+
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(),timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                fire_at,_,reminder_id = heapq.heappop(self._heap)
+                del self._deadlines[reminder_id]
+                await self._fire(reminder_id)
+
+            except asyncio.CancelledError:
+                return
+            except Exception:
+                LOG.exception("Error in War Reminder Scheduler.")
+
+    async def _fire(self,reminder_id:str):
+        reminder = self._reminders.get(reminder_id)
+        if not reminder:
+            return
+
+        if not reminder.channel:
+            await reminder.delete()
+            self.remove_reminder(reminder_id)
+            return
+
+        if self.coc_client.maintenance:
+            self._schedule(reminder,time.time() + 60)
+            return
+
+        try:
+            war = await self.coc_client.get_current_war(reminder.tag)
+        except (coc.Maintenance,coc.GatewayError):
+            self._schedule(reminder,time.time() + 60)
+            return
+        except (coc.NotFound,coc.PrivateWarLog):
+            war = None
+        finally:
+            self.api_calls += 1
+
+        known = self._wars.get(reminder.tag)
+        if war and known and war._id == known['id'] and war.type in reminder.sub_type:
+            try:
+                war_clan = war.get_clan(reminder.tag)
+                remind_members = [m for m in war_clan.members if m.unused_attacks > 0]
+                await reminder.send_reminder(war,*remind_members)
+                self.fired += 1
+            except Exception:
+                LOG.exception(f"Error sending War Reminder for {reminder.tag}")
+
+        await self.update_war(reminder.tag,war)
+
+        # if the send failed or was skipped, the pending interval wasn't consumed and the deadline is still in the past
+        deadline = self._deadlines.get(reminder_id)
+        if deadline is not None and deadline <= time.time():
+            self._schedule(reminder,time.time() + 60)
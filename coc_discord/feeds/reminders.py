@@ -17,7 +17,7 @@ from coc_main.coc_objects.clans.clan import aClan
 from coc_main.coc_objects.events.clan_war_v2 import bClanWar
 from coc_main.coc_objects.events.raid_weekend import aRaidWeekend
 
-from coc_main.utils.components import get_bot_webhook, s_convert_seconds_to_str
+from coc_main.utils.components import send_bot_webhook, s_convert_seconds_to_str
 
 LOG = logging.getLogger("coc.main")
 
@@ -36,6 +36,8 @@ class MemberReminder():
 
 class EventReminder(GlobalClient):
     _locks = defaultdict(asyncio.Lock)
+    # set by the Discord cog, so that new War Reminders are scheduled without waiting for the next reconcile
+    scheduler = None
     __slots__ = [
         '_id',
         'id',
@@ -101,6 +103,8 @@ class EventReminder(GlobalClient):
     
     async def delete(self):
         await self.database.db__clan_event_reminder.delete_one({'_id':self._id})
+        if self._type == 1 and EventReminder.scheduler:
+            EventReminder.scheduler.remove_reminder(self.id)
 
     async def generate_reminder_text(self,members:Optional[List[MemberReminder]]=None):
         reminder_text = ""
@@ -131,7 +135,7 @@ class EventReminder(GlobalClient):
                 return
             
             if self.next_reminder and (time_remaining.total_seconds() / 3600) < self.next_reminder: 
-                get_players = self.coc_client.get_players([p.tag for p in players])
+                get_players = self.coc_client.get_players([p.tag for p in players],max_age=3600)
                 async for player in get_players:
                     try:
                         member = await self.bot.get_or_fetch_member(self.guild,player.discord_user)
@@ -170,53 +174,32 @@ class EventReminder(GlobalClient):
             reminder_text += await self.generate_reminder_text(half_members)
             remainder_text = await self.generate_reminder_text(list(self.active_reminders.values())[len(self.active_reminders) // 2:])
 
-            webhook = await get_bot_webhook(self.bot,self.channel)
-            if isinstance(self.channel,discord.Thread):
-                r_msg = await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=reminder_text,
-                    thread=self.channel,
-                    wait = True
-                    )
-                await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=remainder_text,
-                    thread=self.channel,
-                    wait = True
-                    )
-            else:
-                r_msg = await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=reminder_text,
-                    wait = True
-                    )
-                await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=remainder_text,
-                    wait = True
-                    )
+            r_msg = await send_bot_webhook(
+                self.bot,
+                self.channel,
+                username=clan.name,
+                avatar_url=clan.badge,
+                content=reminder_text,
+                wait=True
+                )
+            await send_bot_webhook(
+                self.bot,
+                self.channel,
+                username=clan.name,
+                avatar_url=clan.badge,
+                content=remainder_text,
+                wait=True
+                )
                 
         else:
-            webhook = await get_bot_webhook(self.bot,self.channel)
-            if isinstance(self.channel,discord.Thread):
-                r_msg = await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=reminder_text,
-                    thread=self.channel,
-                    wait=True
-                    )
-            else:
-                r_msg = await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=reminder_text,
-                    wait=True
-                    )
+            r_msg = await send_bot_webhook(
+                self.bot,
+                self.channel,
+                username=clan.name,
+                avatar_url=clan.badge,
+                content=reminder_text,
+                wait=True
+                )
         LOG.info(f"Clan {clan}: Sent War Reminders to {len(self.active_reminders)} players. Reminder ID: {r_msg.id}")
         self.active_reminders = {}
     
@@ -237,54 +220,32 @@ class EventReminder(GlobalClient):
             reminder_text += await self.generate_reminder_text(half_members)
             remainder_text = await self.generate_reminder_text(list(self.active_reminders.values())[len(self.active_reminders) // 2:])
 
-            webhook = await get_bot_webhook(self.bot,self.channel)
-            if isinstance(self.channel,discord.Thread):
-                r_msg = await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=reminder_text,
-                    thread=self.channel,
-                    wait = True
-                    )
-                await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=remainder_text,
-                    thread=self.channel,
-                    wait = True
-                    )
-            else:
-                r_msg = await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=reminder_text,
-                    wait = True
-                    )
-                await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=remainder_text,
-                    wait = True
-                    )
+            r_msg = await send_bot_webhook(
+                self.bot,
+                self.channel,
+                username=clan.name,
+                avatar_url=clan.badge,
+                content=reminder_text,
+                wait=True
+                )
+            await send_bot_webhook(
+                self.bot,
+                self.channel,
+                username=clan.name,
+                avatar_url=clan.badge,
+                content=remainder_text,
+                wait=True
+                )
         
         else:
-            webhook = await get_bot_webhook(self.bot,self.channel)
-
-            if isinstance(self.channel,discord.Thread):
-                r_msg = await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=reminder_text,
-                    thread=self.channel,
-                    wait = True
-                    )
-            else:
-                r_msg = await webhook.send(
-                    username=clan.name,
-                    avatar_url=clan.badge,
-                    content=reminder_text,
-                    wait = True
-                    )
+            r_msg = await send_bot_webhook(
+                self.bot,
+                self.channel,
+                username=clan.name,
+                avatar_url=clan.badge,
+                content=reminder_text,
+                wait=True
+                )
         LOG.info(f"Clan {clan}: Sent Raid Reminders to {len(self.active_reminders)} players. Reminder ID: {r_msg.id}")
     
     @classmethod
@@ -325,7 +286,9 @@ class EventReminder(GlobalClient):
                 'reminder_interval':intv
                 }
             )
-        reminder = await cls.get_by_id(new.inserted_id)        
+        reminder = await cls.get_by_id(new.inserted_id)
+        if cls.scheduler:
+            await cls.scheduler.add_reminder(reminder)
         return reminder
 
     @classmethod
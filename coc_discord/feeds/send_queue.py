@@ -0,0 +1,179 @@
+import discord
+import asyncio
+import logging
+
+from typing import *
+from collections import defaultdict, deque
+from time import monotonic
+
+from coc_main.client.global_client import GlobalClient
+from coc_main.utils.components import send_bot_webhook
+
+LOG = logging.getLogger("coc.discord")
+
+class _QueuedEmbed(NamedTuple):
+    username:str
+    avatar_url:Optional[str]
+    embed:discord.Embed
+    queued:float
+
+##################################################
+#####
+##### FEED SEND QUEUE
+#####
+##################################################
+class FeedSendQueue(GlobalClient):
+    """
+    Per-channel outbound queue for high-frequency feeds.
+
+    Embeds sent to a channel within `window` seconds of each other are merged, and sent in as few webhook messages as possible. Consecutive embeds for the same webhook identity are packed into one message, up to 10 embeds or 6,000 characters.
+
+    Each channel sends at most once every `min_interval` seconds. Rate limited or failed sends back off exponentially, and are retried up to `max_attempts` times.
+    """
+    window = 3.0
+    min_interval = 2.0
+    max_attempts = 4
+    max_embeds = 10
+    max_length = 6000
+
+    _queues:Dict[int,deque] = defaultdict(deque)
+    _workers:Dict[int,asyncio.Task] = {}
+    _last_sent:Dict[int,float] = {}
+    _latency = deque(maxlen=500)
+    _flush = asyncio.Event()
+
+    stats = {
+        'queued': 0,
+        'messages': 0,
+        'embeds': 0,
+        'rate_limited': 0,
+        'failed': 0
+        }
+
+    @classmethod
+    def queue_depth(cls) -> int:
+        return sum([len(q) for q in cls._queues.values()])
+
+    @classmethod
+    def latency(cls) -> Tuple[float,float]:
+        """
+        Mean and max seconds between an embed being queued and sent, over the last 500 embeds.
+        """
+        if len(cls._latency) == 0:
+            return 0,0
+        return sum(cls._latency) / len(cls._latency), max(cls._latency)
+
+    @classmethod
+    def enqueue(cls,
+        channel:Union[discord.TextChannel,discord.Thread],
+        embed:discord.Embed,
+        username:str,
+        avatar_url:Optional[str]=None):
+
+        cls._queues[channel.id].append(_QueuedEmbed(username,avatar_url,embed,monotonic()))
+        cls.stats['queued'] += 1
+
+        worker = cls._workers.get(channel.id)
+        if worker is None or worker.done():
+            cls._workers[channel.id] = asyncio.create_task(cls._drain(channel.id))
+
+    @classmethod
+    async def close(cls,timeout:float=10.0):
+        """
+        Sends queued embeds without waiting out the merge window, for up to `timeout` seconds. Workers still running after that are cancelled.
+        """
+        cls._flush.set()
+        for channel_id,queue in cls._queues.items():
+            worker = cls._workers.get(channel_id)
+            if len(queue) > 0 and (worker is None or worker.done()):
+                cls._workers[channel_id] = asyncio.create_task(cls._drain(channel_id))
+
+        pending = [w for w in cls._workers.values() if not w.done()]
+        if len(pending) > 0:
+            _, pending = await asyncio.wait(pending,timeout=timeout)
+        for worker in pending:
+            worker.cancel()
+        if len(pending) > 0:
+            LOG.warning(f"Feed Send Queue closed with {cls.queue_depth()} embeds unsent.")
+        cls._workers.clear()
+        cls._flush.clear()
+
+    ##################################################
+    ##### WORKER
+    ##################################################
+    @classmethod
+    def _next_batch(cls,queue:deque) -> List[_QueuedEmbed]:
+        batch = [queue.popleft()]
+        length = len(batch[0].embed)
+        while len(queue) > 0 and len(batch) < cls.max_embeds:
+            item = queue[0]
+            if (item.username,item.avatar_url) != (batch[0].username,batch[0].avatar_url):
+                break
+            if length + len(item.embed) > cls.max_length:
+                break
+            length += len(item.embed)
+            batch.append(queue.popleft())
+        return batch
+
+    @classmethod
+    async def _drain(cls,channel_id:int):
+        queue = cls._queues[channel_id]
+        try:
+            try:
+                await asyncio.wait_for(cls._flush.wait(),timeout=cls.window)
+            except asyncio.TimeoutError:
+                pass
+            while len(queue) > 0:
+                wait = cls._last_sent.get(channel_id,0) + cls.min_interval - monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                channel = cls.bot.get_channel(channel_id)
+                if not channel:
+                    queue.clear()
+                    break
+
+                batch = cls._next_batch(queue)
+                await cls._send(channel,batch)
+                cls._last_sent[channel_id] = monotonic()
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            LOG.exception(f"Error in Feed Send Queue for channel {channel_id}.")
+        finally:
+            if len(queue) == 0:
+                cls._queues.pop(channel_id,None)
+
+    @classmethod
+    async def _send(cls,channel:Union[discord.TextChannel,discord.Thread],batch:List[_QueuedEmbed]):
+        for attempt in range(cls.max_attempts):
+            try:
+                await send_bot_webhook(
+                    cls.bot,
+                    channel,
+                    username=batch[0].username,
+                    avatar_url=batch[0].avatar_url,
+                    embeds=[item.embed for item in batch]
+                    )
+            except (discord.Forbidden,discord.NotFound):
+                cls.stats['failed'] += len(batch)
+                return
+            except discord.HTTPException as exc:
+                if exc.status == 429:
+                    cls.stats['rate_limited'] += 1
+                    retry_after = float(exc.response.headers.get('Retry-After',0) or 0)
+                elif exc.status < 500:
+                    cls.stats['failed'] += len(batch)
+                    LOG.exception(f"Error sending Feed to {getattr(channel,'name',channel.id)}.")
+                    return
+                else:
+                    retry_after = 0
+                await asyncio.sleep(max(retry_after,cls.min_interval * (2 ** attempt)))
+            else:
+                now = monotonic()
+                cls._latency.extend([now - item.queued for item in batch])
+                cls.stats['messages'] += 1
+                cls.stats['embeds'] += len(batch)
+                return
+        cls.stats['failed'] += len(batch)
+        LOG.warning(f"Dropped {len(batch)} Feed embeds for {getattr(channel,'name',channel.id)} after {cls.max_attempts} attempts.")
@@ -18,6 +18,7 @@ from coc_main.client.global_client import GlobalClient
 from coc_main.discord.member import aMember
 from coc_main.discord.clan_link import ClanGuildLink
 from coc_main.discord.add_delete_link import AddLinkMenu
+from coc_main.discord.render_cache import MessageRenderCache
 
 from coc_main.coc_objects.players.player import BasicPlayer, aPlayer
 from coc_main.coc_objects.clans.clan import aClan
@@ -133,6 +134,16 @@ class GuildApplicationPanel(GlobalClient):
     def listener_channel(self) -> Optional[discord.TextChannel]:
         return self.bot.get_channel(self._tickettool_channel)
     
+    @property
+    def render_state(self) -> dict:
+        # panel settings are read by the view callbacks, but aren't visible on the panel
+        return {
+            'select_clans':self.can_user_select_clans,
+            'ticket_prefix':self.tickettool_prefix,
+            'listener_channel':self._tickettool_channel,
+            'questions':[self.text_q1,self.placeholder_q1,self.text_q2,self.placeholder_q2,self.text_q3,self.placeholder_q3,self.text_q4,self.placeholder_q4]
+            }
+    
     async def fetch_message(self) -> Optional[discord.Message]:
         if self.channel:
             try:
@@ -165,6 +176,10 @@ class GuildApplicationPanel(GlobalClient):
                     await self.delete()
                     return
                 
+                fingerprint = MessageRenderCache.fingerprint(embeds=[embed],view=view,state=self.render_state)
+                if await MessageRenderCache.is_current(self.message_id,fingerprint):
+                    return
+                
                 message = await self.fetch_message()
                 if not message:
                     message = await self.channel.send(
@@ -178,11 +193,13 @@ class GuildApplicationPanel(GlobalClient):
                             }
                             }
                         )
+                    self.message_id = message.id
                 else:
                     message = await message.edit(
                         embed=embed,
                         view=view
                         )
+                await MessageRenderCache.record(message.id,fingerprint)
         
         except Exception as exc:
             LOG.exception(
@@ -383,14 +400,14 @@ class ClanApplyMenuUser(GlobalClient,discord.ui.View):
     ##################################################
     async def load_items(self):
         if self.clan_tags:
-            self.clans = [a async for a in self.coc_client.get_clans(self.clan_tags)]
+            self.clans = [a async for a in self.coc_client.get_clans(self.clan_tags,max_age=300)]
 
         self.is_active = True
         dropdown_options = []
 
         tags_query = self.database.db__player.find({'discord_user':self.member.id},{'_id':1})
         account_tags = [db['_id'] async for db in tags_query]
-        accounts = [p async for p in self.coc_client.get_players(account_tags[:10])]
+        accounts = [p async for p in self.coc_client.get_players(account_tags[:10],max_age=300)]
 
         if len(accounts) == 0:
             button = DiscordButton(
@@ -576,7 +593,7 @@ class ClanApplyMenuUser(GlobalClient,discord.ui.View):
         
         tags = application.get('tags',[])
         if len(tags) > 0:
-            application_accounts = [p async for p in GlobalClient.coc_client.get_players(tags)]
+            application_accounts = [p async for p in GlobalClient.coc_client.get_players(tags,max_age=300)]
         else:
             application_accounts = []
         
@@ -591,12 +608,12 @@ class ClanApplyMenuUser(GlobalClient,discord.ui.View):
             eligible_townhalls = set([a.town_hall.level for a in accounts])
             linked_clans = await ClanGuildLink.get_for_guild(channel.guild.id)
 
-            async for clan in GlobalClient.coc_client.get_clans([c.tag for c in linked_clans]):
+            async for clan in GlobalClient.coc_client.get_clans([c.tag for c in linked_clans],max_age=300):
                 recruiting_ths = set(clan.recruitment_level)
                 if len(recruiting_ths.intersection(eligible_townhalls)) > 0:
                     application_clans.append(clan)
         else:
-            application_clans = [c async for c in GlobalClient.coc_client.get_clans(clan_tags)]
+            application_clans = [c async for c in GlobalClient.coc_client.get_clans(clan_tags,max_age=300)]
 
         member = channel.guild.get_member(application.get('applicant_id',0))
 
@@ -661,7 +678,7 @@ class ClanApplyMenuUser(GlobalClient,discord.ui.View):
             )
         if len(other_accounts) > 0:
             other_accounts_embed_text = ""
-            list_oa = [p async for p in GlobalClient.coc_client.get_players(other_accounts[:5])]                
+            list_oa = [p async for p in GlobalClient.coc_client.get_players(other_accounts[:5],max_age=300)]                
             list_oa.sort(key=lambda x:(x.town_hall.level,x.exp_level),reverse=True)
 
             async for a in AsyncIter(list_oa):
@@ -9,6 +9,7 @@ from collections import defaultdict
 from redbot.core.bot import Red
 from redbot.core.utils import AsyncIter
 from coc_main.client.global_client import GlobalClient
+from coc_main.discord.render_cache import MessageRenderCache
 from coc_main.utils.components import ClanLinkMenu
 
 LOG = logging.getLogger("coc.discord")
@@ -115,6 +116,10 @@ class GuildClanPanel(GlobalClient):
                 #iterate through embeds up to len existing messages
                 for i,send_message in enumerate(embeds[:existing_messages]):
                     link_button = ClanLinkMenu([send_message['clan']])
+                    fingerprint = MessageRenderCache.fingerprint(embeds=[send_message['embed']],view=link_button)
+                    if await MessageRenderCache.is_current(self.long_message_ids[i],fingerprint):
+                        message_ids_master.append(self.long_message_ids[i])
+                        continue
                     try:
                         message = await self.channel.fetch_message(self.long_message_ids[i])
                     except discord.NotFound:
@@ -129,6 +134,7 @@ class GuildClanPanel(GlobalClient):
                             view=link_button
                             )
                         message_ids_master.append(message.id)
+                    await MessageRenderCache.record(message.id,fingerprint)
                 
                 #iterate through remaining embeds
                 for send_message in embeds[existing_messages:]:
@@ -138,6 +144,10 @@ class GuildClanPanel(GlobalClient):
                         view=link_button
                         )
                     message_ids_master.append(message.id)
+                    await MessageRenderCache.record(
+                        message.id,
+                        MessageRenderCache.fingerprint(embeds=[send_message['embed']],view=link_button)
+                        )
                 
                 #delete any remaining messages
                 for message_id in self.long_message_ids[len(embeds):]:
@@ -147,7 +157,10 @@ class GuildClanPanel(GlobalClient):
                         pass
                     else:
                         await message.delete()
+                await MessageRenderCache.invalidate(*self.long_message_ids[len(embeds):])
                 
+                if message_ids_master == self.long_message_ids:
+                    return
                 await self.database.db__guild_clan_panel.update_one(
                     {'_id':self.id},
                     {'$set':{
@@ -16,6 +16,9 @@ from coc_main.client.global_client import GlobalClient
 from coc_main.utils.checks import is_admin
 from coc_main.utils.components import clash_embed
 
+from coc_main.coc_objects.events.war_stats import aSeasonWarStats
+from coc_main.coc_objects.events.war_participation import aWarParticipation
+
 from .leaderboard_files.discord_leaderboard import DiscordLeaderboard
 
 lb_type_selector = [
@@ -134,6 +137,24 @@ class Leaderboards(commands.Cog,GlobalClient):
         await self.database.db__leaderboard_archive.delete_many({})
         await ctx.reply("Historical Leaderboards Deleted.")
 
+    ############################################################
+    #####
+    ##### COMMAND: LEADERBOARD REBUILDWARS
+    #####
+    ############################################################
+    @cmdgroup_coclb.command(name="rebuildwars")
+    @commands.is_owner()
+    async def subcmd_coclb_rebuildwars(self,ctx):
+        """
+        Rebuild season war stats for leaderboard seasons, and war participation for all stored wars.
+        """
+        async with ctx.typing():
+            count = 0
+            for season in DiscordLeaderboard.get_leaderboard_seasons():
+                count += await aSeasonWarStats.rebuild_season(season,self.coc_client)
+            participation_count = await aWarParticipation.rebuild_all(self.coc_client)
+        await ctx.reply(f"Season War Stats rebuilt from {count:,} wars. War Participation rebuilt from {participation_count:,} wars.")
+
     ############################################################
     #####
     ##### COMMAND: LEADERBOARD LIST
@@ -16,8 +16,10 @@ from redbot.core.utils import AsyncIter
 from coc_main.client.global_client import GlobalClient
 from coc_main.coc_objects.season.season import aClashSeason
 from coc_main.coc_objects.players.player import aPlayer,aPlayerSeason
+from coc_main.coc_objects.events.war_stats import aSeasonWarStats
 
 from coc_main.discord.clan_link import ClanGuildLink
+from coc_main.discord.render_cache import MessageRenderCache
 
 from coc_main.utils.components import clash_embed, DiscordButton
 from coc_main.utils.constants.coc_emojis import EmojisTownHall
@@ -333,13 +335,26 @@ class DiscordLeaderboard(GlobalClient):
         
         try:
             lb_view = LeaderboardView(self)
+            # season buttons send from this leaderboard's data, so it is part of the render
+            fingerprint = MessageRenderCache.fingerprint(
+                embeds=[self._primary_embed],
+                view=lb_view,
+                state={k:e.to_dict() for k,e in self._leaderboard_data.items()},
+                ignore_timestamps=True
+                )
+            if await MessageRenderCache.is_current(self.message_id,fingerprint):
+                return
+            
             try:
                 message = await self.channel.fetch_message(self.message_id)
             except discord.NotFound:
                 message = await self.channel.send(embed=self._primary_embed,view=lb_view)
             else:
                 message = await message.edit(embed=self._primary_embed,view=lb_view)
-                
+            await MessageRenderCache.record(message.id,fingerprint)
+            
+            if message.id == self.message_id:
+                return
             self.message_id = message.id
             await self.database.db__leaderboard.update_one(
                 {'_id':self._id},
@@ -377,24 +392,35 @@ class ClanWarLeaderboard(Leaderboard):
     @classmethod
     async def calculate(cls,parent:DiscordLeaderboard,season:aClashSeason):
         leaderboard = cls(parent,season)
-        members = await GlobalClient.coc_client.get_members_by_season_no_clan(season)
-        leaderboard_clans = await leaderboard.parent.get_leaderboard_clans()
 
-        m_iter = AsyncIter(members)
-        async for player in m_iter:
-            if not player.home_clan:
-                continue
-            
-            stats = await player.get_season_stats(season)
+        if parent.is_global:
+            leaderboard_clans = None
+        else:
+            leaderboard_clans = [c.tag for c in await leaderboard.parent.get_leaderboard_clans()]
 
-            th_iter = AsyncIter(eligible_townhalls)
-            async for lb_th in th_iter:
-                if parent.is_global:
-                    lb_player = await ClanWarLeaderboardPlayer.calculate(stats,lb_th)
-                else:
-                    lb_player = await ClanWarLeaderboardPlayer.calculate(stats,lb_th,leaderboard_clans)
-                if lb_player.wars_participated > 0:
-                    leaderboard.leaderboard_players[lb_th].append(lb_player)
+        member_query = GlobalClient.database.db_player_member_snapshot.find(
+            {'season':season.id,'is_member':True,'home_clan_tag':{'$ne':None}},
+            {'tag':1}
+            )
+        members = set([m['tag'] async for m in member_query])
+
+        war_stats = await aSeasonWarStats.get_for_season(season,eligible_townhalls,leaderboard_clans)
+
+        by_townhall = defaultdict(list)
+        for row in war_stats:
+            if row['_id']['tag'] in members and row.get('wars_participated',0) > 0:
+                by_townhall[row['_id']['th']].append(row)
+
+        th_iter = AsyncIter(eligible_townhalls)
+        async for lb_th in th_iter:
+            rows = [ClanWarLeaderboardPlayer.from_war_stats(aPlayerSeason(r['_id']['tag'],season),lb_th,r) for r in by_townhall[lb_th]]
+            rows.sort(key=lambda x: (x.total_triples,x.hit_rate),reverse=True)
+
+            r_iter = AsyncIter(rows[:5])
+            async for lb_player in r_iter:
+                await lb_player.stats.load()
+                lb_player.name = lb_player.stats.name or lb_player.name
+                leaderboard.leaderboard_players[lb_th].append(lb_player)
         
         leaderboard.timestamp = pendulum.now()
         return await leaderboard.get_embed()
@@ -6,7 +6,8 @@ import pendulum
 import motor.motor_asyncio
 
 from typing import *
-from time import process_time
+from collections import defaultdict, deque
+from time import monotonic
 from async_property import AwaitLoader
 from coc.ext import discordlinks
 
@@ -14,12 +15,15 @@ from redbot.core.bot import Red
 
 from ..coc_objects.season.season import aClashSeason
 from ..coc_objects.players.player import aPlayer
-from ..coc_objects.clans.clan import aClan
+from ..coc_objects.clans.clan import aClan, BasicClan
 from ..coc_objects.events.clan_war_v2 import bClanWar, bWarLeagueGroup, bWarLeagueClan
+from ..coc_objects.events.war_participation import aWarParticipation
+from ..coc_objects.events.war_history import WarHistory
 from ..coc_objects.events.war_players import bWarLeaguePlayer
+from ..utils.cache import SnapshotCache
 from ..utils.constants.coc_constants import ClanRanks, MultiplayerLeagues
 
-from .throttler import CounterThrottler
+from .throttler import TokenBucketThrottler, api_endpoint
 
 LOG = logging.getLogger("coc.http")
 LOOP_TRACKER = {
@@ -51,24 +55,164 @@ class LoginNotSet(coc.ClashOfClansException):
     Raised when the Clash API credentials are not set.
     """
 
-class CacheQueue(asyncio.Queue):
+class DiscoveryPriority:
+    MEMBER = 0
+    LINKED = 1
+    TRACKED = 2
+    DISCOVERY = 3
+
+    labels = {
+        MEMBER: "Member",
+        LINKED: "Linked",
+        TRACKED: "Tracked",
+        DISCOVERY: "Discovery"
+        }
+    # seconds waited before a tag is promoted by one class
+    promote_after = {
+        MEMBER: None,
+        LINKED: 300,
+        TRACKED: 600,
+        DISCOVERY: 1800
+        }
+    # a tag waiting longer than its deadline is served ahead of everything else
+    deadline = {
+        MEMBER: 120,
+        LINKED: 600,
+        TRACKED: 1800,
+        DISCOVERY: None
+        }
+
+    @classmethod
+    def for_player(cls,player:aPlayer) -> int:
+        if getattr(player,'is_member',False):
+            return cls.MEMBER
+        if getattr(player,'discord_user',None):
+            return cls.LINKED
+        if getattr(player.clan,'is_alliance_clan',False):
+            return cls.TRACKED
+        return cls.DISCOVERY
+
+    @classmethod
+    def for_clan(cls,clan:aClan) -> int:
+        if getattr(clan,'is_alliance_clan',False):
+            return cls.MEMBER
+        if getattr(clan,'is_registered_clan',False):
+            return cls.TRACKED
+        return cls.DISCOVERY
+
+class CacheQueue():
+    """
+    A de-duplicated priority queue shared by the discovery workers.
+
+    Tags are served by DiscoveryPriority class, FIFO within a class. A tag that has waited long enough is promoted, and a tag past its class deadline is served first.
+
+    An item is skipped on `put` while it is either waiting in the queue or being processed by a worker; putting a queued item at a higher priority upgrades it. Workers must call `release` when done with an item.
+    """
     def __init__(self):
-        self.item_set = set()
-        super().__init__()
+        self.item_set = {}
+        self.active_set = {}
+        self._queues = {p:deque() for p in DiscoveryPriority.labels}
+        self._not_empty = asyncio.Event()
+
+        self.served = defaultdict(int)
+        self.promoted = defaultdict(int)
+        self.overdue = defaultdict(int)
 
     def __len__(self):
         return self.qsize()
     
-    async def put(self,item):
-        if item in self.item_set:
+    def qsize(self) -> int:
+        return len(self.item_set)
+    
+    @property
+    def oldest_age(self) -> float:
+        if len(self.item_set) == 0:
+            return 0
+        return monotonic() - min([ts for _,ts in self.item_set.values()])
+    
+    @property
+    def stats(self) -> Dict[int,dict]:
+        now = monotonic()
+        ret = {p:{'depth':0,'oldest':0,'served':self.served[p],'promoted':self.promoted[p],'overdue':self.overdue[p]} for p in DiscoveryPriority.labels}
+        for priority,ts in self.item_set.values():
+            ret[priority]['depth'] += 1
+            ret[priority]['oldest'] = max(ret[priority]['oldest'],now - ts)
+        return ret
+    
+    async def put(self,item,priority:int=DiscoveryPriority.DISCOVERY):
+        if item in self.active_set:
             return
-        self.item_set.add(item)
-        await super().put(item)        
+        existing = self.item_set.get(item)
+        if existing:
+            if priority >= existing[0]:
+                return
+            ts = existing[1]
+        else:
+            ts = monotonic()
+        self.item_set[item] = (priority,ts)
+        self._queues[priority].append((item,ts))
+        self._not_empty.set()
+    
+    def _head(self,priority:int) -> Optional[Tuple[str,float]]:
+        queue = self._queues[priority]
+        while queue:
+            item,ts = queue[0]
+            # entries are left behind when an item is upgraded or re-queued
+            if self.item_set.get(item) == (priority,ts):
+                return item,ts
+            queue.popleft()
+        return None
+    
+    def _select(self) -> Optional[str]:
+        now = monotonic()
+        selected = None
+        for priority in DiscoveryPriority.labels:
+            head = self._head(priority)
+            if not head:
+                continue
+            age = now - head[1]
+            deadline = DiscoveryPriority.deadline[priority]
+            promote_after = DiscoveryPriority.promote_after[priority]
+
+            if deadline and age > deadline:
+                score = -1
+            elif promote_after:
+                score = max(0,priority - int(age // promote_after))
+            else:
+                score = priority
+            
+            if selected is None or score < selected[0]:
+                selected = (score,priority)
+
+        if selected is None:
+            return None
+        
+        score,priority = selected
+        item,_ = self._queues[priority].popleft()
+        del self.item_set[item]
+        self.active_set[item] = priority
+
+        self.served[priority] += 1
+        if score < 0:
+            self.overdue[priority] += 1
+        elif score < priority:
+            self.promoted[priority] += 1
+        return item
     
     async def get(self):
-        item = await super().get()
-        self.item_set.discard(item)
+        while True:
+            item = self._select()
+            if item is not None:
+                break
+            self._not_empty.clear()
+            await self._not_empty.wait()
         return item
+    
+    def release(self,item) -> int:
+        """
+        Marks an item as done. Returns the priority it was queued with.
+        """
+        return self.active_set.pop(item,DiscoveryPriority.DISCOVERY)
 
 class ClashClient(coc.EventsClient):
     _bot = None
@@ -79,10 +223,11 @@ class ClashClient(coc.EventsClient):
         if keys is not None and len(keys) >= 1:
             client = cls(
                 load_game_data=coc.LoadGameData(always=True),
-                throttler=CounterThrottler,
+                throttler=TokenBucketThrottler,
                 throttle_limit=rate_limit
                 )
             await client.login_with_tokens(*keys)
+            client.http_throttler.configure(key_count=len(keys),rate_per_key=rate_limit)
             LOG.info(f"Logged into Clash of Clans API with {len(keys)} keys.")
             return client
         
@@ -98,13 +243,14 @@ class ClashClient(coc.EventsClient):
                 key_count=int(clashapi_login.get("keys",1)),
                 key_names='project-g',
                 load_game_data=coc.LoadGameData(always=True),
-                throttler=CounterThrottler,
+                throttler=TokenBucketThrottler,
                 throttle_limit=rate_limit
                 )            
             await client.login(
                 clashapi_login.get("username"),
                 clashapi_login.get("password")                
                 )
+            client.http_throttler.configure(key_count=client.http.key_count,rate_per_key=rate_limit)
             LOG.info(f"Logged into Clash of Clans API with username {clashapi_login.get('username')}.")
             return client
     
@@ -124,6 +270,9 @@ class ClashClient(coc.EventsClient):
         self._use_discovery = False
         self._player_cache_queue = CacheQueue()
         self._clan_cache_queue = CacheQueue()
+
+        self._player_snapshots = SnapshotCache('player',max_size=5000)
+        self._clan_snapshots = SnapshotCache('clan',max_size=1000)
     
         super().__init__(**options)
     
@@ -136,7 +285,7 @@ class ClashClient(coc.EventsClient):
     def bot(self) -> Red:
         return self._bot
     @property
-    def http_throttler(self) -> CounterThrottler:
+    def http_throttler(self) -> TokenBucketThrottler:
         return self.http._HTTPClient__throttle    
     @property
     def links_client(self) -> discordlinks.DiscordLinkClient:
@@ -177,14 +326,7 @@ class ClashClient(coc.EventsClient):
     
     @property
     def api_current_throughput(self) -> Tuple[float, float]:
-        nt = process_time()
-
-        diff = nt - self.http_throttler.sent_time
-        sent_avg = self.http_throttler.current_sent / diff if self.http_throttler.current_sent > 0 else 0
-        
-        diff = nt - self.http_throttler.rcvd_time
-        rcvd_avg = self.http_throttler.current_rcvd / diff if self.http_throttler.current_rcvd > 0 else 0
-        return sent_avg, rcvd_avg
+        return self.http_throttler.current_throughput
     
     @property
     def rcvd_stats(self) -> Tuple[float, float, float]:
@@ -204,12 +346,22 @@ class ClashClient(coc.EventsClient):
         maxr = max(self.http_throttler.sent)
         return avg, last, maxr
     
+    @property
+    def snapshot_stats(self) -> Dict[str,dict]:
+        return {
+            'player': self._player_snapshots.stats,
+            'clan': self._clan_snapshots.stats
+            }
+    
     ############################################################
     #####
     ##### PLAYER API
     #####
     ############################################################
-    def get_players(self,player_tags:Iterable[str],cls:Type[coc.Player]=None,load_game_data:bool=True,**kwargs) -> AsyncIterator[aPlayer]:
+    def get_players(self,player_tags:Iterable[str],cls:Type[coc.Player]=None,load_game_data:bool=True,max_age:int=0,**kwargs) -> AsyncIterator[aPlayer]:
+        """
+        `max_age` is passed through to `get_player`: views that can tolerate slightly stale data should pass it to reuse recent snapshots.
+        """
         if self.maintenance:
             raise coc.Maintenance()
         
@@ -219,22 +371,38 @@ class ClashClient(coc.EventsClient):
             player_tags=player_tags,
             cls=cls,
             load_game_data=load_game_data,
+            max_age=max_age,
             **kwargs)
 
-    async def get_player(self,player_tag:str,cls:Type[coc.Player]=None,load_game_data:bool=True,**kwargs) -> aPlayer:
+    async def get_player(self,player_tag:str,cls:Type[coc.Player]=None,load_game_data:bool=True,max_age:int=0,**kwargs) -> aPlayer:
+        """
+        Default `aPlayer` fetches go through the snapshot cache. A snapshot up to `max_age` seconds old is returned if available; concurrent fetches for the same tag share one request.
+        """
+        if (cls and cls is not aPlayer) or not load_game_data or kwargs:
+            return await self._fetch_player(player_tag,cls,load_game_data,**kwargs)
+        
+        tag = coc.utils.correct_tag(player_tag)
+        return await self._player_snapshots.fetch(
+            key=tag,
+            coro_func=lambda: self._fetch_player(tag,aPlayer,load_game_data),
+            max_age=max_age
+            )
+    
+    async def _fetch_player(self,player_tag:str,cls:Type[coc.Player]=None,load_game_data:bool=True,**kwargs) -> aPlayer:
         if not cls:
             cls = aPlayer
-        player = await super().get_player(
-            player_tag=player_tag,
-            cls=cls,
-            load_game_data=load_game_data,
-            **kwargs)
+        with api_endpoint('players'):
+            player = await super().get_player(
+                player_tag=player_tag,
+                cls=cls,
+                load_game_data=load_game_data,
+                **kwargs)
         
         if isinstance(player,AwaitLoader):
             await player.load()
         
         if self._use_discovery:
-            await self._player_cache_queue.put(player.tag)
+            await self._player_cache_queue.put(player.tag,DiscoveryPriority.for_player(player))
         return player
     
     async def get_members_by_season_no_clan(self,season:aClashSeason) -> List[aPlayer]:
@@ -277,24 +445,48 @@ class ClashClient(coc.EventsClient):
     ##### CLAN API
     #####
     ############################################################
-    def get_clans(self,tags:Iterable[str],cls:Type[coc.Clan]=None,**kwargs) -> AsyncIterator[aClan]:
+    async def get_clans(self,tags:Iterable[str],cls:Type[coc.Clan]=None,max_age:int=0,**kwargs) -> AsyncIterator[aClan]:
+        """
+        Clan attributes for all `tags` are bulk loaded up front, so each clan doesn't load its own from the database.
+        """
         if self.maintenance:
             raise coc.Maintenance()
         
         if not cls:
             cls = aClan
-        return super().get_clans(tags=tags,cls=cls,**kwargs)
+        
+        tags = list(tags)
+        if issubclass(cls,BasicClan):
+            await BasicClan.load_many(tags)
+        
+        async for clan in super().get_clans(tags=tags,cls=cls,max_age=max_age,**kwargs):
+            yield clan
+    
+    async def get_clan(self,tag:str,cls:Type[coc.Clan]=None,max_age:int=0,**kwargs) -> aClan:
+        """
+        Default `aClan` fetches go through the snapshot cache. See `get_player`.
+        """
+        if (cls and cls is not aClan) or kwargs:
+            return await self._fetch_clan(tag,cls,**kwargs)
+        
+        n_tag = coc.utils.correct_tag(tag)
+        return await self._clan_snapshots.fetch(
+            key=n_tag,
+            coro_func=lambda: self._fetch_clan(n_tag,aClan),
+            max_age=max_age
+            )
     
-    async def get_clan(self,tag:str,cls:Type[coc.Clan]=None,**kwargs) -> aClan:
+    async def _fetch_clan(self,tag:str,cls:Type[coc.Clan]=None,**kwargs) -> aClan:
         if not cls:
             cls = aClan
-        clan = await super().get_clan(tag=tag,cls=cls,**kwargs)
+        with api_endpoint('clans'):
+            clan = await super().get_clan(tag=tag,cls=cls,**kwargs)
         
         if isinstance(clan,AwaitLoader):
             await clan.load()
         
         if self._use_discovery:
-            await self._clan_cache_queue.put(clan.tag)
+            await self._clan_cache_queue.put(clan.tag,DiscoveryPriority.for_clan(clan))
         return clan
 
     async def from_clan_abbreviation(self,abbreviation:str) -> aClan:
@@ -361,6 +553,39 @@ class ClashClient(coc.EventsClient):
             reverse=True
             )
     
+    async def get_raid_log(self,clan_tag:str,**kwargs):
+        with api_endpoint('capitalraidseasons'):
+            return await super().get_raid_log(clan_tag=clan_tag,**kwargs)
+    
+    ############################################################
+    #####
+    ##### LOCATIONS
+    #####
+    ############################################################
+    async def search_locations(self,*args,**kwargs):
+        with api_endpoint('locations'):
+            return await super().search_locations(*args,**kwargs)
+    
+    async def get_location_players(self,*args,**kwargs):
+        with api_endpoint('locations'):
+            return await super().get_location_players(*args,**kwargs)
+    
+    async def get_location_players_builder_base(self,*args,**kwargs):
+        with api_endpoint('locations'):
+            return await super().get_location_players_builder_base(*args,**kwargs)
+    
+    async def get_location_clans(self,*args,**kwargs):
+        with api_endpoint('locations'):
+            return await super().get_location_clans(*args,**kwargs)
+    
+    async def get_location_clans_builder_base(self,*args,**kwargs):
+        with api_endpoint('locations'):
+            return await super().get_location_clans_builder_base(*args,**kwargs)
+    
+    async def get_location_clans_capital(self,*args,**kwargs):
+        with api_endpoint('locations'):
+            return await super().get_location_clans_capital(*args,**kwargs)
+    
     ############################################################
     #####
     ##### CLAN WARS
@@ -369,7 +594,8 @@ class ClashClient(coc.EventsClient):
     async def get_clan_war(self,clan_tag:str,cls:Type[coc.ClanWar]=None,**kwargs) -> bClanWar:
         if not cls:
             cls = bClanWar
-        war = await super().get_clan_war(clan_tag=clan_tag,cls=cls,**kwargs)
+        with api_endpoint('currentwar'):
+            war = await super().get_clan_war(clan_tag=clan_tag,cls=cls,**kwargs)
         if isinstance(war,AwaitLoader):
             await war.load()
         return war
@@ -377,7 +603,8 @@ class ClashClient(coc.EventsClient):
     async def get_current_war(self,clan_tag:str,cwl_round:coc.WarRound=coc.WarRound.current_war,cls:Type[coc.ClanWar]=None,**kwargs) -> Optional[bClanWar]:
         if not cls:
             cls = bClanWar
-        war = await super().get_current_war(clan_tag=clan_tag,cwl_round=cwl_round,cls=cls,**kwargs)
+        with api_endpoint('currentwar'):
+            war = await super().get_current_war(clan_tag=clan_tag,cwl_round=cwl_round,cls=cls,**kwargs)
         if isinstance(war,AwaitLoader):
             await war.load()
         return war
@@ -399,6 +626,26 @@ class ClashClient(coc.EventsClient):
         await asyncio.gather(*[w.load() for w in wars])
         return sorted(wars,key=lambda w:w.preparation_start_time,reverse=True)
     
+    async def get_war_participation_for_player(self,player_tag:str,season:aClashSeason=None,**kwargs) -> List[aWarParticipation]:
+        tag = coc.utils.correct_tag(player_tag)
+        return await aWarParticipation.for_player(player_tag=tag,season=season)
+    
+    async def get_war_by_id(self,war_id:str,clan_tag:Optional[str]=None) -> Optional[bClanWar]:
+        data = await bClanWar._search_by_id(war_id)
+        if not data:
+            return None
+        war = bClanWar(data=data,client=self,clan_tag=clan_tag or data['clan']['tag'])
+        await war.load()
+        return war
+    
+    def get_war_history_for_clan(self,clan_tag:str,season:aClashSeason=None,**kwargs) -> WarHistory:
+        tag = coc.utils.correct_tag(clan_tag)
+        return WarHistory.for_clan(tag,self,season=season,**kwargs)
+    
+    def get_war_history_for_player(self,player_tag:str,season:aClashSeason=None,**kwargs) -> WarHistory:
+        tag = coc.utils.correct_tag(player_tag)
+        return WarHistory.for_player(tag,self,season=season,**kwargs)
+    
     async def get_clan_wars_for_clan(self,clan_tag:str,season:aClashSeason=None,**kwargs) -> List[bClanWar]:
         tag = coc.utils.correct_tag(clan_tag)
         query = await bClanWar._search_for_clan(clan_tag=tag,season=season)
@@ -471,7 +718,8 @@ class ClashClient(coc.EventsClient):
             cls = bWarLeagueGroup
         
         if season.is_current:
-            group = await super().get_league_group(clan_tag=clan_tag,cls=cls,season=season,**kwargs)
+            with api_endpoint('currentwar'):
+                group = await super().get_league_group(clan_tag=clan_tag,cls=cls,season=season,**kwargs)
             if isinstance(group,AwaitLoader):
                 await group.load()
             return group
@@ -500,7 +748,8 @@ class ClashClient(coc.EventsClient):
     async def get_league_war(self,war_tag:str,cls:Type[coc.ClanWar]=None,**kwargs) -> bClanWar:
         if not cls:
             cls = bClanWar
-        war = await super().get_league_war(war_tag=war_tag,cls=cls,**kwargs)
+        with api_endpoint('currentwar'):
+            war = await super().get_league_war(war_tag=war_tag,cls=cls,**kwargs)
         if war.state == 'notInWar':
             query = await bClanWar._search_by_tag(war_tag)
             if query:
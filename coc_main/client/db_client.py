@@ -1,10 +1,13 @@
+import asyncio
 import logging
 import motor.motor_asyncio
 
 from typing import *
 
+from pymongo.errors import PyMongoError
 from redbot.core.bot import Red
 from ..exceptions import DatabaseLogin
+from .db_indexes import INDEXES, CANONICAL_QUERIES, plan_stages
 
 COC_LOG = logging.getLogger("coc.main")
 
@@ -12,6 +15,7 @@ class MotorClient():
     bot:Red = None
     motor_client:motor.motor_asyncio.AsyncIOMotorClient = None
     database:motor.motor_asyncio.AsyncIOMotorDatabase = None
+    _index_task:Optional[asyncio.Task] = None
 
     @classmethod
     async def client_login(cls,bot:Red) -> 'MotorClient':        
@@ -35,9 +39,54 @@ class MotorClient():
         cls.database = database
 
         COC_LOG.info("Connected to Mongo Database")
+
+        # index builds on large collections can be slow, don't hold up login
+        cls._index_task = asyncio.create_task(cls.ensure_indexes())
         return cls()
     
+    @classmethod
+    async def ensure_indexes(cls) -> Dict[str,List[str]]:
+        created = {}
+        for collection,indexes in INDEXES.items():
+            try:
+                created[collection] = await cls.database[collection].create_indexes(indexes)
+            except PyMongoError:
+                COC_LOG.exception(f"Error creating indexes on {collection}.")
+        COC_LOG.info(f"Ensured {sum(len(i) for i in created.values())} indexes on {len(created)} collections.")
+        return created
+    
+    @classmethod
+    async def explain_queries(cls) -> Dict[str,dict]:
+        """
+        Runs `explain()` on each canonical query, and reports on the winning plan.
+        """
+        results = {}
+        for name,query in CANONICAL_QUERIES.items():
+            cursor = cls.database[query['collection']].find(query['filter'])
+            if query.get('sort'):
+                cursor = cursor.sort(query['sort'])
+            try:
+                plan = await cursor.explain()
+            except PyMongoError as exc:
+                results[name] = {'collection':query['collection'],'error':str(exc)}
+                continue
+
+            stages = plan_stages(plan.get('queryPlanner',{}).get('winningPlan',{}))
+            execution = plan.get('executionStats',{})
+            results[name] = {
+                'collection': query['collection'],
+                'stages': stages,
+                'collscan': 'COLLSCAN' in stages,
+                'docs_examined': execution.get('totalDocsExamined',0),
+                'keys_examined': execution.get('totalKeysExamined',0),
+                'returned': execution.get('nReturned',0),
+                'runtime_ms': execution.get('executionTimeMillis',0)
+                }
+        return results
+    
     @classmethod
     async def close(cls):
+        if cls._index_task and not cls._index_task.done():
+            cls._index_task.cancel()
         cls.motor_client.close()
         COC_LOG.info("Closed Mongo Database Connection")
\ No newline at end of file
@@ -0,0 +1,157 @@
+from typing import *
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+############################################################
+############################################################
+#####
+##### INDEXES
+#####
+############################################################
+############################################################
+# Indexes required by hot query paths. Declared per collection, and created on database login.
+# Index names are fixed, so that re-declaring an existing index is a no-op.
+INDEXES:Dict[str,List[IndexModel]] = {
+    'db__nclan_war': [
+        IndexModel([('clan.members.tag',ASCENDING),('type',ASCENDING),('preparationStartTime',DESCENDING),('_id',DESCENDING)],name='clan_member_type_preparation'),
+        IndexModel([('opponent.members.tag',ASCENDING),('type',ASCENDING),('preparationStartTime',DESCENDING),('_id',DESCENDING)],name='opponent_member_type_preparation'),
+        IndexModel([('clan.tag',ASCENDING),('type',ASCENDING),('preparationStartTime',DESCENDING),('_id',DESCENDING)],name='clan_type_preparation'),
+        IndexModel([('opponent.tag',ASCENDING),('type',ASCENDING),('preparationStartTime',DESCENDING),('_id',DESCENDING)],name='opponent_type_preparation'),
+        IndexModel([('type',ASCENDING),('preparationStartTime',ASCENDING)],name='type_preparation_start'),
+        IndexModel([('tag',ASCENDING)],name='war_tag',sparse=True),
+        ],
+    'db__war_participation': [
+        IndexModel([('tag',ASCENDING),('type',ASCENDING),('preparation_start',DESCENDING)],name='tag_type_preparation'),
+        ],
+    'db__player_activity': [
+        IndexModel([('tag',ASCENDING),('activity',ASCENDING),('timestamp',DESCENDING)],name='tag_activity_timestamp'),
+        IndexModel([('tag',ASCENDING),('timestamp',DESCENDING)],name='tag_timestamp'),
+        IndexModel([('activity',ASCENDING),('read_by_bank',ASCENDING),('timestamp',ASCENDING)],name='activity_bank_timestamp'),
+        ],
+    'db__bank_transaction': [
+        IndexModel([('account',ASCENDING),('timestamp',DESCENDING)],name='account_timestamp'),
+        ],
+    'db_player_member_snapshot': [
+        IndexModel([('season',ASCENDING),('is_member',ASCENDING),('home_clan_tag',ASCENDING)],name='season_member_clan'),
+        IndexModel([('_id.tag',ASCENDING),('_id.season',ASCENDING)],name='tag_season'),
+        ],
+    'db_player_seasonstats_snapshot': [
+        IndexModel([('_id.tag',ASCENDING),('_id.season',ASCENDING)],name='tag_season'),
+        ],
+    'db__season_war_stats': [
+        IndexModel([('_id.season',ASCENDING),('_id.th',ASCENDING)],name='season_th'),
+        ],
+    'db__player': [
+        IndexModel([('_cycle_id',ASCENDING)],name='cycle_id'),
+        IndexModel([('discord_user',ASCENDING),('is_member',ASCENDING)],name='discord_user_member'),
+        ],
+    'db__discord_member': [
+        IndexModel([('guild_id',ASCENDING)],name='guild_id'),
+        ],
+    'db__clan': [
+        IndexModel([('_cycle_id',ASCENDING)],name='cycle_id'),
+        ],
+    }
+
+############################################################
+############################################################
+#####
+##### CANONICAL QUERIES
+#####
+############################################################
+############################################################
+# Representative shapes of the hot queries above, used to audit query plans.
+# Values are placeholders: only the shape of the query matters to the planner.
+CANONICAL_QUERIES:Dict[str,Dict[str,Any]] = {
+    'war_log_for_player': {
+        'collection': 'db__nclan_war',
+        'filter': {
+            'type': 'random',
+            '$or': [
+                {'clan.members.tag': '#PLAYER'},
+                {'opponent.members.tag': '#PLAYER'}
+                ]
+            },
+        },
+    'war_log_for_clan': {
+        'collection': 'db__nclan_war',
+        'filter': {
+            'type': 'random',
+            '$or': [
+                {'clan.tag': '#CLAN'},
+                {'opponent.tag': '#CLAN'}
+                ]
+            },
+        'sort': [('preparationStartTime',DESCENDING),('_id',DESCENDING)],
+        },
+    'wars_for_season': {
+        'collection': 'db__nclan_war',
+        'filter': {
+            'type': 'random',
+            'preparationStartTime': {'$gte': '20000101T000000.000Z','$lte': '20000201T000000.000Z'}
+            },
+        },
+    'war_participation_for_player': {
+        'collection': 'db__war_participation',
+        'filter': {
+            'tag': '#PLAYER',
+            'type': 'random',
+            'preparation_start': {'$gte': '2000-01-01T00:00:00+00:00','$lte': '2000-02-01T00:00:00+00:00'}
+            },
+        'sort': [('preparation_start',DESCENDING)],
+        },
+    'last_activity_by_type': {
+        'collection': 'db__player_activity',
+        'filter': {'tag': '#PLAYER','activity': 'trophies','legacy_conversion': {'$exists': False}},
+        'sort': [('timestamp',DESCENDING)],
+        },
+    'activity_for_season': {
+        'collection': 'db__player_activity',
+        'filter': {'tag': '#PLAYER','timestamp': {'$gt': 0,'$lte': 1}},
+        'sort': [('timestamp',DESCENDING)],
+        },
+    'activity_for_bank': {
+        'collection': 'db__player_activity',
+        'filter': {'activity': 'capital_contribution','read_by_bank': False},
+        'sort': [('timestamp',ASCENDING)],
+        },
+    'bank_transactions': {
+        'collection': 'db__bank_transaction',
+        'filter': {'account': 'account','timestamp': {'$gte': 0},'amount': {'$ne': 0}},
+        },
+    'members_by_season': {
+        'collection': 'db_player_member_snapshot',
+        'filter': {'season': '1-2000','home_clan_tag': '#CLAN','is_member': True},
+        },
+    'member_snapshot_by_tag': {
+        'collection': 'db_player_member_snapshot',
+        'filter': {'_id.tag': '#PLAYER','_id.season': '1-2000'},
+        },
+    'season_war_stats': {
+        'collection': 'db__season_war_stats',
+        'filter': {'_id.season': '1-2000','_id.th': {'$in': [16]}},
+        },
+    'linked_members_for_guild': {
+        'collection': 'db__player',
+        'filter': {'discord_user': {'$in': [0]},'is_member': True},
+        },
+    'saved_roles_for_guild': {
+        'collection': 'db__discord_member',
+        'filter': {'guild_id': 0},
+        },
+    'players_in_cycle': {
+        'collection': 'db__player',
+        'filter': {'_cycle_id': 1},
+        },
+    }
+
+def plan_stages(plan:dict) -> List[str]:
+    """
+    Flattens a query plan into the list of stages it uses.
+    """
+    stages = [plan.get('stage','')]
+    if 'inputStage' in plan:
+        stages.extend(plan_stages(plan['inputStage']))
+    for child in plan.get('inputStages',[]):
+        stages.extend(plan_stages(child))
+    return stages
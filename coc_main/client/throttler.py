@@ -1,52 +1,231 @@
 import coc
 import asyncio
+import contextvars
 
-from aiolimiter import AsyncLimiter
-from collections import deque
-from time import process_time
+from typing import *
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from time import monotonic, perf_counter
+
+API_ENDPOINT = contextvars.ContextVar('API_ENDPOINT',default='default')
+_REQUEST_START = contextvars.ContextVar('_REQUEST_START',default=None)
+
+@contextmanager
+def api_endpoint(family:str):
+    """
+    Tags API requests made within this block with an endpoint family, for the throttler's per-endpoint budgets.
+    """
+    token = API_ENDPOINT.set(family)
+    try:
+        yield
+    finally:
+        API_ENDPOINT.reset(token)
 
 ############################################################
 ############################################################
 #####
-##### THROTTLER / COUNTER
+##### TOKEN BUCKET
 #####
 ############################################################
 ############################################################
-class CounterThrottler(coc.BasicThrottler):
+class TokenBucket():
+    __slots__ = [
+        'base_rate',
+        'rate',
+        'capacity',
+        'tokens',
+        'updated'
+        ]
+
+    def __init__(self,rate:float,capacity:Optional[float]=None):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1,rate)
+        self.tokens = self.capacity
+        self.updated = monotonic()
+
+    def _refill(self,now:float):
+        self.tokens = min(self.capacity,self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self,now:float) -> float:
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+    def penalize(self,factor:float=0.5,floor:float=0.1):
+        self.rate = max(self.base_rate * floor,self.rate * factor)
+        self.tokens = min(self.tokens,0)
+
+    def recover(self,step:float=0.01):
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate,self.rate + self.base_rate * step)
+
+############################################################
+############################################################
+#####
+##### THROTTLER
+#####
+############################################################
+############################################################
+class TokenBucketThrottler(coc.BasicThrottler):
+    """
+    Throttles API requests with one token bucket per API key, and one per endpoint family.
+
+    Key buckets are used round-robin, in step with coc.py's key rotation. Endpoint budgets are a share of the total key rate, so that no single family can starve the others. A 429 response halves its family's rate, which then recovers gradually on successful requests.
+
+    All counters use wall-clock time.
+    """
+    endpoint_shares = {
+        'players': 0.8,
+        'clans': 0.6,
+        'currentwar': 0.5,
+        'capitalraidseasons': 0.3,
+        'locations': 0.2,
+        'default': 1.0
+        }
+    latency_buckets = [0.1,0.25,0.5,1,2.5,5,float('inf')]
+    window = 10
+
     def __init__(self,sleep_time):
-        self.limiter = AsyncLimiter(1,sleep_time)
-        self.sent_lock = asyncio.Lock()
-        self.sent_time = process_time()
+        super().__init__(sleep_time)
+        self.configure(key_count=1,rate_per_key=1/sleep_time)
+        self.reset_stats()
+
+    def configure(self,key_count:int,rate_per_key:float):
+        self.key_count = max(1,key_count)
+        self.rate_per_key = rate_per_key
+        self.sleep_time = 1 / (self.key_count * rate_per_key)
+
+        self._key_index = 0
+        self._key_buckets = [TokenBucket(rate_per_key) for _ in range(self.key_count)]
+        self._endpoint_buckets = {
+            family: TokenBucket(self.key_count * rate_per_key * share)
+            for family,share in self.endpoint_shares.items()
+            }
+        self._endpoint_locks = defaultdict(asyncio.Lock)
+
+    def reset_stats(self):
+        now = monotonic()
+        self.window_start = now
         self.current_sent = 0
-        self.sent = deque(maxlen=3600)
+        self.current_rcvd = 0
+        self.sent = deque(maxlen=360)
+        self.rcvd = deque(maxlen=360)
+
+        self.endpoint_sent = defaultdict(int)
+        self.endpoint_throttled = defaultdict(int)
+        self.latency = defaultdict(lambda: [0] * len(self.latency_buckets))
+
+    async def reset_counter(self):
+        self.reset_stats()
 
-        self.rcvd_lock = asyncio.Lock()
-        self.rcvd_time = process_time()
+    ##################################################
+    ##### STATS
+    ##################################################
+    def _roll(self,now:float):
+        elapsed = now - self.window_start
+        if elapsed < self.window:
+            return
+        self.sent.append(self.current_sent / elapsed)
+        self.rcvd.append(self.current_rcvd / elapsed)
+        self.current_sent = 0
         self.current_rcvd = 0
-        self.rcvd = deque(maxlen=3600)
+        self.window_start = now
 
-        super().__init__(sleep_time)
-    
+    @property
+    def current_throughput(self) -> Tuple[float,float]:
+        now = monotonic()
+        self._roll(now)
+        elapsed = now - self.window_start
+        if elapsed <= 0:
+            return 0,0
+        return self.current_sent / elapsed, self.current_rcvd / elapsed
+
+    def latency_percentile(self,family:str,pct:float) -> float:
+        counts = self.latency.get(family)
+        if not counts or sum(counts) == 0:
+            return 0
+        target = sum(counts) * pct
+        running = 0
+        for edge,count in zip(self.latency_buckets,counts):
+            running += count
+            if running >= target:
+                return edge
+        return self.latency_buckets[-1]
+
+    @property
+    def endpoint_stats(self) -> Dict[str,dict]:
+        return {
+            family: {
+                'rate': bucket.rate,
+                'base_rate': bucket.base_rate,
+                'sent': self.endpoint_sent[family],
+                'throttled': self.endpoint_throttled[family],
+                'p50': self.latency_percentile(family,0.5),
+                'p95': self.latency_percentile(family,0.95)
+                }
+            for family,bucket in self._endpoint_buckets.items()
+            }
+
+    def has_capacity(self,family:str='default') -> bool:
+        """
+        Whether a request for the endpoint family could be sent now, without waiting on its bucket or the next key's.
+        """
+        if family not in self._endpoint_buckets:
+            family = 'default'
+        now = monotonic()
+        return self._key_buckets[self._key_index].wait_time(now) == 0 and self._endpoint_buckets[family].wait_time(now) == 0
+
+    ##################################################
+    ##### CONTEXT MANAGER
+    ##################################################
     async def __aenter__(self):
-        await self.limiter.acquire()
-        await self.increment_sent()
-        return self
-    
-    async def __aexit__(self, exc_type, exc, tb):
-        await self.increment_rcvd()
+        family = API_ENDPOINT.get()
+        if family not in self._endpoint_buckets:
+            family = 'default'
+        endpoint_bucket = self._endpoint_buckets[family]
+
+        async with self._endpoint_locks[family]:
+            while True:
+                now = monotonic()
+                key_bucket = self._key_buckets[self._key_index]
+                wait = max(endpoint_bucket.wait_time(now),key_bucket.wait_time(now))
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            endpoint_bucket.consume()
+            key_bucket.consume()
+            self._key_index = (self._key_index + 1) % self.key_count
+
+        self._roll(now)
+        self.current_sent += 1
+        self.endpoint_sent[family] += 1
+        _REQUEST_START.set((family,perf_counter()))
         return self
-    
-    async def reset_counter(self):
-        async with self.sent_lock, self.rcvd_lock:
-            self.sent = deque(maxlen=3600)
-            self.sent_time = process_time()
-            self.rcvd = deque(maxlen=3600)
-            self.rcvd_time = process_time()
-    
-    async def increment_sent(self):
-        async with self.sent_lock:
-            self.current_sent += 1
-    
-    async def increment_rcvd(self):
-        async with self.rcvd_lock:
-            self.current_rcvd += 1
\ No newline at end of file
+
+    async def __aexit__(self,exc_type,exc,tb):
+        start = _REQUEST_START.get()
+        family = start[0] if start else 'default'
+
+        if getattr(exc,'status',None) == 429:
+            self._endpoint_buckets[family].penalize()
+            self.endpoint_throttled[family] += 1
+        else:
+            self._endpoint_buckets[family].recover()
+
+        if start:
+            elapsed = perf_counter() - start[1]
+            counts = self.latency[family]
+            for i,edge in enumerate(self.latency_buckets):
+                if elapsed <= edge:
+                    counts[i] += 1
+                    break
+
+        self._roll(monotonic())
+        self.current_rcvd += 1
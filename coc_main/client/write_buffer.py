@@ -0,0 +1,401 @@
+import asyncio
+import bson
+import hashlib
+import json
+import logging
+import os
+
+from typing import *
+from collections import deque
+from time import perf_counter
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .db_client import MotorClient
+
+COC_LOG = logging.getLogger("coc.main")
+
+class BulkWriteBuffer():
+    """
+    Write-behind buffer for attribute sync.
+
+    Field changes are merged per `_id` and flushed to `collection` as one `bulk_write`, either when `max_size` documents are pending or `max_delay` seconds after the first pending change.
+
+    Pending values are visible through `pending()`, so readers can overlay them on top of what's in the database.
+    """
+    __slots__ = [
+        'collection',
+        'max_size',
+        'max_delay',
+        '_pending',
+        '_flushing',
+        '_flush_lock',
+        '_flush_now',
+        '_flush_task',
+        'flush_count',
+        'write_count',
+        'error_count',
+        'flush_runtime',
+        'flush_sizes'
+        ]
+
+    def __init__(self,collection:str,max_size:int=500,max_delay:float=5):
+        self.collection = collection
+        self.max_size = max_size
+        self.max_delay = max_delay
+
+        self._pending = {}
+        self._flushing = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_now = False
+        self._flush_task = None
+
+        self.flush_count = 0
+        self.write_count = 0
+        self.error_count = 0
+        self.flush_runtime = deque(maxlen=100)
+        self.flush_sizes = deque(maxlen=100)
+
+    def __len__(self):
+        return len(self._pending)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'pending': len(self._pending),
+            'flushes': self.flush_count,
+            'writes': self.write_count,
+            'errors': self.error_count,
+            'avg_runtime': sum(self.flush_runtime)/len(self.flush_runtime) if len(self.flush_runtime) > 0 else 0,
+            'avg_size': sum(self.flush_sizes)/len(self.flush_sizes) if len(self.flush_sizes) > 0 else 0
+            }
+
+    def pending(self,_id:str) -> dict:
+        return {**self._flushing.get(_id,{}),**self._pending.get(_id,{})}
+
+    def queue(self,_id:str,**fields):
+        self._pending.setdefault(_id,{}).update(fields)
+
+        if len(self._pending) >= self.max_size:
+            self._schedule(0)
+        else:
+            self._schedule(self.max_delay)
+
+    def _schedule(self,delay:float):
+        if delay == 0:
+            if not self._flush_now:
+                self._flush_now = True
+                asyncio.create_task(self._delayed_flush(0))
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush(delay))
+
+    async def _delayed_flush(self,delay:float):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        try:
+            await self.flush()
+        except Exception:
+            COC_LOG.exception(f"Error flushing {self.collection} write buffer.")
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if len(self._pending) == 0:
+                return 0
+
+            batch = self._flushing = self._pending
+            self._pending = {}
+            self._flush_now = False
+
+            st = perf_counter()
+            keys = list(batch.keys())
+            ops = [UpdateOne({'_id':k},{'$set':batch[k]},upsert=True) for k in keys]
+            try:
+                await MotorClient.database[self.collection].bulk_write(ops,ordered=False)
+
+            except BulkWriteError as exc:
+                failed = [keys[e['index']] for e in exc.details.get('writeErrors',[])]
+                self.error_count += len(failed)
+                self._requeue({k:batch[k] for k in failed})
+                COC_LOG.error(f"{self.collection} write buffer: {len(failed)} of {len(ops)} writes failed.")
+
+            except BaseException:
+                self.error_count += len(ops)
+                self._requeue(batch)
+                raise
+
+            finally:
+                self._flushing = {}
+
+            et = perf_counter()
+            self.flush_count += 1
+            self.write_count += len(ops)
+            self.flush_runtime.append(et-st)
+            self.flush_sizes.append(len(ops))
+            COC_LOG.debug(f"{self.collection} write buffer: flushed {len(ops)} documents in {et-st:.3f}s.")
+            return len(ops)
+
+    def _requeue(self,batch:dict):
+        # changes queued since the batch was taken are newer, and take precedence
+        for k,v in batch.items():
+            self._pending[k] = {**v,**self._pending.get(k,{})}
+
+    async def close(self) -> int:
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        return await self.flush()
+
+class InsertBuffer():
+    """
+    Bounded write-ahead buffer for append-only documents.
+
+    Documents are inserted into `collection` with `insert_many`, either when `max_size` documents are pending or `max_delay` seconds after the first pending document. Each document's `_id` is derived from its `key_fields`, so re-inserting a document is a no-op: flushes and spill replays are idempotent.
+
+    If a spill file is opened, every queued document is also appended to it, and the file is compacted to the still-pending documents after each flush. Documents left in the file by a crash or reload are replayed when it is next opened.
+
+    At most `max_pending` documents are held. Beyond that, the oldest are moved out of memory: to an overflow file next to the spill file, replayed along with it, or dropped if no spill file is open.
+    """
+    __slots__ = [
+        'collection',
+        'key_fields',
+        'max_size',
+        'max_delay',
+        'max_pending',
+        'on_insert',
+        '_pending',
+        '_flush_lock',
+        '_flush_now',
+        '_flush_task',
+        '_spill_path',
+        '_spill',
+        'flush_count',
+        'insert_count',
+        'duplicate_count',
+        'dropped_count',
+        'overflow_count',
+        'replayed_count',
+        'error_count',
+        'flush_runtime'
+        ]
+
+    def __init__(self,
+        collection:str,
+        key_fields:List[str],
+        max_size:int=1000,
+        max_delay:float=10,
+        max_pending:int=100000,
+        on_insert:Optional[Callable[[List[dict]],Awaitable[Any]]]=None):
+
+        self.collection = collection
+        self.key_fields = key_fields
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.on_insert = on_insert
+
+        self._pending = deque()
+        self._flush_lock = asyncio.Lock()
+        self._flush_now = False
+        self._flush_task = None
+        self._spill_path = None
+        self._spill = None
+
+        self.flush_count = 0
+        self.insert_count = 0
+        self.duplicate_count = 0
+        self.dropped_count = 0
+        self.overflow_count = 0
+        self.replayed_count = 0
+        self.error_count = 0
+        self.flush_runtime = deque(maxlen=100)
+
+    def __len__(self):
+        return len(self._pending)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'pending': len(self._pending),
+            'flushes': self.flush_count,
+            'inserted': self.insert_count,
+            'duplicates': self.duplicate_count,
+            'dropped': self.dropped_count,
+            'overflowed': self.overflow_count,
+            'replayed': self.replayed_count,
+            'errors': self.error_count,
+            'avg_runtime': sum(self.flush_runtime)/len(self.flush_runtime) if len(self.flush_runtime) > 0 else 0,
+            'max_runtime': max(self.flush_runtime) if len(self.flush_runtime) > 0 else 0
+            }
+
+    def document_id(self,doc:dict) -> bson.ObjectId:
+        key = json.dumps([doc.get(f) for f in self.key_fields],default=str)
+        return bson.ObjectId(hashlib.blake2b(key.encode(),digest_size=12).digest())
+
+    ##################################################
+    ### SPILL FILE
+    ##################################################
+    @staticmethod
+    def _read_spill(path:str) -> List[dict]:
+        docs = []
+        if os.path.exists(path):
+            with open(path,'r') as f:
+                for line in f:
+                    try:
+                        docs.append(json.loads(line))
+                    except ValueError:
+                        # a partial line from an interrupted write
+                        continue
+        return docs
+
+    def open_spill(self,path:str) -> int:
+        """
+        Replays documents left in the spill file at `path` and its overflow file, and appends all further documents to it. Documents already queued are written to it too. Returns the number of documents replayed.
+        """
+        replayed = self._read_spill(path)
+        overflowed = self._read_spill(path + '.overflow')
+
+        self._spill_path = path
+        self._spill = open(path,'a')
+        # the spill file must hold everything pending: overflowed documents, and any queued before it was opened
+        self._write_spill(overflowed + list(self._pending))
+        if os.path.exists(path + '.overflow'):
+            os.remove(path + '.overflow')
+
+        replayed.extend(overflowed)
+        if len(replayed) > 0:
+            self._pending.extendleft(reversed(replayed))
+            self.replayed_count += len(replayed)
+            self._schedule(0)
+            COC_LOG.info(f"{self.collection} insert buffer: replaying {len(replayed)} documents from {path}.")
+        return len(replayed)
+
+    def _write_spill(self,docs:Iterable[dict]):
+        if not self._spill:
+            return
+        self._spill.write("".join([json.dumps(doc,default=str) + "\n" for doc in docs]))
+        self._spill.flush()
+
+    def _compact_spill(self):
+        if not self._spill:
+            return
+        if len(self._pending) == 0:
+            self._spill.seek(0)
+            self._spill.truncate()
+            return
+        self._spill.close()
+        tmp_path = self._spill_path + '.tmp'
+        with open(tmp_path,'w') as f:
+            f.write("".join([json.dumps(doc,default=str) + "\n" for doc in self._pending]))
+        os.replace(tmp_path,self._spill_path)
+        self._spill = open(self._spill_path,'a')
+
+    ##################################################
+    ### QUEUE / FLUSH
+    ##################################################
+    def queue(self,*docs:dict):
+        self._pending.extend(docs)
+        self._write_spill(docs)
+
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            evicted = [self._pending.popleft() for _ in range(overflow)]
+            if self._spill:
+                # kept on disk, outside the spill file, so that compaction doesn't discard them
+                with open(self._spill_path + '.overflow','a') as f:
+                    f.write("".join([json.dumps(doc,default=str) + "\n" for doc in evicted]))
+                self.overflow_count += overflow
+                COC_LOG.warning(f"{self.collection} insert buffer: full, moved {overflow} documents to the overflow file.")
+            else:
+                self.dropped_count += overflow
+                COC_LOG.warning(f"{self.collection} insert buffer: full, dropped {overflow} documents.")
+
+        if len(self._pending) >= self.max_size:
+            self._schedule(0)
+        else:
+            self._schedule(self.max_delay)
+
+    def _schedule(self,delay:float):
+        if delay == 0:
+            if not self._flush_now:
+                self._flush_now = True
+                asyncio.create_task(self._delayed_flush(0))
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush(delay))
+
+    async def _delayed_flush(self,delay:float):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        try:
+            await self.flush()
+        except Exception:
+            COC_LOG.exception(f"Error flushing {self.collection} insert buffer.")
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            self._flush_now = False
+            if len(self._pending) == 0:
+                return 0
+
+            batch = list(self._pending)
+            self._pending.clear()
+            for doc in batch:
+                doc['_id'] = self.document_id(doc)
+
+            st = perf_counter()
+            failed = []
+            duplicates = set()
+            try:
+                await MotorClient.database[self.collection].insert_many(batch,ordered=False)
+
+            except BulkWriteError as exc:
+                for e in exc.details.get('writeErrors',[]):
+                    if e.get('code') == 11000:
+                        duplicates.add(e['index'])
+                    else:
+                        failed.append(e['index'])
+
+            except BaseException:
+                self.error_count += len(batch)
+                self._requeue(batch)
+                raise
+
+            if len(failed) > 0:
+                self.error_count += len(failed)
+                self._requeue([batch[i] for i in failed])
+                COC_LOG.error(f"{self.collection} insert buffer: {len(failed)} of {len(batch)} inserts failed.")
+
+            skip = duplicates.union(failed)
+            inserted = [doc for i,doc in enumerate(batch) if i not in skip]
+
+            et = perf_counter()
+            self.flush_count += 1
+            self.insert_count += len(inserted)
+            self.duplicate_count += len(duplicates)
+            self.flush_runtime.append(et-st)
+            self._compact_spill()
+            COC_LOG.debug(f"{self.collection} insert buffer: inserted {len(inserted)} documents ({len(duplicates)} duplicates) in {et-st:.3f}s.")
+
+        if self.on_insert and len(inserted) > 0:
+            await self.on_insert(inserted)
+        return len(inserted)
+
+    def _requeue(self,batch:List[dict]):
+        for doc in batch:
+            doc.pop('_id',None)
+        self._pending.extendleft(reversed(batch))
+
+    async def close(self) -> int:
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+        try:
+            return await self.flush()
+        finally:
+            if self._spill:
+                self._spill.close()
+                self._spill = None
@@ -14,17 +14,75 @@ from redbot.core.bot import Red
 from redbot.core.utils import AsyncIter
 
 from ...client.db_client import MotorClient
+from ...client.write_buffer import BulkWriteBuffer
 
+from ...utils.cache import AttributeCache, SyncIndex
+from ...utils.prefix_index import PrefixIndex
 from ...utils.constants.coc_emojis import EmojisTownHall
 from ...utils.utils import check_rtl
 
 DATA_LOG = logging.getLogger("coc.main")
 
 class BasicClan(AwaitLoader):
+    search_index = PrefixIndex('clan',key_fields=['name','abbreviation'])
+
+    @classmethod
+    async def build_search_index(cls):
+        alliance_query = _ClanAttributes.database.db__alliance_clan.find({},{'_id':1})
+        alliance_clans = set([db['_id'] async for db in alliance_query])
+
+        async def _rows():
+            query = _ClanAttributes.database.db__clan.find({},{'_id':1,'name':1,'abbreviation':1})
+            async for db in query:
+                yield db['_id'], {
+                    'name':db.get('name',''),
+                    'abbreviation':db.get('abbreviation',''),
+                    'is_alliance_clan':db['_id'] in alliance_clans
+                    }
+        await cls.search_index.build(_rows())
+    
+    @classmethod
+    async def load_many(cls,tags:Iterable[str],reload:bool=False) -> int:
+        """
+        Bulk loads clan attributes into the attribute cache. See `_ClanAttributes.load_many`.
+        """
+        return len(await _ClanAttributes.load_many(tags,reload=reload))
+    
+    @classmethod
+    def clear_cache(cls) -> int:
+        return _ClanAttributes._cache.clear()
+    
+    @classmethod
+    def cache_stats(cls) -> dict:
+        return _ClanAttributes._cache.stats
+    
+    @classmethod
+    def write_stats(cls) -> dict:
+        return _ClanAttributes._write_buffer.stats
+
+    @classmethod
+    def sync_stats(cls) -> dict:
+        return _ClanAttributes._sync_index.stats
+
+    @classmethod
+    def is_recently_synced(cls,tag:str) -> bool:
+        return _ClanAttributes._sync_index.is_fresh(coc.utils.correct_tag(tag))
+
+    @classmethod
+    async def warm_sync_index(cls):
+        index = _ClanAttributes._sync_index
+        async def _rows():
+            query = _ClanAttributes.database.db__clan.find(
+                {'last_sync':{'$gt':pendulum.now().int_timestamp - index.max_age}},
+                {'_id':1,'last_sync':1}
+                )
+            async for db in query:
+                yield db['_id'], db['last_sync']
+        await index.warm(_rows())
     
     @classmethod
-    def clear_cache(cls):
-        _ClanAttributes._cache = {}
+    async def flush_writes(cls) -> int:
+        return await _ClanAttributes._write_buffer.close()
     
     """
     The BasicClan class provides a consolidated interface for inheriting clan objects.
@@ -199,6 +257,7 @@ class BasicClan(AwaitLoader):
             self._attributes.abbreviation = abbreviation.upper()
             self._attributes.emoji = emoji
             self._attributes.unicode_emoji = unicode_emoji
+            BasicClan.search_index.upsert(self.tag,abbreviation=self.abbreviation)
 
             await self.database.db__clan.update_one(
                 {'_id':self.tag},
@@ -236,6 +295,7 @@ class BasicClan(AwaitLoader):
             if self.is_alliance_clan:
                 await self.database.db__alliance_clan.delete_one({'_id':self.tag})
                 self._attributes.is_alliance_clan = False
+            BasicClan.search_index.upsert(self.tag,abbreviation='',is_alliance_clan=False)
             
             DATA_LOG.info(
                 f"{self}: Clan Unregistered!"
@@ -293,6 +353,7 @@ class BasicClan(AwaitLoader):
                 },
                 upsert=True)
             self._attributes.is_alliance_clan = True
+            BasicClan.search_index.upsert(self.tag,is_alliance_clan=True)
             DATA_LOG.info(f"{self}: leader is now {new_leader}.")
     
     async def new_coleader(self,new_coleader:int):
@@ -397,51 +458,32 @@ class BasicClan(AwaitLoader):
     async def set_name(self,new_name:str):        
         async with self._attributes._lock:
             self._attributes.name = new_name
-            await self.database.db__clan.update_one(
-                {'_id':self.tag},
-                {'$set':{'name':self.name}},
-                upsert=True
-                )
+            _ClanAttributes._write_buffer.queue(self.tag,name=self.name)
+            BasicClan.search_index.upsert(self.tag,name=self.name)
             DATA_LOG.debug(f"{self}: name changed to {self.name}.")
 
     async def set_badge(self,new_badge:str):        
         async with self._attributes._lock:
             self._attributes.badge = new_badge
-            await self.database.db__clan.update_one(
-                {'_id':self.tag},
-                {'$set':{'badge':self.badge}},
-                upsert=True
-                )
+            _ClanAttributes._write_buffer.queue(self.tag,badge=self.badge)
             DATA_LOG.debug(f"{self}: badge changed to {self.badge}.")
     
     async def set_level(self,new_level:int):        
         async with self._attributes._lock:
             self._attributes.level = new_level
-            await self.database.db__clan.update_one(
-                {'_id':self.tag},
-                {'$set':{'level':self.level}},
-                upsert=True
-                )
+            _ClanAttributes._write_buffer.queue(self.tag,level=self.level)
             DATA_LOG.debug(f"{self}: level changed to {self.level}.")
     
     async def set_capital_hall(self,new_capital_hall:int):        
         async with self._attributes._lock:
             self._attributes.capital_hall = new_capital_hall
-            await self.database.db__clan.update_one(
-                {'_id':self.tag},
-                {'$set':{'capital_hall':self.capital_hall}},
-                upsert=True
-                )
+            _ClanAttributes._write_buffer.queue(self.tag,capital_hall=self.capital_hall)
             DATA_LOG.debug(f"{self}: capital_hall changed to {self.capital_hall}.")
     
     async def set_war_league(self,new_war_league:str):
         async with self._attributes._lock:
             self._attributes.war_league_name = new_war_league
-            await self.database.db__clan.update_one(
-                {'_id':self.tag},
-                {'$set':{'war_league':self.war_league_name}},
-                upsert=True
-                )
+            _ClanAttributes._write_buffer.queue(self.tag,war_league=self.war_league_name)
             DATA_LOG.debug(f"{self}: war_league changed to {self.war_league_name}.")
         
     async def set_description(self,description:str):
@@ -486,9 +528,11 @@ class _ClanAttributes(MotorClient):
 
     This class DOES NOT handle database updates - those are handled within the BasicClan class.
     """
-    _cache = {}
     _locks = defaultdict(asyncio.Lock)
     _sync_locks = defaultdict(asyncio.Lock)
+    _cache = AttributeCache('clan',max_size=5000,ttl=3600,locks=[_locks,_sync_locks])
+    _write_buffer = BulkWriteBuffer('db__clan')
+    _sync_index = SyncIndex('clan',max_age=3600)
 
     __slots__ = [
         '_new',
@@ -516,12 +560,13 @@ class _ClanAttributes(MotorClient):
 
     def __new__(cls,tag:str):
         n_tag = coc.utils.correct_tag(tag)
-        if n_tag not in cls._cache:
+        instance = cls._cache.get(n_tag)
+        if instance is None:
             instance = super().__new__(cls)
             instance._new = True
             instance._loaded = False
-            cls._cache[n_tag] = instance
-        return cls._cache[n_tag]
+            cls._cache.set(n_tag,instance)
+        return instance
     
     def __init__(self,tag:str):
         if self._new:
@@ -561,6 +606,63 @@ class _ClanAttributes(MotorClient):
     
     async def load_data(self):
         clan_db = await self.database.db__clan.find_one({'_id':self.tag})
+        alliance_db = await self.database.db__alliance_clan.find_one({'_id':self.tag})
+        if alliance_db:
+            mem_query = self.database.db__player.find({'is_member':True,'home_clan':self.tag},{'_id':1})
+            alliance_members = [p['_id'] async for p in mem_query]
+        else:
+            alliance_members = []
+        league_db = await self.database.db__war_league_clan_setup.find_one({'_id':self.tag})
+
+        self._apply(clan_db,alliance_db,league_db,alliance_members)
+    
+    @classmethod
+    async def load_many(cls,tags:Iterable[str],reload:bool=False,chunk_size:int=500) -> List['_ClanAttributes']:
+        """
+        Loads attributes for many clans with one `$in` query per collection, instead of one set of queries per clan.
+
+        Clans already loaded are left as is, unless `reload` is set.
+        """
+        instances = {}
+        for tag in tags:
+            instance = cls(tag)
+            instances[instance.tag] = instance
+        to_load = [t for t,i in instances.items() if reload or not i._loaded]
+
+        for i in range(0,len(to_load),chunk_size):
+            chunk = to_load[i:i+chunk_size]
+
+            clan_query = cls.database.db__clan.find({'_id':{'$in':chunk}})
+            clan_dbs = {db['_id']:db async for db in clan_query}
+
+            alliance_query = cls.database.db__alliance_clan.find({'_id':{'$in':chunk}})
+            alliance_dbs = {db['_id']:db async for db in alliance_query}
+
+            league_query = cls.database.db__war_league_clan_setup.find({'_id':{'$in':chunk}})
+            league_dbs = {db['_id']:db async for db in league_query}
+
+            alliance_members = defaultdict(list)
+            if len(alliance_dbs) > 0:
+                mem_query = cls.database.db__player.find(
+                    {'is_member':True,'home_clan':{'$in':list(alliance_dbs.keys())}},
+                    {'_id':1,'home_clan':1}
+                    )
+                async for p in mem_query:
+                    alliance_members[p['home_clan']].append(p['_id'])
+
+            for tag in chunk:
+                instances[tag]._apply(
+                    clan_dbs.get(tag,None),
+                    alliance_dbs.get(tag,None),
+                    league_dbs.get(tag,None),
+                    alliance_members.get(tag,[])
+                    )
+        return list(instances.values())
+    
+    def _apply(self,clan_db:Optional[dict],alliance_db:Optional[dict],league_db:Optional[dict],alliance_members:List[str]):
+        pending = self._write_buffer.pending(self.tag)
+        if pending:
+            clan_db = {**(clan_db or {}),**pending}
         self.name = clan_db.get('name','') if clan_db else ''
         self.badge = clan_db.get('badge','') if clan_db else ''
         self.level = clan_db.get('level',0) if clan_db else 0
@@ -572,8 +674,9 @@ class _ClanAttributes(MotorClient):
 
         ls = clan_db.get('last_sync',0) if clan_db else 0
         self._last_sync = pendulum.from_timestamp(ls) if ls else None
+        if ls:
+            self._sync_index.set(self.tag,ls)
 
-        alliance_db = await self.database.db__alliance_clan.find_one({'_id':self.tag})
         self.is_alliance_clan = True if alliance_db else False
         self.recruitment_level = sorted(alliance_db.get('recruitment_level',[]) if alliance_db else [])
         self.recruitment_info = alliance_db.get('recruitment_info','') if alliance_db else ''
@@ -581,14 +684,8 @@ class _ClanAttributes(MotorClient):
         self.leader = alliance_db.get('leader',0) if alliance_db else 0
         self.coleaders = alliance_db.get('coleaders',[]) if alliance_db else []
         self.elders = alliance_db.get('elders',[]) if alliance_db else []
+        self.alliance_members = alliance_members if self.is_alliance_clan else []
 
-        if self.is_alliance_clan:
-            mem_query = self.database.db__player.find({'is_member':True,'home_clan':self.tag},{'_id':1})
-            self.alliance_members = [p['_id'] async for p in mem_query]
-        else:
-            self.alliance_members = []
-
-        league_db = await self.database.db__war_league_clan_setup.find_one({'_id':self.tag})
         self.is_active_league_clan = league_db.get('is_active',False) if league_db else False
         
         self._loaded = True
@@ -596,9 +693,6 @@ class _ClanAttributes(MotorClient):
     async def update_last_sync(self,timestamp:pendulum.DateTime):
         async with self._lock:
             self._last_sync = timestamp
-            await self.database.db__clan.update_one(
-                {'_id':self.tag},
-                {'$set':{'last_sync':timestamp.int_timestamp}},
-                upsert=True
-                )
+            self._write_buffer.queue(self.tag,last_sync=timestamp.int_timestamp)
+            self._sync_index.set(self.tag,timestamp.int_timestamp)
             DATA_LOG.debug(f"{self}: last_sync changed to {self._last_sync}.")
\ No newline at end of file
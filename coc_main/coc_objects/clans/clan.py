@@ -134,6 +134,10 @@ class aClan(coc.Clan,BasicClan,AwaitLoader):
     
     @classmethod
     async def _sync_cache(cls,clan:'aClan',force:bool=False):        
+        # skip recently synced tags without reading the database
+        if not force and BasicClan.is_recently_synced(clan.tag):
+            return
+
         basic_clan = await BasicClan(clan.tag)
         await basic_clan._attributes.load_data()
         
@@ -12,6 +12,7 @@ from ...client.db_client import MotorClient
 
 from .war_attack import bWarAttack
 from .war_clans import bWarClan, bWarLeagueClan, bWarPlayer
+from .war_participation import aWarParticipation
 
 from ..season.season import aClashSeason
 
@@ -32,69 +33,62 @@ class bClanWar(coc.ClanWar,MotorClient,AwaitLoader):
     async def _search_by_tag(cls,war_tag:str) -> dict:
         query = await MotorClient.database.db__nclan_war.find_one({'tag':war_tag})
         return query
+    
+    @classmethod
+    async def _search_by_id(cls,war_id:str) -> dict:
+        query = await MotorClient.database.db__nclan_war.find_one({'_id':war_id})
+        return query
+
+    @staticmethod
+    def _query_for_season(season:aClashSeason) -> dict:
+        # preparationStartTime is stored on every war as a UTC 'YYYYMMDDTHHmmss.000Z' string, which sorts chronologically.
+        # preparationStartTimeISO is only present on wars saved after it was added.
+        return {'preparationStartTime': {
+            '$gte': season.season_start.in_timezone('UTC').format('YYYYMMDDTHHmmss') + '.000Z',
+            '$lte': season.season_end.in_timezone('UTC').format('YYYYMMDDTHHmmss') + '.000Z'
+            }
+        }
+
+    @staticmethod
+    def _query_for_player(player_tag:str,season:aClashSeason=None) -> dict:
+        query_doc = {
+            '$and': [
+                {'type': ClanWarType.RANDOM},
+                {'$or': [
+                    {'clan.members.tag': player_tag},
+                    {'opponent.members.tag': player_tag}
+                    ]
+                }
+            ]
+        }
+        if season:
+            query_doc['$and'].insert(1,bClanWar._query_for_season(season))
+        return query_doc
+    
+    @staticmethod
+    def _query_for_clan(clan_tag:str,season:aClashSeason=None) -> dict:
+        query_doc = {
+            '$and': [
+                {'type': ClanWarType.RANDOM},
+                {'$or': [
+                    {'clan.tag': clan_tag},
+                    {'opponent.tag': clan_tag}
+                    ]
+                }
+            ]
+        }
+        if season:
+            query_doc['$and'].insert(1,bClanWar._query_for_season(season))
+        return query_doc
 
     @classmethod
     async def _search_for_player(cls,player_tag:str,season:aClashSeason=None) -> dict:
-        if season:
-            query_doc = {
-                '$and': [
-                    {'type': ClanWarType.RANDOM},
-                    {'preparationStartTimeISO': {
-                        '$gte': season.season_start,
-                        '$lte': season.season_end
-                        }
-                    },
-                    {'$or': [
-                        {'clan.members.tag': player_tag},
-                        {'opponent.members.tag': player_tag}
-                        ]
-                    }
-                ]
-            }
-        else:
-            query_doc = {
-                '$and': [
-                    {'type': ClanWarType.RANDOM},
-                    {'$or': [
-                        {'clan.members.tag': player_tag},
-                        {'opponent.members.tag': player_tag}
-                        ]
-                    }
-                ]
-            }
-        query = await MotorClient.database.db__nclan_war.find(query_doc).to_list(None)
+        query = await MotorClient.database.db__nclan_war.find(cls._query_for_player(player_tag,season)).to_list(None)
         return query
     
     @classmethod
     async def _search_for_clan(cls,clan_tag:str,season:aClashSeason=None) -> dict:
-        if season:
-            query_doc = {
-                '$and': [
-                    {'type': ClanWarType.RANDOM},
-                    {'preparationStartTimeISO': {
-                        '$gte': season.season_start,
-                        '$lte': season.season_end
-                        }
-                    },
-                    {'$or': [
-                        {'clan.tag': clan_tag},
-                        {'opponent.tag': clan_tag}
-                        ]
-                    }
-                ]
-            }
-        else:
-            query_doc = {
-                '$and': [
-                    {'type': ClanWarType.RANDOM},
-                    {'$or': [
-                        {'clan.tag': clan_tag},
-                    {'opponent.tag': clan_tag}
-                        ]
-                    }
-                ]
-            }
-        query = await MotorClient.database.db__nclan_war.find(query_doc).to_list(None)
+        query = await MotorClient.database.db__nclan_war.find(cls._query_for_clan(clan_tag,season)).to_list(None)
         return query
        
     def __init__(self,**kwargs):
@@ -244,6 +238,7 @@ class bClanWar(coc.ClanWar,MotorClient,AwaitLoader):
             'teamSize': self.team_size,
             'attacksPerMember': self.attacks_per_member,
             'preparationStartTime': self.preparation_start_time.format('YYYYMMDDTHHmmss') + '.000Z',
+            'preparationStartTimeISO': self.preparation_start_time,
             'startTime': self.start_time.format('YYYYMMDDTHHmmss') + '.000Z',
             'endTime': self.end_time.format('YYYYMMDDTHHmmss') + '.000Z',
             
@@ -262,6 +257,7 @@ class bClanWar(coc.ClanWar,MotorClient,AwaitLoader):
             {'$set':self._api_json()},
             upsert=True
             )
+        await aWarParticipation.record_war(self)
 
 ##################################################
 #####
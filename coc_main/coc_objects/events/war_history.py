@@ -0,0 +1,377 @@
+import pendulum
+import logging
+
+from typing import *
+
+from datetime import datetime
+from functools import cached_property
+
+from ...client.db_client import MotorClient
+
+from .clan_war_v2 import bClanWar
+
+from ..season.season import aClashSeason
+from ..clans.base_clan import BasicClan
+
+from ...utils.constants.coc_constants import ClanWarType, WarResult
+from ...utils.constants.coc_emojis import EmojisClash
+from ...utils.constants.ui_emojis import EmojisUI
+from ...utils.utils import check_rtl
+
+LOG = logging.getLogger("coc.main")
+
+def _parse_war_time(value:Optional[str]) -> Optional[pendulum.DateTime]:
+    if not value:
+        return None
+    return pendulum.instance(datetime.strptime(value,'%Y%m%dT%H%M%S.%fZ'),tz='UTC')
+
+##################################################
+#####
+##### WAR HISTORY CLAN
+#####
+##################################################
+class WarHistoryClan():
+    """
+    Summary of one side of a stored war, read straight from the war document.
+    """
+    def __init__(self,entry:'WarHistoryEntry',data:dict):
+        self.entry = entry
+        self._data = data
+        self.tag = data.get('tag',None)
+        self.name = data.get('name',None)
+        self.stars = data.get('stars',0)
+        self.destruction = data.get('destructionPercentage',0.0)
+        self.attacks_used = data.get('attacks',0)
+
+    @property
+    def clean_name(self) -> str:
+        if check_rtl(self.name):
+            return '\u200F' + self.name + '\u200E'
+        return self.name
+
+    @property
+    def emoji(self) -> str:
+        if self.entry.type == ClanWarType.CWL:
+            return EmojisClash.WARLEAGUES
+        elif self.entry.type == ClanWarType.FRIENDLY:
+            return EmojisUI.HANDSHAKE
+        clan = BasicClan(self.tag)
+        if clan.is_alliance_clan:
+            return clan.emoji
+        return EmojisClash.CLANWAR
+
+    @property
+    def unused_attacks(self) -> int:
+        return self.entry.attacks_per_member * self.entry.team_size - self.attacks_used
+
+    @cached_property
+    def result(self) -> str:
+        opponent = self.entry.get_opponent(self.tag)
+        if self.stars > opponent.stars:
+            result = WarResult.WON
+        elif self.stars < opponent.stars:
+            result = WarResult.LOST
+        elif self.destruction > opponent.destruction:
+            result = WarResult.WON
+        elif self.destruction < opponent.destruction:
+            result = WarResult.LOST
+        else:
+            result = WarResult.TIED
+        return WarResult.ended(result) if pendulum.now() > self.entry.end_time else WarResult.ongoing(result)
+
+    @cached_property
+    def average_townhall(self) -> float:
+        members = self._data.get('members',[])
+        if len(members) == 0:
+            return 0
+        return round(sum([m.get('townhallLevel',0) for m in members]) / len(members),2)
+
+    @cached_property
+    def triples(self) -> int:
+        opponent_th = {m['tag']:m.get('townhallLevel',0) for m in self.entry.get_opponent(self.tag)._data.get('members',[])}
+        count = 0
+        for member in self._data.get('members',[]):
+            for attack in member.get('attacks',[]):
+                if attack.get('stars',0) != 3:
+                    continue
+                if self.entry.type == ClanWarType.CWL or member.get('townhallLevel',0) <= opponent_th.get(attack.get('defenderTag'),0):
+                    count += 1
+        return count
+
+##################################################
+#####
+##### WAR HISTORY ENTRY
+#####
+##################################################
+class WarHistoryEntry(MotorClient):
+    """
+    A stored war, as returned by `WarHistory`.
+
+    Summary attributes are read from the raw document. The full `bClanWar` is only built, and its clans and members loaded, on `hydrate()`.
+    """
+    __slots__ = [
+        '_data',
+        '_war',
+        'client',
+        '_clans',
+        'partial'
+        ]
+
+    def __init__(self,data:dict,client,partial:bool=False):
+        self._data = data
+        self._war = None
+        self.client = client
+        self._clans = None
+        self.partial = partial
+
+    def __str__(self) -> str:
+        return f"{self.preparation_start_time.format('DD MMM YYYY')} {self.clan.name} vs {self.opponent.name}"
+
+    @property
+    def _id(self) -> str:
+        return self._data['_id']
+    @property
+    def type(self) -> Optional[str]:
+        return self._data.get('type',None)
+    @property
+    def state(self) -> Optional[str]:
+        return self._data.get('state',None)
+    @property
+    def is_alliance_war(self) -> bool:
+        return self._data.get('isAllianceWar',False)
+    @property
+    def team_size(self) -> int:
+        return self._data.get('teamSize',0)
+    @property
+    def attacks_per_member(self) -> int:
+        return self._data.get('attacksPerMember',0)
+    @property
+    def preparation_start_time(self) -> Optional[pendulum.DateTime]:
+        return _parse_war_time(self._data.get('preparationStartTime',None))
+    @property
+    def start_time(self) -> Optional[pendulum.DateTime]:
+        return _parse_war_time(self._data.get('startTime',None))
+    @property
+    def end_time(self) -> Optional[pendulum.DateTime]:
+        return _parse_war_time(self._data.get('endTime',None))
+
+    def _load_clans(self) -> Tuple[WarHistoryClan,WarHistoryClan]:
+        if self._clans is None:
+            self._clans = (
+                WarHistoryClan(self,self._data.get('clan',{})),
+                WarHistoryClan(self,self._data.get('opponent',{}))
+                )
+        return self._clans
+
+    @property
+    def clan(self) -> WarHistoryClan:
+        return self._load_clans()[0]
+    @property
+    def opponent(self) -> WarHistoryClan:
+        return self._load_clans()[1]
+
+    def get_clan(self,tag:str) -> WarHistoryClan:
+        if self.clan.tag == tag:
+            return self.clan
+        return self.opponent
+
+    def get_opponent(self,tag:str) -> WarHistoryClan:
+        if self.clan.tag == tag:
+            return self.opponent
+        return self.clan
+
+    async def hydrate(self,clan_tag:Optional[str]=None) -> bClanWar:
+        """
+        Builds and loads the full `bClanWar`. If the history was fetched with a projection, the full document is fetched first.
+        """
+        if self._war is None:
+            data = self._data
+            if self.partial:
+                data = await bClanWar._search_by_id(self._id)
+            self._war = bClanWar(data=data,client=self.client,clan_tag=clan_tag or data['clan']['tag'])
+            await self._war.load()
+        return self._war
+
+##################################################
+#####
+##### WAR HISTORY
+#####
+##################################################
+class WarHistory(MotorClient):
+    """
+    Async iterator over stored wars, newest first.
+
+    Wars are fetched a page at a time, keyed on (preparationStartTime, _id), so only one page is held in memory. Pass a `projection` to fetch only the fields the caller needs.
+
+    ```
+    async for war in WarHistory.for_clan(tag,client):
+        ...
+    ```
+    """
+    _sort_keys = ['preparationStartTime','_id']
+
+    def __init__(self,
+        query:dict,
+        client,
+        projection:Optional[Dict[str,int]]=None,
+        page_size:int=25,
+        limit:Optional[int]=None):
+
+        self.query = query
+        self.client = client
+        self.page_size = page_size
+        self.limit = limit
+
+        self.projection = None
+        if projection:
+            self.projection = {**projection,**{k:1 for k in self._sort_keys}}
+
+    @classmethod
+    def for_clan(cls,clan_tag:str,client,season:Optional[aClashSeason]=None,**kwargs) -> 'WarHistory':
+        return cls(bClanWar._query_for_clan(clan_tag,season),client,**kwargs)
+
+    @classmethod
+    def for_player(cls,player_tag:str,client,season:Optional[aClashSeason]=None,**kwargs) -> 'WarHistory':
+        return cls(bClanWar._query_for_player(player_tag,season),client,**kwargs)
+
+    def _page_query(self,last:Optional[dict]) -> dict:
+        if last is None:
+            return self.query
+        return {
+            '$and': [
+                self.query,
+                {'$or': [
+                    {'preparationStartTime': {'$lt': last['preparationStartTime']}},
+                    {'preparationStartTime': last['preparationStartTime'],'_id': {'$lt': last['_id']}}
+                    ]
+                }
+            ]
+        }
+
+    async def _fetch(self,last:Optional[dict],size:int) -> List[dict]:
+        cursor = self.database.db__nclan_war.find(self._page_query(last),self.projection).sort([(k,-1) for k in self._sort_keys]).limit(size)
+        page = await cursor.to_list(length=size)
+
+        # WarHistoryClan.emoji reads clan attributes synchronously, load them for the page up front
+        tags = set()
+        for data in page:
+            tags.update([data.get('clan',{}).get('tag',None),data.get('opponent',{}).get('tag',None)])
+        tags.discard(None)
+        if len(tags) > 0:
+            await BasicClan.load_many(tags)
+        return page
+
+    async def page(self,after:Optional[WarHistoryEntry]=None) -> List[WarHistoryEntry]:
+        """
+        Returns the page of wars that follows `after`, or the first page.
+        """
+        page = await self._fetch(after._data if after else None,self.page_size)
+        return [WarHistoryEntry(data,self.client,self.projection is not None) for data in page]
+
+    async def clan_summary(self,clan_tag:str) -> dict:
+        """
+        Totals over every war in the history, from `clan_tag`'s side, computed by the database in one aggregate.
+
+        Results follow `WarHistoryClan.result`: stars, then destruction. Ties are only counted once the war has ended.
+        """
+        now = pendulum.now('UTC').format('YYYYMMDDTHHmmss') + '.000Z'
+        pipeline = [
+            {'$match':self.query},
+            {'$project':{
+                'type':1,
+                'startTime':1,
+                'endTime':1,
+                'size':{'$ifNull':['$teamSize',0]},
+                'attacks':{'$multiply':[{'$ifNull':['$attacksPerMember',0]},{'$ifNull':['$teamSize',0]}]},
+                'side':{'$cond':[{'$eq':['$clan.tag',clan_tag]},'$clan','$opponent']},
+                'opp':{'$cond':[{'$eq':['$clan.tag',clan_tag]},'$opponent','$clan']}
+                }},
+            {'$project':{
+                'startTime':1,
+                'size':1,
+                'attacks':1,
+                'unused':{'$subtract':['$attacks',{'$ifNull':['$side.attacks',0]}]},
+                'townhall':{'$ifNull':[{'$avg':'$side.members.townhallLevel'},0]},
+                'result':{'$switch':{
+                    'branches':[
+                        {'case':{'$gt':['$side.stars','$opp.stars']},'then':1},
+                        {'case':{'$lt':['$side.stars','$opp.stars']},'then':-1},
+                        {'case':{'$gt':['$side.destructionPercentage','$opp.destructionPercentage']},'then':1},
+                        {'case':{'$lt':['$side.destructionPercentage','$opp.destructionPercentage']},'then':-1}
+                        ],
+                    'default':0
+                    }},
+                'ended':{'$lt':['$endTime',now]},
+                'triples':{'$sum':{'$map':{
+                    'input':{'$ifNull':['$side.members',[]]},
+                    'as':'m',
+                    'in':{'$size':{'$filter':{
+                        'input':{'$ifNull':['$$m.attacks',[]]},
+                        'as':'a',
+                        'cond':{'$and':[
+                            {'$eq':['$$a.stars',3]},
+                            {'$or':[
+                                {'$eq':['$type',ClanWarType.CWL]},
+                                {'$let':{
+                                    'vars':{'i':{'$indexOfArray':[{'$ifNull':['$opp.members.tag',[]]},'$$a.defenderTag']}},
+                                    'in':{'$and':[
+                                        {'$gte':['$$i',0]},
+                                        {'$lte':['$$m.townhallLevel',{'$arrayElemAt':['$opp.members.townhallLevel','$$i']}]}
+                                        ]}
+                                    }}
+                                ]}
+                            ]}
+                        }}}
+                    }}}
+                }},
+            {'$group':{
+                '_id':None,
+                'wars':{'$sum':1},
+                'wins':{'$sum':{'$cond':[{'$eq':['$result',1]},1,0]}},
+                'losses':{'$sum':{'$cond':[{'$eq':['$result',-1]},1,0]}},
+                'ties':{'$sum':{'$cond':[{'$and':[{'$eq':['$result',0]},'$ended']},1,0]}},
+                'team_size':{'$sum':'$size'},
+                'townhall':{'$sum':'$townhall'},
+                'attacks':{'$sum':'$attacks'},
+                'triples':{'$sum':'$triples'},
+                'unused':{'$sum':'$unused'},
+                'first_start':{'$min':'$startTime'}
+                }}
+            ]
+        result = await self.database.db__nclan_war.aggregate(pipeline).to_list(length=1)
+        summary = {'wars':0,'wins':0,'losses':0,'ties':0,'team_size':0,'townhall':0,'attacks':0,'triples':0,'unused':0,'first_start':None}
+        if len(result) > 0:
+            summary.update({k:v for k,v in result[0].items() if k != '_id'})
+            first_start = _parse_war_time(summary['first_start'])
+            summary['first_start'] = first_start.int_timestamp if first_start else None
+        return summary
+
+    async def pages(self) -> AsyncIterator[List[WarHistoryEntry]]:
+        last = None
+        remaining = self.limit
+        while remaining is None or remaining > 0:
+            size = self.page_size if remaining is None else min(self.page_size,remaining)
+            page = await self._fetch(last,size)
+            if len(page) == 0:
+                return
+
+            yield [WarHistoryEntry(data,self.client,self.projection is not None) for data in page]
+
+            last = page[-1]
+            if remaining is not None:
+                remaining -= len(page)
+            if len(page) < size:
+                return
+
+    async def __aiter__(self) -> AsyncIterator[WarHistoryEntry]:
+        async for page in self.pages():
+            for entry in page:
+                yield entry
+
+    async def first(self,count:int) -> List[WarHistoryEntry]:
+        ret = []
+        async for entry in self:
+            ret.append(entry)
+            if len(ret) >= count:
+                break
+        return ret
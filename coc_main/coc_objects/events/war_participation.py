@@ -0,0 +1,277 @@
+import pendulum
+import logging
+
+from typing import *
+
+from pymongo import ReplaceOne
+
+from ...client.db_client import MotorClient
+
+from ..season.season import aClashSeason
+
+from ...utils.constants.coc_constants import ClanWarType
+from ...utils.utils import check_rtl
+
+if TYPE_CHECKING:
+    from .clan_war_v2 import bClanWar
+
+LOG = logging.getLogger("coc.main")
+
+##################################################
+#####
+##### DATABASE
+#####
+##################################################
+# db__war_participation = {
+#     '_id': {
+#         'war': string,
+#         'tag': string
+#         },
+#     'tag': string,
+#     'name': string,
+#     'town_hall': int,
+#     'map_position': int,
+#     'type': string,
+#     'state': string,
+#     'is_alliance_war': bool,
+#     'preparation_start': datetime,
+#     'start_time': datetime,
+#     'end_time': datetime,
+#     'attacks_per_member': int,
+#     'clan': {'tag': string, 'name': string, 'result': string},
+#     'opponent': {'tag': string, 'name': string},
+#     'attacks': [ {
+#         'order': int,
+#         'defender_tag': string,
+#         'attacker_th': int,
+#         'defender_th': int,
+#         'stars': int,
+#         'new_stars': int,
+#         'destruction': float,
+#         'duration': int,
+#         'is_triple': bool,
+#         'elo_effect': float
+#         } ],
+#     'defense_count': int,
+#     'best_opponent_attack': { same as attacks } or None
+#     }
+
+class _WarSide(NamedTuple):
+    tag:Optional[str]
+    town_hall:int
+
+class aWarParticipationAttack():
+    """
+    A single attack, as stored on a war participation row.
+    """
+    __slots__ = [
+        'order',
+        'attacker_tag',
+        'defender_tag',
+        'attacker_th',
+        'defender_th',
+        'stars',
+        'new_stars',
+        'destruction',
+        'duration',
+        'is_triple',
+        'elo_effect'
+        ]
+
+    def __init__(self,attacker_tag:str,data:dict):
+        self.attacker_tag = attacker_tag
+        self.order = data.get('order',0)
+        self.defender_tag = data.get('defender_tag',None)
+        self.attacker_th = data.get('attacker_th',0)
+        self.defender_th = data.get('defender_th',0)
+        self.stars = data.get('stars',0)
+        self.new_stars = data.get('new_stars',0)
+        self.destruction = data.get('destruction',0.0)
+        self.duration = data.get('duration',0)
+        self.is_triple = data.get('is_triple',False)
+        self.elo_effect = data.get('elo_effect',0)
+
+    @property
+    def attacker(self) -> _WarSide:
+        return _WarSide(self.attacker_tag,self.attacker_th)
+    @property
+    def defender(self) -> _WarSide:
+        return _WarSide(self.defender_tag,self.defender_th)
+
+    @staticmethod
+    def _api_json(attack) -> dict:
+        return {
+            'order': attack.order,
+            'defender_tag': attack.defender_tag,
+            'attacker_th': attack.attacker.town_hall,
+            'defender_th': attack.defender.town_hall,
+            'stars': attack.stars,
+            'new_stars': attack.new_stars,
+            'destruction': attack.destruction,
+            'duration': attack.duration,
+            'is_triple': attack.is_triple,
+            'elo_effect': attack.elo_effect
+            }
+
+class aWarParticipation(MotorClient):
+    """
+    One player's participation in one war.
+
+    Rows are written alongside the full war document, and carry enough to compute war summaries and leaderboards without loading the war itself.
+
+    Rows stand in for both the war and the war member: `get_member()` returns the row itself, so they can be passed to `aClanWarSummary.for_player` in place of a war log.
+    """
+    __slots__ = [
+        'war_id',
+        'tag',
+        'name',
+        'town_hall',
+        'map_position',
+        'type',
+        'state',
+        'is_alliance_war',
+        'preparation_start_time',
+        'start_time',
+        'end_time',
+        'attacks_per_member',
+        'clan_tag',
+        'clan_name',
+        'result',
+        'opponent_tag',
+        'opponent_name',
+        'attacks',
+        'defense_count',
+        'best_opponent_attack'
+        ]
+
+    def __init__(self,data:dict):
+        self.war_id = data['_id']['war']
+        self.tag = data['tag']
+        self.name = data.get('name',None)
+        self.town_hall = data.get('town_hall',0)
+        self.map_position = data.get('map_position',0)
+        self.type = data.get('type',None)
+        self.state = data.get('state',None)
+        self.is_alliance_war = data.get('is_alliance_war',False)
+        self.preparation_start_time = pendulum.instance(data['preparation_start'])
+        self.start_time = pendulum.instance(data['start_time'])
+        self.end_time = pendulum.instance(data['end_time'])
+        self.attacks_per_member = data.get('attacks_per_member',0)
+
+        self.clan_tag = data.get('clan',{}).get('tag',None)
+        self.clan_name = data.get('clan',{}).get('name',None)
+        self.result = data.get('clan',{}).get('result',None)
+        self.opponent_tag = data.get('opponent',{}).get('tag',None)
+        self.opponent_name = data.get('opponent',{}).get('name',None)
+
+        self.attacks = sorted([aWarParticipationAttack(self.tag,a) for a in data.get('attacks',[])],key=lambda a: a.order)
+        self.defense_count = data.get('defense_count',0)
+        best = data.get('best_opponent_attack',None)
+        self.best_opponent_attack = aWarParticipationAttack(None,best) if best else None
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.tag}) in {self.clan_name} vs {self.opponent_name}"
+
+    def get_member(self,tag:str) -> Optional['aWarParticipation']:
+        return self if tag == self.tag else None
+
+    @property
+    def clean_clan_name(self) -> str:
+        if check_rtl(self.clan_name):
+            return '\u200F' + self.clan_name + '\u200E'
+        return self.clan_name
+    @property
+    def clean_opponent_name(self) -> str:
+        if check_rtl(self.opponent_name):
+            return '\u200F' + self.opponent_name + '\u200E'
+        return self.opponent_name
+
+    @property
+    def unused_attacks(self) -> int:
+        return self.attacks_per_member - len(self.attacks)
+    @property
+    def total_stars(self) -> int:
+        return sum([a.stars for a in self.attacks])
+    @property
+    def total_destruction(self) -> float:
+        return sum([a.destruction for a in self.attacks])
+    @property
+    def elo_effect(self) -> float:
+        return sum([a.elo_effect for a in self.attacks])
+
+    ##################################################
+    ##### DATABASE METHODS
+    ##################################################
+    @staticmethod
+    def _rows_for_war(war:'bClanWar') -> List[dict]:
+        rows = []
+        for clan in [war.clan_1,war.clan_2]:
+            opponent = war.get_opponent(clan.tag)
+            for member in clan.members:
+                best = member.best_opponent_attack
+                rows.append({
+                    '_id': {'war':war._id,'tag':member.tag},
+                    'tag': member.tag,
+                    'name': member.name,
+                    'town_hall': member.town_hall,
+                    'map_position': member.map_position,
+                    'type': war.type,
+                    'state': war.state,
+                    'is_alliance_war': war.is_alliance_war,
+                    'preparation_start': war.preparation_start_time,
+                    'start_time': war.start_time,
+                    'end_time': war.end_time,
+                    'attacks_per_member': war.attacks_per_member,
+                    'clan': {'tag':clan.tag,'name':clan.name,'result':clan.result},
+                    'opponent': {'tag':opponent.tag,'name':opponent.name},
+                    'attacks': [aWarParticipationAttack._api_json(a) for a in member.attacks],
+                    'defense_count': len(member.defenses),
+                    'best_opponent_attack': aWarParticipationAttack._api_json(best) if best else None
+                    })
+        return rows
+
+    @classmethod
+    async def record_war(cls,war:'bClanWar'):
+        if war.state == 'notInWar':
+            return
+        rows = cls._rows_for_war(war)
+        if len(rows) == 0:
+            return
+        await cls.database.db__war_participation.bulk_write(
+            [ReplaceOne({'_id':row['_id']},row,upsert=True) for row in rows],
+            ordered=False
+            )
+
+    @classmethod
+    async def rebuild_all(cls,client) -> int:
+        """
+        Writes participation rows for every stored war. Used to backfill wars saved before participation rows were recorded.
+        """
+        from .clan_war_v2 import bClanWar
+
+        query = cls.database.db__nclan_war.find({'state':{'$ne':'notInWar'}})
+        count = 0
+        async for data in query:
+            war = bClanWar(data=data,client=client)
+            await cls.record_war(war)
+            count += 1
+        return count
+
+    @classmethod
+    async def for_player(cls,
+        player_tag:str,
+        season:Optional[aClashSeason]=None,
+        war_type:Optional[str]=ClanWarType.RANDOM) -> List['aWarParticipation']:
+        """
+        Returns a player's war participation, newest first.
+        """
+        query = {'tag':player_tag}
+        if war_type:
+            query['type'] = war_type
+        if season:
+            query['preparation_start'] = {
+                '$gte':season.season_start,
+                '$lte':season.season_end
+                }
+        rows = cls.database.db__war_participation.find(query).sort('preparation_start',-1)
+        return [cls(row) async for row in rows]
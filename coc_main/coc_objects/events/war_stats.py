@@ -0,0 +1,183 @@
+import pendulum
+import logging
+
+from typing import *
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from ...client.db_client import MotorClient
+
+from .clan_war_v2 import bClanWar
+
+from ..season.season import aClashSeason
+from ..clans.base_clan import BasicClan
+
+from ...utils.constants.coc_constants import ClanWarType
+
+LOG = logging.getLogger("coc.main")
+
+##################################################
+#####
+##### DATABASE
+#####
+##################################################
+# db__season_war_stats = {
+#     '_id': {
+#         'season': string,
+#         'tag': string,
+#         'th': int,
+#         'clan': string
+#         },
+#     'name': string,
+#     'wars': [ string ],
+#     'wars_participated': int,
+#     'total_attacks': int,
+#     'total_triples': int,
+#     'total_stars': int,
+#     'total_destruction': float
+#     }
+
+class aSeasonWarStats(MotorClient):
+    """
+    Per-season, per-player, per-TH regular war stats, keyed by the clan the player fought for.
+
+    Rows are written once per ended war, and are idempotent on the war ID.
+    """
+
+    @staticmethod
+    def _season_for_war(war:bClanWar) -> Optional[aClashSeason]:
+        ts = war.preparation_start_time.int_timestamp
+        return next((s for s in aClashSeason.all_seasons() if s.season_start.int_timestamp <= ts <= s.season_end.int_timestamp),None)
+
+    @classmethod
+    async def record_war(cls,war:bClanWar,season_id:Optional[str]=None):
+        """
+        Folds an ended war into the stats rows for its season. `season_id` overrides the key the rows are written under.
+        """
+        if war.state != 'warEnded' or war.type != ClanWarType.RANDOM:
+            return
+
+        if not war.is_alliance_war:
+            clan_1 = await BasicClan(war.clan_1.tag)
+            clan_2 = await BasicClan(war.clan_2.tag)
+            if not (clan_1.is_alliance_clan or clan_2.is_alliance_clan):
+                return
+
+        if not season_id:
+            season = cls._season_for_war(war)
+            if not season:
+                return
+            season_id = season.id
+
+        updates = []
+        for clan in [war.clan_1,war.clan_2]:
+            for member in clan.members:
+                attacks = [a for a in member.attacks if a.attacker.town_hall <= a.defender.town_hall]
+                updates.append(UpdateOne(
+                    {'_id':{
+                        'season':season_id,
+                        'tag':member.tag,
+                        'th':member.town_hall,
+                        'clan':clan.tag
+                        },
+                    'wars':{'$ne':war._id}
+                    },
+                    {'$set':{'name':member.name},
+                    '$push':{'wars':war._id},
+                    '$inc':{
+                        'wars_participated':1,
+                        'total_attacks':len(attacks),
+                        'total_triples':len([a for a in attacks if a.is_triple]),
+                        'total_stars':sum([a.stars for a in attacks]),
+                        'total_destruction':sum([a.destruction for a in attacks])
+                        }
+                    },
+                    upsert=True
+                    ))
+
+        if len(updates) == 0:
+            return
+        try:
+            await cls.database.db__season_war_stats.bulk_write(updates,ordered=False)
+        except BulkWriteError as exc:
+            # Upserts collide on _id when the war was already recorded for that row.
+            errors = [e for e in exc.details.get('writeErrors',[]) if e.get('code') != 11000]
+            if errors:
+                raise
+
+    @classmethod
+    async def rebuild_season(cls,season:aClashSeason,client) -> int:
+        """
+        Replays a season's stored wars into a staging key, then swaps the staged rows in over the live rows.
+
+        Live rows are replaced in place, and only rows without a staged counterpart are deleted, so the season is never empty. Wars that ended while the replay ran are folded into the live rows again after the swap.
+        """
+        staging_id = f"{season.id}:rebuild"
+        # wars are recorded when they end, allow for a late save
+        started = pendulum.now('UTC').subtract(hours=1)
+        await cls.database.db__season_war_stats.delete_many({'_id.season':staging_id})
+
+        season_query = {
+            '$and': [
+                {'type':ClanWarType.RANDOM},
+                bClanWar._query_for_season(season)
+                ]
+            }
+        count = 0
+        async for data in cls.database.db__nclan_war.find(season_query):
+            war = bClanWar(data=data,client=client)
+            await cls.record_war(war,season_id=staging_id)
+            count += 1
+
+        await cls.database.db__season_war_stats.aggregate([
+            {'$match':{'_id.season':staging_id}},
+            {'$set':{'_id.season':season.id}},
+            {'$merge':{'into':'db__season_war_stats','on':'_id','whenMatched':'replace','whenNotMatched':'insert'}}
+            ]).to_list(length=None)
+
+        staged = set()
+        async for row in cls.database.db__season_war_stats.find({'_id.season':staging_id},{'_id':1}):
+            staged.add((row['_id']['tag'],row['_id']['th'],row['_id']['clan']))
+        stale = []
+        async for row in cls.database.db__season_war_stats.find({'_id.season':season.id},{'_id':1}):
+            if (row['_id']['tag'],row['_id']['th'],row['_id']['clan']) not in staged:
+                stale.append(row['_id'])
+        if len(stale) > 0:
+            await cls.database.db__season_war_stats.delete_many({'_id':{'$in':stale}})
+        await cls.database.db__season_war_stats.delete_many({'_id.season':staging_id})
+
+        # rows replaced by the swap may have missed wars recorded after the replay passed them
+        recent_query = {'$and': season_query['$and'] + [{'endTime':{'$gte':started.format('YYYYMMDDTHHmmss') + '.000Z'}}]}
+        async for data in cls.database.db__nclan_war.find(recent_query):
+            await cls.record_war(bClanWar(data=data,client=client))
+        return count
+
+    @classmethod
+    async def get_for_season(cls,
+        season:aClashSeason,
+        townhalls:List[int],
+        clans:Optional[List[str]]=None) -> List[dict]:
+        """
+        Returns one aggregated row per (tag, th). If clans are provided, only wars fought for those clans are included.
+        """
+        match = {
+            '_id.season':season.id,
+            '_id.th':{'$in':townhalls}
+            }
+        if clans is not None:
+            match['_id.clan'] = {'$in':clans}
+
+        pipeline = [
+            {'$match':match},
+            {'$group':{
+                '_id':{'tag':'$_id.tag','th':'$_id.th'},
+                'name':{'$last':'$name'},
+                'wars_participated':{'$sum':'$wars_participated'},
+                'total_attacks':{'$sum':'$total_attacks'},
+                'total_triples':{'$sum':'$total_triples'},
+                'total_stars':{'$sum':'$total_stars'},
+                'total_destruction':{'$sum':'$total_destruction'}
+                }}
+            ]
+        return await cls.database.db__season_war_stats.aggregate(pipeline).to_list(length=None)
@@ -15,7 +15,10 @@ from redbot.core.bot import Red
 from ..clans.clan import BasicClan, aClan, _PlayerClan
 
 from ...client.db_client import MotorClient
+from ...client.write_buffer import BulkWriteBuffer
 
+from ...utils.cache import AttributeCache, SyncIndex
+from ...utils.prefix_index import PrefixIndex
 from ...utils.constants.coc_emojis import EmojisTownHall
 from ...utils.constants.ui_emojis import EmojisUI
 from ...utils.utils import check_rtl
@@ -23,10 +26,56 @@ from ...utils.utils import check_rtl
 DATA_LOG = logging.getLogger("coc.main")
 
 class BasicPlayer(AwaitLoader):
+    search_index = PrefixIndex('player',key_fields=['name'],group_field='discord_user')
+
+    @classmethod
+    async def build_search_index(cls):
+        async def _rows():
+            query = _PlayerAttributes.database.db__player.find({},{'_id':1,'name':1,'townhall':1,'discord_user':1,'is_member':1})
+            async for db in query:
+                yield db['_id'], {
+                    'name':db.get('name',''),
+                    'townhall':db.get('townhall',1),
+                    'discord_user':db.get('discord_user',0),
+                    'is_member':db.get('is_member',False)
+                    }
+        await cls.search_index.build(_rows())
+    
+    @classmethod
+    def clear_cache(cls) -> int:
+        return _PlayerAttributes._cache.clear()
+    
+    @classmethod
+    def cache_stats(cls) -> dict:
+        return _PlayerAttributes._cache.stats
+    
+    @classmethod
+    def write_stats(cls) -> dict:
+        return _PlayerAttributes._write_buffer.stats
+
+    @classmethod
+    def sync_stats(cls) -> dict:
+        return _PlayerAttributes._sync_index.stats
+
+    @classmethod
+    def is_recently_synced(cls,tag:str) -> bool:
+        return _PlayerAttributes._sync_index.is_fresh(coc.utils.correct_tag(tag))
+
+    @classmethod
+    async def warm_sync_index(cls):
+        index = _PlayerAttributes._sync_index
+        async def _rows():
+            query = _PlayerAttributes.database.db__player.find(
+                {'last_sync':{'$gt':pendulum.now().int_timestamp - index.max_age}},
+                {'_id':1,'last_sync':1}
+                )
+            async for db in query:
+                yield db['_id'], db['last_sync']
+        await index.warm(_rows())
     
     @classmethod
-    def clear_cache(cls):
-        _PlayerAttributes._cache = {}
+    async def flush_writes(cls) -> int:
+        return await _PlayerAttributes._write_buffer.close()
     
     """
     The BasicPlayer class provides a consolidated interface for inheriting player objects.
@@ -175,12 +224,7 @@ class BasicPlayer(AwaitLoader):
 
         async with player._attributes._lock:
             player._attributes.first_seen = pendulum.now()
-            
-            await _PlayerAttributes.database.db__player.update_one(
-                {'_id':player.tag},
-                {'$set':{'first_seen':getattr(player.first_seen,'int_timestamp',pendulum.now().int_timestamp)}},
-                upsert=True
-                )
+            _PlayerAttributes._write_buffer.queue(player.tag,first_seen=player.first_seen.int_timestamp)
             DATA_LOG.debug(f"{player}: first_seen changed to {player.first_seen}. Is new: {player.is_new}")
     
     @classmethod
@@ -188,6 +232,7 @@ class BasicPlayer(AwaitLoader):
         player = await cls(tag=coc.utils.correct_tag(tag))
         async with player._attributes._lock:
             player._attributes.discord_user = discord_user
+            BasicPlayer.search_index.upsert(player.tag,discord_user=discord_user)
 
             await _PlayerAttributes.database.db__player.update_one(
                 {'_id':player.tag},
@@ -199,6 +244,7 @@ class BasicPlayer(AwaitLoader):
     async def unlink_discord(self):
         async with self._attributes._lock:
             self._attributes.discord_user = 0
+            BasicPlayer.search_index.upsert(self.tag,discord_user=0,is_member=False)
             await _PlayerAttributes.database.db__player.update_one(
                 {'_id':self.tag},
                 {'$set':{
@@ -219,6 +265,7 @@ class BasicPlayer(AwaitLoader):
 
             self._attributes.is_member = True
             self._attributes.home_clan_tag = home_clan.tag
+            BasicPlayer.search_index.upsert(self.tag,is_member=True)
             self.home_clan = await BasicClan(tag=home_clan.tag)                
             await self.home_clan.new_member(self.tag)
 
@@ -253,6 +300,7 @@ class BasicPlayer(AwaitLoader):
             self._attributes.is_member = False
             self._attributes.home_clan_tag = None
             self._attributes.last_removed = ts
+            BasicPlayer.search_index.upsert(self.tag,is_member=False)
 
             self.home_clan = None
 
@@ -303,31 +351,21 @@ class BasicPlayer(AwaitLoader):
     async def set_name(self,new_name:str):
         async with self._attributes._lock:
             self._attributes.name = new_name
-            await _PlayerAttributes.database.db__player.update_one(
-                {'_id':self.tag},
-                {'$set':{'name':self.name}},
-                upsert=True
-                )
+            _PlayerAttributes._write_buffer.queue(self.tag,name=self.name)
+            BasicPlayer.search_index.upsert(self.tag,name=self.name)
             DATA_LOG.debug(f"{self}: name changed to {self.name}.")
     
     async def set_exp_level(self,new_value:int):        
         async with self._attributes._lock:
             self._attributes.exp_level = new_value
-            await _PlayerAttributes.database.db__player.update_one(
-                {'_id':self.tag},
-                {'$set':{'xp_level':self.exp_level}},
-                upsert=True
-                )
+            _PlayerAttributes._write_buffer.queue(self.tag,xp_level=self.exp_level)
             DATA_LOG.debug(f"{self}: exp_level changed to {self.exp_level}.")
         
     async def set_town_hall_level(self,new_value:int):        
         async with self._attributes._lock:
             self._attributes.town_hall_level = new_value
-            await _PlayerAttributes.database.db__player.update_one(
-                {'_id':self.tag},
-                {'$set':{'townhall':self.town_hall_level}},
-                upsert=True
-                )
+            _PlayerAttributes._write_buffer.queue(self.tag,townhall=self.town_hall_level)
+            BasicPlayer.search_index.upsert(self.tag,townhall=self.town_hall_level)
             DATA_LOG.debug(f"{self}: town_hall_level changed to {self.town_hall_level}.")
 
 # db__player = {
@@ -350,9 +388,11 @@ class _PlayerAttributes(MotorClient):
 
     This class DOES NOT handle database updates - those are handled within the BasicPlayer class.
     """
-    _cache = {}
     _locks = defaultdict(asyncio.Lock)
     _sync_locks = defaultdict(asyncio.Lock)
+    _cache = AttributeCache('player',max_size=20000,ttl=3600,locks=[_locks,_sync_locks])
+    _write_buffer = BulkWriteBuffer('db__player')
+    _sync_index = SyncIndex('player',max_age=3600)
 
     __slots__ = [
         '_new',
@@ -373,12 +413,13 @@ class _PlayerAttributes(MotorClient):
 
     def __new__(cls,tag:str):
         n_tag = coc.utils.correct_tag(tag)
-        if n_tag not in cls._cache:
+        instance = cls._cache.get(n_tag)
+        if instance is None:
             instance = super().__new__(cls)
             instance._new = True
             instance._loaded = False
-            cls._cache[n_tag] = instance
-        return cls._cache[n_tag]
+            cls._cache.set(n_tag,instance)
+        return instance
     
     def __init__(self,tag:str):
         if self._new:
@@ -411,6 +452,9 @@ class _PlayerAttributes(MotorClient):
     
     async def load_data(self):
         database = await self.database.db__player.find_one({'_id':self.tag})
+        pending = self._write_buffer.pending(self.tag)
+        if pending:
+            database = {**(database or {}),**pending}
 
         self.name = database.get('name','') if database else ""
         self.exp_level = database.get('xp_level','') if database else 0
@@ -432,6 +476,8 @@ class _PlayerAttributes(MotorClient):
 
         ls = database.get('last_sync',0) if database else 0
         self._last_sync = pendulum.from_timestamp(ls) if ls > 0 else None
+        if ls:
+            self._sync_index.set(self.tag,ls)
 
         self._loaded = True
     
@@ -448,9 +494,6 @@ class _PlayerAttributes(MotorClient):
     async def update_last_sync(self,timestamp:pendulum.DateTime):
         async with self._lock:
             self._last_sync = timestamp
-            await self.database.db__player.update_one(
-                {'_id':self.tag},
-                {'$set':{'last_sync':timestamp.int_timestamp}},
-                upsert=True
-                )
+            self._write_buffer.queue(self.tag,last_sync=timestamp.int_timestamp)
+            self._sync_index.set(self.tag,timestamp.int_timestamp)
             DATA_LOG.debug(f"{self}: last_sync changed to {self._last_sync}.")
\ No newline at end of file
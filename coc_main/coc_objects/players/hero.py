@@ -4,6 +4,8 @@ from typing import *
 from ...client.db_client import MotorClient
 from ...utils.constants.coc_emojis import EmojisHeroes
 
+from .unit_levels import UnitLevelTable
+
 class aHero():
     
     @staticmethod
@@ -94,6 +96,9 @@ class aHero():
         return self._game_hero.level    
     @property
     def max_level(self) -> int:
+        levels = UnitLevelTable.min_max('hero',self.name,self._th_level)
+        if levels:
+            return levels[1]
         if self._th_level == 16:
             if self.name in ['Barbarian King','Archer Queen']:
                 return 95
@@ -108,6 +113,9 @@ class aHero():
         return m if m else self._game_hero.max_level
     @property
     def min_level(self) -> int:
+        levels = UnitLevelTable.min_max('hero',self.name,self._th_level)
+        if levels:
+            return levels[0]
         try:
             m = self._game_hero.get_max_level_for_townhall(max(self._th_level-1,3))
         except:
@@ -4,6 +4,8 @@ from typing import *
 from ...client.db_client import MotorClient
 from ...utils.constants.coc_emojis import EmojisPets
 
+from .unit_levels import UnitLevelTable
+
 class aPet():
 
     @staticmethod
@@ -79,6 +81,9 @@ class aPet():
         return self._game_pet.level    
     @property
     def max_level(self) -> int:
+        levels = UnitLevelTable.min_max('pet',self.name,self._th_level)
+        if levels:
+            return levels[1]
         try:
             m = self._game_pet.get_max_level_for_townhall(max(self._th_level,3))
         except:
@@ -86,6 +91,9 @@ class aPet():
         return m if m else self._game_pet.max_level
     @property
     def min_level(self) -> int:
+        levels = UnitLevelTable.min_max('pet',self.name,self._th_level)
+        if levels:
+            return levels[0]
         try:
             m = self._game_pet.get_max_level_for_townhall(max(self._th_level-1,3))
         except:
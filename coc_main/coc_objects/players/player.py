@@ -15,6 +15,7 @@ from .hero import aHero
 from .troop import aTroop
 from .spell import aSpell
 from .pet import aPet
+from .unit_levels import UnitLevelTable, UnitTotals
 
 from ..season.season import aClashSeason
 from ..clans.clan import _PlayerClan
@@ -51,6 +52,8 @@ class aPlayer(coc.Player,BasicPlayer,AwaitLoader):
 
         self._pets = super().pets
         self._pets_cached = False
+
+        self._game_units = (self._heroes,self._troops,self._spells,self._pets)
     
     def __str__(self):
         return f"{self.name} ({self.tag})"
@@ -225,15 +228,37 @@ class aPlayer(coc.Player,BasicPlayer,AwaitLoader):
     def super_troops(self):
         return [troop for troop in self.troops if troop.is_super_troop] 
     
+    @cached_property
+    def level_vector(self):
+        """
+        This player's unit levels, in `UnitLevelTable` order.
+        """
+        return UnitLevelTable.levels(*self._game_units)
+    
+    def _unit_totals(self,category:str) -> UnitTotals:
+        return UnitLevelTable.totals(self.level_vector,self.town_hall.level,category)
+    
+    @cached_property
+    def _hero_totals(self) -> UnitTotals:
+        return self._unit_totals('hero')
+    @cached_property
+    def _troop_totals(self) -> UnitTotals:
+        troops = self._unit_totals('troop')
+        pets = self._unit_totals('pet')
+        return UnitTotals(*[t + p for t,p in zip(troops,pets)])
+    @cached_property
+    def _spell_totals(self) -> UnitTotals:
+        return self._unit_totals('spell')
+    
     @cached_property
     def hero_strength(self) -> int:
-        return sum([hero.level for hero in self.heroes])
+        return self._hero_totals.level
     @cached_property
     def max_hero_strength(self) -> int:
-        return sum([hero.max_level for hero in self.heroes])    
+        return self._hero_totals.max_level
     @cached_property
     def min_hero_strength(self) -> int:
-        return sum([hero.min_level for hero in self.heroes])
+        return self._hero_totals.min_level
     @cached_property
     def hero_strength_pct(self) -> float:
         try:
@@ -243,8 +268,7 @@ class aPlayer(coc.Player,BasicPlayer,AwaitLoader):
     @cached_property
     def hero_rushed_pct(self) -> float:
         try:
-            rushed_levels = sum([(h.min_level - h.level) for h in self.heroes if h.is_rushed])
-            return round((rushed_levels / self.min_hero_strength)*100,2)
+            return round((self._hero_totals.rushed / self.min_hero_strength)*100,2)
         except ZeroDivisionError:
             return 0
     
@@ -263,22 +287,13 @@ class aPlayer(coc.Player,BasicPlayer,AwaitLoader):
     
     @cached_property
     def troop_strength(self) -> int:
-        strg = sum([troop.level for troop in self.troops if not troop.is_super_troop])
-        if len(self.pets) > 0:
-            strg += sum([pet.level for pet in self.pets])
-        return strg
+        return self._troop_totals.level
     @cached_property
     def max_troop_strength(self) -> int:
-        strg = sum([troop.max_level for troop in self.troops if not troop.is_super_troop])
-        if len(self.pets) > 0:
-            strg += sum([pet.max_level for pet in self.pets])
-        return strg
+        return self._troop_totals.max_level
     @cached_property
     def min_troop_strength(self) -> int:
-        strg = sum([troop.min_level for troop in self.troops if not troop.is_super_troop])
-        if len(self.pets) > 0:
-            strg += sum([pet.min_level for pet in self.pets])
-        return strg
+        return self._troop_totals.min_level
     @cached_property
     def troop_strength_pct(self) -> float:
         try:
@@ -288,20 +303,19 @@ class aPlayer(coc.Player,BasicPlayer,AwaitLoader):
     @cached_property
     def troop_rushed_pct(self) -> float:
         try:
-            rushed_troops = sum([(t.min_level - t.level) for t in self.troops if t.is_rushed and not t.is_super_troop]) + sum([(p.min_level - p.level) for p in self.pets if p.is_rushed])
-            return round((rushed_troops / self.min_troop_strength)*100,2)
+            return round((self._troop_totals.rushed / self.min_troop_strength)*100,2)
         except ZeroDivisionError:
             return 0
     
     @cached_property
     def spell_strength(self) -> int:
-        return sum([spell.level for spell in self.spells])
+        return self._spell_totals.level
     @cached_property
     def max_spell_strength(self) -> int:
-        return sum([spell.max_level for spell in self.spells])
+        return self._spell_totals.max_level
     @cached_property
     def min_spell_strength(self) -> int:
-        return sum([spell.min_level for spell in self.spells])
+        return self._spell_totals.min_level
     @cached_property
     def spell_strength_pct(self) -> float:
         try:
@@ -311,26 +325,15 @@ class aPlayer(coc.Player,BasicPlayer,AwaitLoader):
     @cached_property
     def spell_rushed_pct(self) -> float:
         try:
-            rushed_spells = sum([(s.min_level - s.level) for s in self.spells if s.is_rushed])
-            return round((rushed_spells / self.min_spell_strength)*100,2)
+            return round((self._spell_totals.rushed / self.min_spell_strength)*100,2)
         except ZeroDivisionError:
             return 0
     
     @cached_property
     def overall_rushed_pct(self) -> float:
-        rushed_levels = 0
-        min_levels = 0
-        if self.min_troop_strength > 0:
-            rushed_levels += sum([(t.min_level - t.level) for t in self.troops if t.is_rushed and not t.is_super_troop]) + sum([(p.min_level - p.level) for p in self.pets if p.is_rushed])
-            min_levels += self.min_troop_strength
-        if self.min_hero_strength > 0:
-            rushed_levels += sum([(h.min_level - h.level) for h in self.heroes if h.is_rushed])
-            min_levels += self.min_hero_strength
-        if self.min_spell_strength > 0:
-            rushed_levels += sum([(s.min_level - s.level) for s in self.spells if s.is_rushed])
-            min_levels += self.min_spell_strength
+        totals = [t for t in [self._troop_totals,self._hero_totals,self._spell_totals] if t.min_level > 0]
         try:
-            return round((rushed_levels / min_levels)*100,2)
+            return round((sum([t.rushed for t in totals]) / sum([t.min_level for t in totals]))*100,2)
         except ZeroDivisionError:
             return 0
     
@@ -433,35 +436,53 @@ class aPlayer(coc.Player,BasicPlayer,AwaitLoader):
             stats.is_member = self.is_member      
         return stats
 
+    @cached_property
+    def _unit_lookup(self) -> Dict[str,Dict[str,Any]]:
+        game_heroes, game_troops, game_spells, game_pets = self._game_units
+        lookup = {'hero':{},'troop':{},'home_troop':{},'spell':{},'pet':{}}
+        for hero in game_heroes:
+            lookup['hero'].setdefault(hero.name,hero)
+        for troop in game_troops:
+            lookup['troop'].setdefault(troop.name,troop)
+            if troop.village == 'home':
+                lookup['home_troop'].setdefault(troop.name,troop)
+        for spell in game_spells:
+            lookup['spell'].setdefault(spell.name,spell)
+        for pet in game_pets:
+            lookup['pet'].setdefault(pet.name,pet)
+        return lookup
+
     def get_hero(self,hero_name:str) -> aHero:
-        hero = next((hero for hero in self._heroes if hero.name == hero_name),None)
+        hero = self._unit_lookup['hero'].get(hero_name)
         return aHero(hero,self.town_hall.level) if hero else None
     
     def get_troop(self,name:str,is_home_troop:bool=True) -> aTroop:
-        if is_home_troop:
-            troop = next((troop for troop in self._troops if troop.name == name and troop.village == 'home'),None)
-        else:
-            troop = next((troop for troop in self._troops if troop.name == name),None)
+        troop = self._unit_lookup['home_troop' if is_home_troop else 'troop'].get(name)
         return aTroop(troop,self.town_hall.level) if troop else None
     
     def get_spell(self,name:str) -> aSpell:
-        spell = next((spell for spell in self._spells if spell.name == name),None)
+        spell = self._unit_lookup['spell'].get(name)
         return aSpell(spell,self.town_hall.level) if spell else None
     
     def get_pet(self,name:str) -> aPet:
-        pet = next((pet for pet in self._pets if pet.name == name),None)
+        pet = self._unit_lookup['pet'].get(name)
         return aPet(pet,self.town_hall.level) if pet else None
     
     async def _update_snapshots(self):
         current_season = await self.get_current_season()
         await current_season.save_member_snapshot()
-
+    
+    async def _rebuild_snapshots(self):
         seasons = aClashSeason.all_seasons()
-        snapshot_tasks = [aPlayerSeason.create_stats_snapshot(self.tag,season) for season in seasons]
+        snapshot_tasks = [aPlayerSeason.rebuild_stats_snapshot(self.tag,season) for season in seasons]
         await asyncio.gather(*snapshot_tasks)
 
     @classmethod
     async def _sync_cache(cls,player:'aPlayer',force:bool=False):
+        # skip recently synced tags without reading the database
+        if not force and BasicPlayer.is_recently_synced(player.tag):
+            return
+
         basic_player = await BasicPlayer(player.tag)
         await basic_player._attributes.load_data()
 
@@ -6,6 +6,7 @@ from typing import *
 from collections import defaultdict
 
 from ...client.db_client import MotorClient
+from ...client.write_buffer import InsertBuffer
 
 from .townhall import aTownHall
 from ..season.season import aClashSeason
@@ -57,8 +58,27 @@ class aPlayerActivity(MotorClient):
         'new_value'        
         ]
     __cache__ = defaultdict(default_cache_dict)
-    _queue = []
-    _queue_lock = asyncio.Lock()
+    _buffer = InsertBuffer('db__player_activity',key_fields=['tag','activity','stat','timestamp'])
+
+    @classmethod
+    def write_stats(cls) -> dict:
+        return cls._buffer.stats
+
+    @classmethod
+    def open_spill(cls,path:str,on_insert:Optional[Callable[[List[dict]],Awaitable[Any]]]=None) -> int:
+        """
+        Starts spilling queued activities to `path`, replaying any left there by a previous run. `on_insert` is called with each batch of newly inserted activities.
+        """
+        cls._buffer.on_insert = on_insert
+        return cls._buffer.open_spill(path)
+
+    @classmethod
+    async def flush_writes(cls) -> int:
+        return await cls._buffer.flush()
+
+    @classmethod
+    async def close_writes(cls) -> int:
+        return await cls._buffer.close()
     
     @classmethod
     async def get_by_id(cls,aid:str) -> Optional['aPlayerActivity']:
@@ -123,17 +143,17 @@ class aPlayerActivity(MotorClient):
         return entries
 
     @classmethod
-    async def create_new(cls,player,timestamp:pendulum.DateTime,activity:str,**kwargs) -> 'aPlayerActivity':
+    def _new_entry(cls,player,timestamp:pendulum.DateTime,activity:str,townhall:Optional[dict]=None,**kwargs) -> dict:
         activity = activity.lower()
         if activity not in valid_activity_types:
             raise ValueError(f"Invalid activity type: {activity}.")
 
-        new_dict = {
+        return {
             'tag':player.tag,
             'name':player.name,
             #'is_member':player.is_member,
             #'discord_user':player.discord_user,
-            'townhall':player.town_hall.json(),
+            'townhall':townhall or player.town_hall.json(),
             #'home_clan':getattr(player.home_clan,'tag','None'),
             'clan':getattr(player.clan,'tag','None'),
             'activity':activity,
@@ -144,10 +164,43 @@ class aPlayerActivity(MotorClient):
             'read_by_bank':False
             }
 
-        async with cls._queue_lock:
-            cls._queue.append(new_dict)
-        cls.__cache__[player.tag][activity] = entry = cls(new_dict)
+    @classmethod
+    async def create_new(cls,player,timestamp:pendulum.DateTime,activity:str,**kwargs) -> 'aPlayerActivity':
+        new_dict = cls._new_entry(player,timestamp,activity,**kwargs)
+
+        cls._buffer.queue(new_dict)
+        cls.__cache__[player.tag][new_dict['activity']] = entry = cls(new_dict)
         return entry
+
+    @classmethod
+    async def create_batch(cls,player,timestamp:pendulum.DateTime,activities:List[dict]) -> List['aPlayerActivity']:
+        """
+        Queues several activities for one player at once.
+
+        Each item in `activities` takes the keyword arguments of `create_new`. An item may carry its own `player` (e.g. the old player, for leaving a clan).
+        """
+        if len(activities) == 0:
+            return []
+
+        townhall = player.town_hall.json()
+        new_dicts = []
+        for kwargs in activities:
+            kwargs = dict(kwargs)
+            entry_player = kwargs.pop('player',player)
+            new_dicts.append(cls._new_entry(
+                entry_player,
+                timestamp,
+                townhall=townhall if entry_player is player else None,
+                **kwargs
+                ))
+
+        cls._buffer.queue(*new_dicts)
+
+        entries = []
+        for new_dict in new_dicts:
+            cls.__cache__[new_dict['tag']][new_dict['activity']] = entry = cls(new_dict)
+            entries.append(entry)
+        return entries
     
     def __init__(self,database:dict):
         self._id = str(database.get('_id',None))
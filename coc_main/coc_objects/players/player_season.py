@@ -7,6 +7,7 @@ from numerize import numerize
 from async_property import AwaitLoader
 from collections import defaultdict
 
+from pymongo import UpdateOne
 from redbot.core.utils import AsyncIter
 
 from .player_activity import aPlayerActivity
@@ -189,9 +190,24 @@ class aPlayerSeason(MotorClient,AwaitLoader):
         'clan_games'
         ]
     _snapshot_lock = defaultdict(asyncio.Lock)
+    _stats_lock = asyncio.Lock()
+
+    # activity type -> key in db_player_seasonstats_snapshot
+    _stat_fields = {
+        'attack_wins':'attack_wins',
+        'defense_wins':'defense_wins',
+        'donations_sent':'donations_sent',
+        'donations_received':'donations_received',
+        'loot_gold':'loot_gold',
+        'loot_elixir':'loot_elixir',
+        'loot_darkelixir':'loot_darkelixir',
+        'capital_contribution':'capital_contribution'
+        }
     
     def __init__(self,tag:str,season:aClashSeason):
         self._activity_count = 0
+        self._home_clan_ts = None
+        self._rebuilt_ts = 0
 
         self.tag = tag
         self.season = season
@@ -340,7 +356,14 @@ class aPlayerSeason(MotorClient,AwaitLoader):
             'loot_elixir':self.loot_elixir.to_json(),
             'loot_darkelixir':self.loot_darkelixir.to_json(),
             'capital_contribution':self.capital_contribution.to_json(),
-            'clan_games':self.clan_games.to_json()
+            'clan_games':self.clan_games.to_json(),
+            '_aggregator':self.aggregator_json()
+            }
+    def aggregator_json(self):
+        return {
+            'home_clan_tag':self.home_clan_tag,
+            'home_clan_ts':self._home_clan_ts,
+            'rebuilt_ts':self._rebuilt_ts
             }
     
     async def save_member_snapshot(self):
@@ -355,48 +378,206 @@ class aPlayerSeason(MotorClient,AwaitLoader):
                     upsert=True
                     )
     
+    ##################################################
+    ### SEASON STATS AGGREGATION
+    ##################################################
     @classmethod
-    async def create_stats_snapshot(cls,tag:str,season:aClashSeason):
-        player_season = await cls(tag,season)
+    async def aggregate_activities(cls,activities:List[dict]):
+        """
+        Folds new activity entries into the stored season stats snapshots.
 
-        snapshot_lock_id = f"{player_season.tag}-{player_season.season.id}"
-        lock = cls._snapshot_lock[snapshot_lock_id]
+        Only the new entries are read: each snapshot is updated in place with $inc/$set/$max/$push,
+        and all snapshots are written in a single bulk write. Snapshots created before the
+        aggregator existed are left alone, until migrated by `migrate_stats_snapshots`.
+        Entries already counted by a rebuild of the snapshot are skipped.
+        """
+        if len(activities) == 0:
+            return
+        
+        seasons = [(s,s.season_start.int_timestamp,s.season_end.int_timestamp) for s in aClashSeason.all_seasons()]
+
+        grouped = defaultdict(list)
+        for entry in activities:
+            season = next((s for s,start,end in seasons if start < entry['timestamp'] <= end),None)
+            if season:
+                grouped[(entry['tag'],season)].append(aPlayerActivity(entry))
+        
+        if len(grouped) == 0:
+            return
 
-        async with lock:
-            season_entries = await aPlayerActivity.get_by_player_season(player_season.tag,player_season.season)
+        tags = list(set([tag for tag,season in grouped.keys()]))
+        season_ids = list(set([season.id for tag,season in grouped.keys()]))
+        query = {'_id.tag':{'$in':tags},'_id.season':{'$in':season_ids}}
+
+        async with cls._stats_lock:
+            member_snapshots = {}
+            async for m in cls.database.db_player_member_snapshot.find(query,{'home_clan_tag':1,'is_member':1}):
+                member_snapshots[(m['_id']['tag'],m['_id']['season'])] = m
             
-            player_season._activity_count = len(season_entries)
+            stats_snapshots = {}
+            async for s in cls.database.db_player_seasonstats_snapshot.find(query,{'_aggregator':1,'clan_games.starting_time':1}):
+                stats_snapshots[(s['_id']['tag'],s['_id']['season'])] = s
+
+            updates = []
+            async for (tag,season),entries in AsyncIter(grouped.items()):
+                snapshot = stats_snapshots.get((tag,season.id),None)
+                if snapshot and '_aggregator' not in snapshot:
+                    continue
+
+                rebuilt_ts = (snapshot or {}).get('_aggregator',{}).get('rebuilt_ts',0) or 0
+                entries = [e for e in entries if e._timestamp > rebuilt_ts]
+                if len(entries) == 0:
+                    continue
+
+                update = cls._fold_activities(
+                    entries=sorted(entries,key=lambda x: x._timestamp),
+                    member_snapshot=member_snapshots.get((tag,season.id),{}),
+                    stats_snapshot=snapshot or {}
+                    )
+                updates.append(UpdateOne(
+                    {'_id':{'season':season.id,'tag':tag}},
+                    update,
+                    upsert=True
+                    ))
             
-            if player_season._activity_count > 0:
-                if player_season.home_clan:
-                    a_iter = AsyncIter([a for a in season_entries if not a._legacy_conversion])
-                    ts = None
-                    async for a in a_iter:
-                        if not ts:
-                            if a.clan_tag == player_season.home_clan_tag:
-                                ts = a._timestamp
-                        if ts:
-                            if a.clan_tag == player_season.home_clan_tag:                   
-                                player_season.time_in_home_clan += max(0,a._timestamp - ts)
+            if len(updates) > 0:
+                await cls.database.db_player_seasonstats_snapshot.bulk_write(updates,ordered=False)
+    
+    @classmethod
+    def _fold_activities(cls,entries:List[aPlayerActivity],member_snapshot:dict,stats_snapshot:dict) -> dict:
+        home_clan_tag = member_snapshot.get('home_clan_tag',None)
+        cursor = stats_snapshot.get('_aggregator',{})
+
+        inc = {}
+        set_ = {}
+        max_ = {}
+        push = {}
+
+        ts = cursor.get('home_clan_ts',None) if cursor.get('home_clan_tag',None) == home_clan_tag else None
+        time_in_home_clan = 0
+        if home_clan_tag:
+            for a in [a for a in entries if not a._legacy_conversion]:
+                if not ts:
+                    if a.clan_tag == home_clan_tag:
+                        ts = a._timestamp
+                if ts:
+                    if a.clan_tag == home_clan_tag:
+                        time_in_home_clan += max(0,a._timestamp - ts)
+                    ts = a._timestamp
+
+        if member_snapshot.get('is_member',False):
+            time_in_home_clan += sum([a.new_value for a in entries if a.activity == 'time_in_home_clan'])
+        if time_in_home_clan:
+            inc['time_in_home_clan'] = time_in_home_clan
+        
+        last_seen = [a._timestamp for a in entries if a.is_online_activity]
+        if len(last_seen) > 0:
+            push['last_seen'] = {'$each':last_seen}
+        
+        for activity,field in cls._stat_fields.items():
+            stat_entries = [a for a in entries if a.activity == activity]
+            if len(stat_entries) == 0:
+                continue
+            inc[f'{field}.season_total'] = sum([a.change for a in stat_entries])
+            set_[f'{field}.last_capture'] = stat_entries[-1].new_value
+        
+        clan_games = [a for a in entries if a.activity == 'clan_games']
+        if len(clan_games) > 0:
+            inc['clan_games.score'] = sum([a.change for a in clan_games])
+            max_['clan_games.ending_time'] = clan_games[-1]._timestamp
+            if not stats_snapshot.get('clan_games',{}).get('starting_time',None):
+                set_['clan_games.clan_tag'] = clan_games[0].clan_tag
+                set_['clan_games.starting_time'] = clan_games[0]._timestamp
+        
+        set_['_aggregator.home_clan_tag'] = home_clan_tag
+        set_['_aggregator.home_clan_ts'] = ts
+
+        update = {'$set':set_}
+        if inc:
+            update['$inc'] = inc
+        if max_:
+            update['$max'] = max_
+        if push:
+            update['$push'] = push
+        return update
+    
+    @classmethod
+    async def rebuild_stats_snapshot(cls,tag:str,season:aClashSeason):
+        """
+        Recomputes a season stats snapshot from the full activity log.
+        
+        This is the repair path for the incremental aggregator.
+        """
+        async with cls._stats_lock:
+            await cls._rebuild_stats_snapshot(tag,season)
+    
+    @classmethod
+    async def migrate_stats_snapshots(cls) -> int:
+        """
+        Rebuilds every snapshot created before the aggregator existed, one at a time.
+
+        The stats lock is only held for one snapshot at a time, so aggregation continues in between.
+        """
+        query = cls.database.db_player_seasonstats_snapshot.find({'_aggregator':{'$exists':False}},{'_id':1})
+        legacy = [(s['_id']['tag'],s['_id']['season']) async for s in query]
+
+        seasons = {s.id:s for s in aClashSeason.all_seasons()}
+        count = 0
+        async for tag,season_id in AsyncIter(legacy):
+            season = seasons.get(season_id)
+            if not season:
+                continue
+            await cls.rebuild_stats_snapshot(tag,season)
+            count += 1
+        return count
+
+    @classmethod
+    async def _rebuild_stats_snapshot(cls,tag:str,season:aClashSeason):
+        player_season = await cls(tag,season)
+        # entries up to now are counted here, the aggregator only folds entries after this
+        player_season._rebuilt_ts = pendulum.now().int_timestamp
+
+        season_entries = await aPlayerActivity.get_by_player_season(player_season.tag,player_season.season)
+        
+        player_season._activity_count = len(season_entries)
+        
+        if player_season._activity_count > 0:
+            if player_season.home_clan:
+                a_iter = AsyncIter([a for a in season_entries if not a._legacy_conversion])
+                ts = None
+                async for a in a_iter:
+                    if not ts:
+                        if a.clan_tag == player_season.home_clan_tag:
                             ts = a._timestamp
+                    if ts:
+                        if a.clan_tag == player_season.home_clan_tag:                   
+                            player_season.time_in_home_clan += max(0,a._timestamp - ts)
+                        ts = a._timestamp
+                player_season._home_clan_ts = ts
 
-                if player_season.is_member and len([a.new_value for a in season_entries if a.activity == 'time_in_home_clan']) > 0:
-                    player_season.time_in_home_clan += sum([a.new_value for a in season_entries if a.activity == 'time_in_home_clan'])
+            if player_season.is_member and len([a.new_value for a in season_entries if a.activity == 'time_in_home_clan']) > 0:
+                player_season.time_in_home_clan += sum([a.new_value for a in season_entries if a.activity == 'time_in_home_clan'])
 
-                player_season.last_seen = [a.timestamp for a in season_entries if a.is_online_activity]
+            player_season.last_seen = [a.timestamp for a in season_entries if a.is_online_activity]
 
-                player_season.attack_wins.compute_stat([a for a in season_entries if a.activity == 'attack_wins'])
-                player_season.defense_wins.compute_stat([a for a in season_entries if a.activity == 'defense_wins'])
-                player_season.donations_sent.compute_stat([a for a in season_entries if a.activity == 'donations_sent'])
-                player_season.donations_rcvd.compute_stat([a for a in season_entries if a.activity == 'donations_received'])
-                player_season.loot_gold.compute_stat([a for a in season_entries if a.activity == 'loot_gold'])
-                player_season.loot_elixir.compute_stat([a for a in season_entries if a.activity == 'loot_elixir'])
-                player_season.loot_darkelixir.compute_stat([a for a in season_entries if a.activity == 'loot_darkelixir'])
-                player_season.capital_contribution.compute_stat([a for a in season_entries if a.activity == 'capital_contribution'])
-                player_season.clan_games.compute_stat([a for a in season_entries if a.activity == 'clan_games'])
-            
-                await player_season.database.db_player_seasonstats_snapshot.update_one(
-                    {'_id':player_season.snapshot_id},
-                    {'$set':player_season.stats_json()},
-                    upsert=True
-                    )
\ No newline at end of file
+            player_season.attack_wins.compute_stat([a for a in season_entries if a.activity == 'attack_wins'])
+            player_season.defense_wins.compute_stat([a for a in season_entries if a.activity == 'defense_wins'])
+            player_season.donations_sent.compute_stat([a for a in season_entries if a.activity == 'donations_sent'])
+            player_season.donations_rcvd.compute_stat([a for a in season_entries if a.activity == 'donations_received'])
+            player_season.loot_gold.compute_stat([a for a in season_entries if a.activity == 'loot_gold'])
+            player_season.loot_elixir.compute_stat([a for a in season_entries if a.activity == 'loot_elixir'])
+            player_season.loot_darkelixir.compute_stat([a for a in season_entries if a.activity == 'loot_darkelixir'])
+            player_season.capital_contribution.compute_stat([a for a in season_entries if a.activity == 'capital_contribution'])
+            player_season.clan_games.compute_stat([a for a in season_entries if a.activity == 'clan_games'])
+        
+            await player_season.database.db_player_seasonstats_snapshot.update_one(
+                {'_id':player_season.snapshot_id},
+                {'$set':player_season.stats_json()},
+                upsert=True
+                )
+        else:
+            # nothing to count, but mark an existing snapshot so new entries are folded in
+            await player_season.database.db_player_seasonstats_snapshot.update_one(
+                {'_id':player_season.snapshot_id,'_aggregator':{'$exists':False}},
+                {'$set':{'_aggregator':player_season.aggregator_json()}}
+                )
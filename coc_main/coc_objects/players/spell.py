@@ -4,6 +4,8 @@ from typing import *
 from ...client.db_client import MotorClient
 from ...utils.constants.coc_emojis import EmojisSpells
 
+from .unit_levels import UnitLevelTable
+
 class aSpell():
 
     @staticmethod
@@ -76,6 +78,9 @@ class aSpell():
         return self._game_spell.level    
     @property
     def max_level(self) -> int:
+        levels = UnitLevelTable.min_max('spell',self.name,self._th_level)
+        if levels:
+            return levels[1]
         th = self._th_level      
         try:
             m = self._game_spell.get_max_level_for_townhall(max(th,3))
@@ -84,6 +89,9 @@ class aSpell():
         return m if m else self._game_spell.max_level
     @property
     def min_level(self) -> int:
+        levels = UnitLevelTable.min_max('spell',self.name,self._th_level)
+        if levels:
+            return levels[0]
         try:
             m = self._game_spell.get_max_level_for_townhall(max(self._th_level-1,3))
         except:
@@ -4,6 +4,8 @@ from typing import *
 from ...client.db_client import MotorClient
 from ...utils.constants.coc_emojis import EmojisTroops
 
+from .unit_levels import UnitLevelTable
+
 class aTroop():
 
     @staticmethod
@@ -111,6 +113,9 @@ class aTroop():
         return self._game_troop.level    
     @property
     def max_level(self) -> int:
+        levels = UnitLevelTable.min_max('troop',self.name,self._th_level) if self.is_home_troop else None
+        if levels:
+            return levels[1]
         th = self._th_level
         try:
             m = self._game_troop.get_max_level_for_townhall(max(th,3))
@@ -119,6 +124,9 @@ class aTroop():
         return m if m else self._game_troop.max_level
     @property
     def min_level(self) -> int:
+        levels = UnitLevelTable.min_max('troop',self.name,self._th_level) if self.is_home_troop else None
+        if levels:
+            return levels[0]
         try:
             m = self._game_troop.get_max_level_for_townhall(max(self._th_level-1,3))
         except:
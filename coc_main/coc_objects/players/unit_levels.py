@@ -0,0 +1,220 @@
+import coc
+
+from typing import *
+from array import array
+
+from ...client.db_client import MotorClient
+from ...utils.constants.coc_constants import HeroAvailability, TroopAvailability, SpellAvailability, PetAvailability
+
+class UnitTotals(NamedTuple):
+    level:int
+    min_level:int
+    max_level:int
+    rushed:int
+
+class _TownHallRow(NamedTuple):
+    unlocked:array
+    min_level:array
+    max_level:array
+
+##################################################
+#####
+##### UNIT LEVEL TABLE
+#####
+##################################################
+class UnitLevelTable():
+    """
+    Precomputed unit levels, by Town Hall.
+
+    Every unit in the availability tables has a fixed position. A player's unit levels are held as one array in that order (see `levels`). For each Town Hall, the table holds arrays of unlocked flags, minimum (non-rushed) levels and maximum levels in the same order.
+
+    Town Hall rows are built from the game data on first use, and never change afterwards.
+    """
+    categories = {
+        'hero': HeroAvailability,
+        'troop': TroopAvailability,
+        'spell': SpellAvailability,
+        'pet': PetAvailability
+        }
+    # TH16 hero caps, ahead of the game data
+    hero_overrides = {
+        16: {
+            'Barbarian King': 95,
+            'Archer Queen': 95,
+            'Grand Warden': 70,
+            'Royal Champion': 45
+            }
+        }
+
+    _units:List[Tuple[str,str]] = []
+    _index:Dict[str,Dict[str,int]] = {}
+    _slices:Dict[str,slice] = {}
+    _unlocked_at:array = array('B')
+    _is_super:Optional[array] = None
+    _rows:Dict[int,_TownHallRow] = {}
+
+    @staticmethod
+    def coc_client() -> coc.Client:
+        cog = MotorClient.bot.get_cog("ClashOfClansMain")
+        return cog.global_client.coc_client
+
+    @classmethod
+    def _build_index(cls):
+        if len(cls._units) > 0:
+            return
+        units = []
+        unlocked_at = []
+        for category,availability in cls.categories.items():
+            start = len(units)
+            cls._index[category] = {}
+            for th,names in availability.unlock_info.items():
+                for name in names:
+                    cls._index[category][name] = len(units)
+                    units.append((category,name))
+                    unlocked_at.append(th)
+            cls._slices[category] = slice(start,len(units))
+        cls._unlocked_at = array('B',unlocked_at)
+        cls._units = units
+
+    @classmethod
+    def size(cls) -> int:
+        cls._build_index()
+        return len(cls._units)
+
+    @classmethod
+    def index(cls,category:str,name:str) -> Optional[int]:
+        cls._build_index()
+        return cls._index[category].get(name,None)
+
+    @classmethod
+    def units(cls,category:Optional[str]=None) -> List[Tuple[int,str,str]]:
+        cls._build_index()
+        s = cls._slices[category] if category else slice(0,len(cls._units))
+        return [(i,) + cls._units[i] for i in range(s.start,s.stop)]
+
+    ##################################################
+    ### GAME DATA
+    ##################################################
+    @classmethod
+    def _game_unit(cls,category:str,name:str):
+        client = cls.coc_client()
+        getter = {
+            'hero': client.get_hero,
+            'troop': client.get_troop,
+            'spell': client.get_spell,
+            'pet': client.get_pet
+            }[category]
+        try:
+            return getter(name,level=1)
+        except Exception:
+            return None
+
+    @staticmethod
+    def _max_for_townhall(game_unit,th:int) -> Optional[int]:
+        try:
+            return game_unit.get_max_level_for_townhall(max(th,3))
+        except Exception:
+            return None
+
+    @classmethod
+    def is_super_troop(cls,i:int) -> bool:
+        if cls._is_super is None:
+            cls._build_index()
+            flags = []
+            for category,name in cls._units:
+                game_unit = cls._game_unit(category,name) if category == 'troop' else None
+                flags.append(1 if getattr(game_unit,'is_super_troop',False) else 0)
+            cls._is_super = array('B',flags)
+        return bool(cls._is_super[i])
+
+    @classmethod
+    def row(cls,th:int) -> _TownHallRow:
+        row = cls._rows.get(th)
+        if row is not None:
+            return row
+
+        cls._build_index()
+        unlocked = array('B')
+        min_level = array('H')
+        max_level = array('H')
+        for i,(category,name) in enumerate(cls._units):
+            game_unit = cls._game_unit(category,name)
+
+            m = cls.hero_overrides.get(th,{}).get(name) if category == 'hero' else None
+            if not m and game_unit:
+                m = cls._max_for_townhall(game_unit,th) or getattr(game_unit,'max_level',0)
+
+            unlocked.append(1 if cls._unlocked_at[i] <= th else 0)
+            max_level.append(m or 0)
+            min_level.append((cls._max_for_townhall(game_unit,th-1) if game_unit else None) or 0)
+
+        cls._rows[th] = row = _TownHallRow(unlocked,min_level,max_level)
+        return row
+
+    @classmethod
+    def min_max(cls,category:str,name:str,th:int) -> Optional[Tuple[int,int]]:
+        """
+        Returns the (min, max) level of a unit at a Town Hall level, or None if the unit isn't in the table.
+        """
+        i = cls.index(category,name)
+        if i is None or th < 1:
+            return None
+        row = cls.row(th)
+        return row.min_level[i], row.max_level[i]
+
+    ##################################################
+    ### LEVEL VECTORS
+    ##################################################
+    @classmethod
+    def levels(cls,heroes:Iterable,troops:Iterable,spells:Iterable,pets:Iterable) -> array:
+        """
+        Builds a player's level vector from the game's unit lists. Units missing from the lists are at level 0. Only home village troops are counted.
+        """
+        cls._build_index()
+        vector = array('H',bytes(2 * len(cls._units)))
+        for category,units in [('hero',heroes),('troop',troops),('spell',spells),('pet',pets)]:
+            index = cls._index[category]
+            for unit in units:
+                i = index.get(unit.name)
+                if i is None or vector[i] > 0:
+                    continue
+                if category == 'troop' and getattr(unit,'village','home') != 'home':
+                    continue
+                vector[i] = getattr(unit,'level',0) or 0
+        return vector
+
+    @classmethod
+    def totals(cls,vector:array,th:int,category:str,include_super:bool=False) -> UnitTotals:
+        """
+        Sums levels, minimum and maximum levels, and rushed levels for the units in a category that are unlocked at `th`.
+        """
+        row = cls.row(th)
+        s = cls._slices[category]
+        level = min_level = max_level = rushed = 0
+        for i in range(s.start,s.stop):
+            if not row.unlocked[i]:
+                continue
+            if category == 'troop' and not include_super and cls.is_super_troop(i):
+                continue
+            level += vector[i]
+            min_level += row.min_level[i]
+            max_level += row.max_level[i]
+            if vector[i] < row.min_level[i]:
+                rushed += row.min_level[i] - vector[i]
+        return UnitTotals(level,min_level,max_level,rushed)
+
+    @classmethod
+    def upgrades(cls,old_vector:array,new_vector:array,th:int) -> List[Tuple[str,str,int,int]]:
+        """
+        Returns (category, name, change, new level) for every unlocked unit whose level went up.
+
+        Super troops are skipped: their level follows the base troop, and changes when one is boosted, not upgraded.
+        """
+        if old_vector == new_vector:
+            return []
+        row = cls.row(th)
+        return [
+            cls._units[i] + (new_level - old_level,new_level)
+            for i,(old_level,new_level) in enumerate(zip(old_vector,new_vector))
+            if new_level > old_level and row.unlocked[i] and not cls.is_super_troop(i)
+            ]
@@ -8,7 +8,6 @@ from typing import *
 
 from discord.ext import tasks
 from art import text2art
-from time import process_time
 
 from redbot.core import Config, commands
 from redbot.core.bot import Red
@@ -22,7 +21,10 @@ from .exceptions import *
 
 from .coc_objects.season.season import aClashSeason
 from .coc_objects.players.player import BasicPlayer
+from .coc_objects.clans.clan import BasicClan
+from .discord.render_cache import MessageRenderCache
 from .utils.components import clash_embed, DefaultView, DiscordButton, EmojisUI
+from .utils.utils import close_http_session
 
 COC_LOG = logging.getLogger("coc.main")
 
@@ -107,7 +109,11 @@ class ClashOfClansMain(commands.Cog):
 
         self.global_client._ready = True
 
-        self.reset_throttler_counter.start()
+        asyncio.create_task(BasicPlayer.build_search_index())
+        asyncio.create_task(BasicClan.build_search_index())
+        asyncio.create_task(BasicPlayer.warm_sync_index())
+        asyncio.create_task(BasicClan.warm_sync_index())
+
         self.bot_status_update_loop.start() 
         self.clash_season_check.start()
             
@@ -116,7 +122,10 @@ class ClashOfClansMain(commands.Cog):
         self.clash_season_check.cancel()
 
         await self.client_logout()
+        await BasicPlayer.flush_writes()
+        await BasicClan.flush_writes()
         await self.database_logout()
+        await close_http_session()
         COC_LOG.handlers.clear()
     
     ############################################################
@@ -196,20 +205,6 @@ class ClashOfClansMain(commands.Cog):
         except Exception:
             COC_LOG.exception(f"Error in Bot Status Loop")
     
-    @tasks.loop(seconds=10.0)
-    async def reset_throttler_counter(self):
-        async with self.coc_client.http_throttler.sent_lock, self.coc_client.http_throttler.rcvd_lock:
-            nt = process_time()
-            calc_sent = self.coc_client.http_throttler.current_sent / (nt - self.coc_client.http_throttler.sent_time)            
-            self.coc_client.http_throttler.sent.append(calc_sent)
-            self.coc_client.http_throttler.current_sent = 0
-            self.coc_client.http_throttler.sent_time = nt
-        
-            calc_rcvd = self.coc_client.http_throttler.current_rcvd / (nt - self.coc_client.http_throttler.rcvd_time)            
-            self.coc_client.http_throttler.rcvd.append(calc_rcvd)
-            self.coc_client.http_throttler.current_rcvd = 0
-            self.coc_client.http_throttler.rcvd_time = nt
-            
     @tasks.loop(minutes=1.0)
     async def clash_season_check(self):
         if self._season_lock.locked():
@@ -303,6 +298,36 @@ class ClashOfClansMain(commands.Cog):
                 + "```",
             inline=False
             )
+        
+        endpoint_stats = self.coc_client.http_throttler.endpoint_stats
+        embed.add_field(
+            name="**Endpoints (rate / sent / 429s / p50 / p95)**",
+            value="```ini"
+                + "".join([
+                    f"\n{'['+family[:10]+']':<12} {stats['rate']:.0f}/{stats['base_rate']:.0f} / {stats['sent']:,} / {stats['throttled']:,} / {stats['p50']}s / {stats['p95']}s"
+                    for family,stats in endpoint_stats.items()
+                    ])
+                + "```",
+            inline=False
+            )
+        embed.add_field(
+            name="**Message Renders**",
+            value="```ini"
+                + f"\n{'[Edited]':<10} {MessageRenderCache.stats['edited']:,}"
+                + f"\n{'[Skipped]':<10} {MessageRenderCache.stats['skipped']:,}"
+                + "```",
+            inline=False
+            )
+        player_index = BasicPlayer.search_index.stats
+        clan_index = BasicClan.search_index.stats
+        embed.add_field(
+            name="**Search Index (entries / lookups / build)**",
+            value="```ini"
+                + f"\n{'[Players]':<10} {player_index['entries']:,} / {player_index['lookups']:,} / " + (f"{player_index['built_in']:.2f}s" if player_index['ready'] else "building")
+                + f"\n{'[Clans]':<10} {clan_index['entries']:,} / {clan_index['lookups']:,} / " + (f"{clan_index['built_in']:.2f}s" if clan_index['ready'] else "building")
+                + "```",
+            inline=False
+            )
         return embed
     
     @commands.group(name="cocapi")
@@ -334,6 +359,45 @@ class ClashOfClansMain(commands.Cog):
             logging.getLogger("coc.http").setLevel(logging.DEBUG)
             await ctx.tick()
     
+    @cmdgrp_cocapi.command(name="dbaudit")
+    @commands.is_owner()
+    async def subcmd_cocapi_dbaudit(self,ctx:commands.Context,rebuild:bool=False):
+        """
+        Explains the canonical database queries, and flags collection scans.
+
+        Set `rebuild` to True to re-create indexes before the audit.
+        """
+        async with ctx.typing():
+            if rebuild:
+                await MotorClient.ensure_indexes()
+            results = await MotorClient.explain_queries()
+
+        scans = [name for name,r in results.items() if r.get('collscan') or r.get('error')]
+        embed = await clash_embed(
+            context=ctx,
+            title="**Database Query Audit**",
+            message=f"{len(results)} queries explained. "
+                + (f"**{len(scans)} need attention.**" if scans else "All queries use an index."),
+            success=len(scans) == 0
+            )
+        for name,r in results.items():
+            if r.get('error'):
+                value = f"```{r['error'][:200]}```"
+            else:
+                value = ("```ini"
+                    + f"\n{'[Plan]':<10} {' > '.join(r['stages'])}"
+                    + f"\n{'[Keys]':<10} {r['keys_examined']:,}"
+                    + f"\n{'[Docs]':<10} {r['docs_examined']:,}"
+                    + f"\n{'[Returned]':<10} {r['returned']:,}"
+                    + f"\n{'[Runtime]':<10} {r['runtime_ms']}ms"
+                    + "```")
+            embed.add_field(
+                name=f"{EmojisUI.WARNING + ' ' if name in scans else ''}**{name}** ({r['collection']})",
+                value=value,
+                inline=False
+                )
+        await ctx.reply(embed=embed)
+    
     @cmdgrp_cocapi.group(name="keys")
     @commands.is_owner()
     async def cmdgrp_cocapi_keys(self,ctx:commands.Context):
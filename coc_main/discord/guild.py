@@ -6,6 +6,7 @@ from redbot.core.utils import bounded_gather
 from ..client.global_client import GlobalClient
 
 from .clocks import aGuildClocks
+from .role_sync import GuildRoleReconciler
 from ..exceptions import InvalidGuild
 
 ##################################################
@@ -57,4 +58,11 @@ class aGuild(GlobalClient):
         
         if len(tasks) == 0:
             return
-        await bounded_gather(*tasks,limit=1)
\ No newline at end of file
+        await bounded_gather(*tasks,limit=1)
+    
+    ##################################################
+    ### ROLES
+    ##################################################
+    async def sync_member_roles(self) -> dict:
+        reconciler = GuildRoleReconciler(self.guild)
+        return await reconciler.run()
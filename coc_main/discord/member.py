@@ -54,6 +54,12 @@ class aMember(GlobalClient,AwaitLoader):
         
         cls._master_scope['global'] = [clan.tag for clan in await cls.coc_client.get_alliance_clans()]
         cls._master_scope['timestamp'] = pendulum.now().int_timestamp
+    
+    @classmethod
+    async def _refresh_scopes(cls):
+        rts = pendulum.from_timestamp(aMember._master_scope.get('timestamp',pendulum.now().subtract(hours=3).int_timestamp))
+        if pendulum.now().int_timestamp - rts.int_timestamp > 3600:
+            await cls._update_scopes()
 
     def __init__(self,user_id:int,guild_id:Optional[int]=None):
         self.user_id = user_id
@@ -92,9 +98,7 @@ class aMember(GlobalClient,AwaitLoader):
         return self._payday_lock[self.user_id]
         
     async def load(self):
-        rts = pendulum.from_timestamp(aMember._master_scope.get('timestamp',pendulum.now().subtract(hours=3).int_timestamp))
-        if pendulum.now().int_timestamp - rts.int_timestamp > 3600:
-            await aMember._update_scopes()
+        await aMember._refresh_scopes()
 
         self._scope_clans = aMember._master_scope.get(self.guild_id,[]) if self.guild_id else aMember._master_scope.get('global',[])
         query = self.database.db__player.find(
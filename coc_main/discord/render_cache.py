@@ -0,0 +1,135 @@
+import discord
+import asyncio
+import hashlib
+import json
+import re
+import uuid
+import pendulum
+
+from typing import *
+
+from ..client.global_client import GlobalClient
+
+##################################################
+#####
+##### DATABASE
+#####
+##################################################
+# db__message_render = {
+#     '_id': int (message_id),
+#     'hash': string,
+#     'timestamp': int
+#     }
+
+_DISCORD_TIMESTAMP = re.compile(r'<t:\d+(:[tTdDfFR])?>')
+
+class MessageRenderCache(GlobalClient):
+    """
+    Remembers what was last rendered to a bot-managed message, so that unchanged messages are neither fetched nor edited.
+
+    A fingerprint hashes the message content, embeds and view component layout. Fingerprints are persisted per message id. A recorded fingerprint expires after `max_age` seconds, so that messages are still re-rendered periodically.
+
+    Views with callbacks only live for the lifetime of the process. Their fingerprints are salted per process, so that the first render after a restart always re-attaches the view.
+    """
+    _session = uuid.uuid4().hex
+    _hashes:Dict[int,Tuple[str,int]] = {}
+    _loaded = False
+    _load_lock = asyncio.Lock()
+
+    max_age = 21600
+    stats = {
+        'skipped': 0,
+        'edited': 0
+        }
+
+    @classmethod
+    def fingerprint(cls,
+        embeds:Optional[Iterable[discord.Embed]]=None,
+        view:Optional[discord.ui.View]=None,
+        content:Optional[str]=None,
+        state:Optional[Any]=None,
+        ignore_timestamps:bool=False) -> str:
+        """
+        Returns a stable hash of a message render.
+
+        `state` is any data the view's callbacks depend on that isn't visible in the render. If `ignore_timestamps` is set, Discord timestamp markup (e.g. `<t:...:R>`) is ignored, so that a refresh time alone doesn't count as a change.
+        """
+        components = []
+        needs_session = False
+        if view:
+            for item in view.children:
+                component = item.to_component_dict()
+                component.pop('custom_id',None)
+                components.append(component)
+                if getattr(item,'url',None) is None:
+                    needs_session = True
+
+        render = json.dumps(
+            {
+                'content': content,
+                'embeds': [e.to_dict() for e in embeds or []],
+                'components': components,
+                'state': state,
+                'session': cls._session if needs_session else None
+                },
+            sort_keys=True,
+            default=str
+            )
+        if ignore_timestamps:
+            render = _DISCORD_TIMESTAMP.sub('<t>',render)
+        return hashlib.sha256(render.encode()).hexdigest()
+
+    @classmethod
+    async def _load(cls):
+        if cls._loaded:
+            return
+        async with cls._load_lock:
+            if cls._loaded:
+                return
+            query = cls.database.db__message_render.find({})
+            async for db in query:
+                cls._hashes[db['_id']] = (db.get('hash',''),db.get('timestamp',0))
+            cls._loaded = True
+
+    @classmethod
+    async def is_current(cls,message_id:int,fingerprint:str) -> bool:
+        """
+        Whether the message was last rendered with this fingerprint, within `max_age`. Counts a skipped edit if so.
+        """
+        if not message_id:
+            return False
+        await cls._load()
+
+        rendered = cls._hashes.get(message_id,None)
+        if rendered and rendered[0] == fingerprint and pendulum.now().int_timestamp - rendered[1] < cls.max_age:
+            cls.stats['skipped'] += 1
+            return True
+        return False
+
+    @classmethod
+    async def record(cls,message_id:int,fingerprint:str):
+        """
+        Records a render that was just sent or edited.
+        """
+        now = pendulum.now().int_timestamp
+        cls._hashes[message_id] = (fingerprint,now)
+        cls.stats['edited'] += 1
+        await cls.database.db__message_render.update_one(
+            {'_id':message_id},
+            {'$set':{
+                'hash':fingerprint,
+                'timestamp':now
+                }
+            },
+            upsert=True
+            )
+
+    @classmethod
+    async def invalidate(cls,*message_ids:int):
+        await cls._load()
+        ids = [m for m in message_ids if m in cls._hashes]
+        if len(ids) == 0:
+            return
+        for m in ids:
+            del cls._hashes[m]
+        await cls.database.db__message_render.delete_many({'_id':{'$in':ids}})
@@ -0,0 +1,236 @@
+import discord
+import asyncio
+import pendulum
+import logging
+
+from typing import *
+from collections import defaultdict
+
+from pymongo import UpdateOne
+from redbot.core.utils import chat_formatting as chat
+
+from ..client.global_client import GlobalClient
+from ..coc_objects.clans.clan import BasicClan
+
+from .clan_link import ClanGuildLink
+from .member import aMember
+
+LOG = logging.getLogger("coc.main")
+
+class _MemberRoles(NamedTuple):
+    member:discord.Member
+    add:List[discord.Role]
+    remove:List[discord.Role]
+
+##################################################
+#####
+##### GUILD ROLE RECONCILER
+#####
+##################################################
+class GuildRoleReconciler(GlobalClient):
+    """
+    Syncs clan roles for every member of a guild in one pass.
+
+    Guild links, linked accounts and saved roles are each loaded with a single query. Desired roles are computed in memory, and only members whose roles differ are edited. Role edits are sent in rate-limited batches.
+
+    Produces the same roles as `aMember.sync_clan_roles`.
+    """
+    # Assassins guild: global alliance Member Role
+    global_member_guild = 1132581106571550831
+    global_member_role = 1139855695068540979
+
+    def __init__(self,
+        guild:discord.Guild,
+        batch_size:int=5,
+        batch_interval:float=1.0,
+        query_chunk:int=1000):
+
+        self.guild = guild
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.query_chunk = query_chunk
+
+        self.links:List[ClanGuildLink] = []
+        self.clans:Dict[str,BasicClan] = {}
+
+        self.stats = {
+            'members': 0,
+            'accounts': 0,
+            'edited': 0,
+            'added': 0,
+            'removed': 0,
+            'saved': 0
+            }
+
+    async def _load_links(self):
+        self.links = await ClanGuildLink.get_for_guild(self.guild.id)
+        await BasicClan.load_many([link.tag for link in self.links])
+        for link in self.links:
+            if link.tag not in self.clans:
+                self.clans[link.tag] = await link.clan
+
+    async def _load_home_clans(self,user_ids:List[int]) -> Dict[int,Set[str]]:
+        home_clans = defaultdict(set)
+        for i in range(0,len(user_ids),self.query_chunk):
+            query = self.database.db__player.find(
+                {
+                    'discord_user':{'$in':user_ids[i:i+self.query_chunk]},
+                    'is_member':True
+                    },
+                {'_id':1,'discord_user':1,'home_clan':1}
+                )
+            async for db in query:
+                self.stats['accounts'] += 1
+                if db.get('home_clan',None):
+                    home_clans[db['discord_user']].add(db['home_clan'])
+        return home_clans
+
+    async def _load_saved_roles(self) -> Dict[int,Set[str]]:
+        query = self.database.db__discord_member.find(
+            {'guild_id':self.guild.id},
+            {'user_id':1,'roles':1}
+            )
+        return {db['user_id']:set(db.get('roles',[])) async for db in query if db.get('user_id',None)}
+
+    ##################################################
+    ### DESIRED ROLES
+    ##################################################
+    def _member_roles(self,
+        member:discord.Member,
+        home_clans:Set[str],
+        global_scope:Set[str]) -> _MemberRoles:
+
+        add = set()
+        remove = set()
+
+        if self.guild.id == self.global_member_guild:
+            clan_member_role = self.guild.get_role(self.global_member_role)
+            if clan_member_role:
+                if len(home_clans.intersection(global_scope)) > 0:
+                    add.add(clan_member_role)
+                else:
+                    remove.add(clan_member_role)
+
+        for link in self.links:
+            clan = self.clans[link.tag]
+            if clan.tag in home_clans:
+                is_elder = False
+                is_coleader = False
+
+                if member.id == clan.leader or member.id in clan.coleaders:
+                    is_elder = True
+                    is_coleader = True
+                elif member.id in clan.elders:
+                    is_elder = True
+
+                if link.member_role:
+                    add.add(link.member_role)
+                if link.elder_role:
+                    (add if is_elder else remove).add(link.elder_role)
+                if link.coleader_role:
+                    (add if is_coleader else remove).add(link.coleader_role)
+            else:
+                for role in [link.member_role,link.elder_role,link.coleader_role]:
+                    if role:
+                        remove.add(role)
+
+        # a role granted by one link is never removed by another
+        remove = remove - add
+        return _MemberRoles(
+            member=member,
+            add=[r for r in add if r not in member.roles and r.is_assignable()],
+            remove=[r for r in remove if r in member.roles and r.is_assignable()]
+            )
+
+    ##################################################
+    ### APPLY
+    ##################################################
+    async def _apply(self,edit:_MemberRoles) -> Set[discord.Role]:
+        member = edit.member
+        roles = set(member.roles)
+        reason = "Clan Role Sync: system from background sync job"
+
+        async with aMember._role_lock[member.id]:
+            if len(edit.add) > 0:
+                try:
+                    await member.add_roles(*edit.add,reason=reason)
+                except discord.Forbidden:
+                    pass
+                except Exception:
+                    LOG.exception(f"Error adding roles to {member.name} {member.id}.")
+                else:
+                    roles.update(edit.add)
+                    self.stats['added'] += len(edit.add)
+                    LOG.info(
+                        f"[{self.guild.name} {self.guild.id}] [{member.name} {member.id}] Roles Added: {chat.humanize_list([r.name for r in edit.add])}. "
+                        + f"Initiated by system from background sync job."
+                        )
+
+            if len(edit.remove) > 0:
+                try:
+                    await member.remove_roles(*edit.remove,reason=reason)
+                except discord.Forbidden:
+                    pass
+                except Exception:
+                    LOG.exception(f"Error removing roles from {member.name} {member.id}.")
+                else:
+                    roles.difference_update(edit.remove)
+                    self.stats['removed'] += len(edit.remove)
+                    LOG.info(
+                        f"[{self.guild.name} {self.guild.id}] [{member.name} {member.id}] Roles Removed: {chat.humanize_list([r.name for r in edit.remove])}. "
+                        + f"Initiated by system from background sync job."
+                        )
+        return roles
+
+    async def run(self) -> dict:
+        """
+        Reconciles clan roles for all members of the guild. Returns reconciliation stats.
+        """
+        await aMember._refresh_scopes()
+        await self._load_links()
+
+        members = [m for m in self.guild.members if not m.bot]
+        self.stats['members'] = len(members)
+
+        home_clans = await self._load_home_clans([m.id for m in members])
+        saved_roles = await self._load_saved_roles()
+        global_scope = set(aMember._master_scope.get('global',[]))
+
+        member_roles = {m.id:set(m.roles) for m in members}
+        edits = []
+        for member in members:
+            edit = self._member_roles(member,home_clans.get(member.id,set()),global_scope)
+            if len(edit.add) > 0 or len(edit.remove) > 0:
+                edits.append(edit)
+
+        for i in range(0,len(edits),self.batch_size):
+            batch = edits[i:i+self.batch_size]
+            results = await asyncio.gather(*[self._apply(edit) for edit in batch])
+            for edit,roles in zip(batch,results):
+                member_roles[edit.member.id] = roles
+            self.stats['edited'] += len(batch)
+            if i + self.batch_size < len(edits):
+                await asyncio.sleep(self.batch_interval)
+
+        now = pendulum.now().int_timestamp
+        edited = set([edit.member.id for edit in edits])
+        writes = []
+        for member in members:
+            roles = [str(r.id) for r in member_roles[member.id] if r.is_assignable()]
+            update = {}
+            if set(roles) != saved_roles.get(member.id,None):
+                update.update({
+                    'user_id':member.id,
+                    'guild_id':self.guild.id,
+                    'roles':roles,
+                    'last_role_save':now
+                    })
+            if member.id in edited:
+                update['last_role_sync'] = now
+            if len(update) > 0:
+                writes.append(UpdateOne({'_id':{'guild':self.guild.id,'user':member.id}},{'$set':update},upsert=True))
+
+        if len(writes) > 0:
+            await self.database.db__discord_member.bulk_write(writes,ordered=False)
+        self.stats['saved'] = len(writes)
+        return self.stats
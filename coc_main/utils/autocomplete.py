@@ -1,5 +1,6 @@
 import discord
 import random
+import re
 import logging
 
 from typing import *
@@ -10,9 +11,13 @@ from redbot.core.utils import AsyncIter
 from ..client.global_client import GlobalClient
 
 from ..coc_objects.season.season import aClashSeason
+from ..coc_objects.players.player import BasicPlayer
+from ..coc_objects.clans.clan import BasicClan
 from ..discord.clan_link import ClanGuildLink
 from ..discord.member import aMember
 
+from .prefix_index import normalize_key
+
 LOG = logging.getLogger("coc.main")
 
 async def autocomplete_seasons(interaction:discord.Interaction,current:str):
@@ -42,16 +47,38 @@ async def autocomplete_seasons(interaction:discord.Interaction,current:str):
 ##### CLAN AUTOCOMPLETES
 #####
 ####################################################################################################
+def _clan_choice(tag:str,name:str):
+    return app_commands.Choice(
+        name=f"{name} | {tag}",
+        value=tag
+        )
+
+def _search_clans(current:str):
+    key = normalize_key(current)
+    def _rank(tag:str,clan:dict):
+        return (
+            not clan.get('is_alliance_clan',False),
+            not clan.get('abbreviation',''),
+            normalize_key(clan.get('name','')) != key,
+            clan.get('name','')
+            )
+    results = BasicClan.search_index.search(current,limit=8,rank=_rank)
+    return [_clan_choice(tag,clan.get('name','')) for tag,clan in results]
+
 async def autocomplete_clans(interaction:discord.Interaction,current:str):    
     try:
+        if current and BasicClan.search_index.ready:
+            return _search_clans(current)
+
         if not current:
             clan_tags = [db.tag for db in await ClanGuildLink.get_for_guild(interaction.guild.id)]            
             q_doc = {'_id':{'$in':clan_tags}}
         else:
+            prefix = re.escape(current)
             q_doc = {'$or':[
-                {'tag':{'$regex':f'^{current}',"$options":"i"}},
-                {'name':{'$regex':f'^{current}',"$options":"i"}},
-                {'abbreviation':{'$regex':f'^{current}',"$options":"i"}}
+                {'tag':{'$regex':f'^{prefix}',"$options":"i"}},
+                {'name':{'$regex':f'^{prefix}',"$options":"i"}},
+                {'abbreviation':{'$regex':f'^{prefix}',"$options":"i"}}
                 ]
                 }
         pipeline = [
@@ -59,12 +86,7 @@ async def autocomplete_clans(interaction:discord.Interaction,current:str):
             {'$sample': {'size': 8}}
             ]
         query = GlobalClient.database.db__clan.aggregate(pipeline)
-        return [
-            app_commands.Choice(
-                name=f"{c.get('name','')} | {c['_id']}",
-                value=c['_id'])
-            async for c in query
-            ]
+        return [_clan_choice(c['_id'],c.get('name','')) async for c in query]
     except Exception:
         LOG.exception("Error in autocomplete_clans")
 
@@ -97,12 +119,46 @@ async def autocomplete_clans_coleader(interaction:discord.Interaction,current:st
 ##### PLAYER AUTOCOMPLETES
 #####
 ####################################################################################################
+def _player_choice(tag:str,name:str,townhall:int):
+    return app_commands.Choice(
+        name=f"{name} | TH{townhall} | {tag}",
+        value=tag
+        )
+
+def _search_players(interaction:discord.Interaction,current:str,members_only:bool=False):
+    index = BasicPlayer.search_index
+    own_accounts = [tag for tag,p in index.group(interaction.user.id)]
+    where = (lambda tag,p: p.get('is_member',False)) if members_only else None
+
+    if not current:
+        results = [(tag,index.get(tag)) for tag in own_accounts]
+        if where:
+            results = [r for r in results if where(*r)]
+        results.sort(key=lambda r: (not r[1].get('is_member',False),-r[1].get('townhall',1),r[1].get('name','')))
+        results = results[:8]
+    else:
+        key = normalize_key(current)
+        def _rank(tag:str,player:dict):
+            return (
+                player.get('discord_user',0) != interaction.user.id,
+                not player.get('is_member',False),
+                normalize_key(player.get('name','')) != key,
+                player.get('name','')
+                )
+        results = index.search(current,limit=8,rank=_rank,where=where,priority=own_accounts)
+
+    return [_player_choice(tag,p.get('name',''),p.get('townhall',1)) for tag,p in results]
+
 async def autocomplete_players(interaction:discord.Interaction,current:str):
     try:
+        if BasicPlayer.search_index.ready:
+            return _search_players(interaction,current)
+
         if current:
+            prefix = re.escape(current)
             q_doc = {'$or':[
-                {'tag':{'$regex':f'^{current}',"$options":"i"}},
-                {'name':{'$regex':f'^{current}',"$options":"i"}}
+                {'tag':{'$regex':f'^{prefix}',"$options":"i"}},
+                {'name':{'$regex':f'^{prefix}',"$options":"i"}}
                 ]
                 }
         else:
@@ -113,24 +169,22 @@ async def autocomplete_players(interaction:discord.Interaction,current:str):
             {'$sample': {'size': 8}}
             ]
         query = GlobalClient.database.db__player.aggregate(pipeline)
-        return [
-            app_commands.Choice(
-                name=f"{p.get('name','')} | TH{p.get('townhall',1)} | {p['_id']}",
-                value=p['_id']
-                )
-            async for p in query
-            ]
+        return [_player_choice(p['_id'],p.get('name',''),p.get('townhall',1)) async for p in query]
     except Exception:
         LOG.exception("Error in autocomplete_players")
 
 async def autocomplete_players_members_only(interaction:discord.Interaction,current:str):
     try:
+        if BasicPlayer.search_index.ready:
+            return _search_players(interaction,current,members_only=True)
+
         if current:
+            prefix = re.escape(current)
             q_doc = {
                 'is_member':True,
                 '$or':[
-                    {'tag':{'$regex':f'^{current}',"$options":"i"}},
-                    {'name':{'$regex':f'^{current}',"$options":"i"}}
+                    {'tag':{'$regex':f'^{prefix}',"$options":"i"}},
+                    {'name':{'$regex':f'^{prefix}',"$options":"i"}}
                     ]
                 }
         else:
@@ -141,12 +195,6 @@ async def autocomplete_players_members_only(interaction:discord.Interaction,curr
             {'$sample': {'size': 8}}
             ]
         query = GlobalClient.database.db__player.aggregate(pipeline)
-        return [
-            app_commands.Choice(
-                name=f"{p.get('name','')} | TH{p.get('townhall',1)} | {p['_id']}",
-                value=p['_id']
-                )
-            async for p in query
-            ]
+        return [_player_choice(p['_id'],p.get('name',''),p.get('townhall',1)) async for p in query]
     except Exception:
-        LOG.exception("Error in autocomplete_players_members_only")
\ No newline at end of file
+        LOG.exception("Error in autocomplete_players_members_only")
@@ -0,0 +1,328 @@
+import asyncio
+import time
+import weakref
+
+from typing import *
+from collections import OrderedDict
+
+class AttributeCache():
+    """
+    A bounded LRU cache with an idle TTL, used to back the attribute singletons.
+
+    Entries are kept in access order, so the oldest entry is always at the front. Entries are evicted when the cache exceeds `max_size`, or when they have not been accessed for `ttl` seconds.
+
+    Any lock dictionaries passed in are cleaned up on eviction. Entries whose locks are held are never evicted.
+
+    Eviction only drops the cache's own reference. Every value is also held weakly, and `get` returns an evicted value for as long as anything else still references it, so there is never more than one live singleton per key.
+    """
+    __slots__ = [
+        'name',
+        'max_size',
+        'ttl',
+        '_data',
+        '_refs',
+        '_locks',
+        'hits',
+        'misses',
+        'revived',
+        'evictions',
+        'expirations'
+        ]
+
+    def __init__(self,name:str,max_size:int,ttl:int,locks:Optional[List[Dict[str,asyncio.Lock]]]=None):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._data = OrderedDict()
+        self._refs = weakref.WeakValueDictionary()
+        self._locks = locks or []
+
+        self.hits = 0
+        self.misses = 0
+        self.revived = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self,key:str):
+        return key in self._data
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'revived': self.revived,
+            'referenced': len(self._refs),
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'locks': sum(len(l) for l in self._locks)
+            }
+
+    def _is_busy(self,key:str) -> bool:
+        return any(key in l and l[key].locked() for l in self._locks)
+
+    def _evict(self,key:str):
+        self._data.pop(key,None)
+        for l in self._locks:
+            lock = l.get(key)
+            if lock and not lock.locked():
+                del l[key]
+
+    def _purge_expired(self,now:float):
+        if not self.ttl:
+            return
+        expired = []
+        for key,(_,ts) in self._data.items():
+            if now - ts <= self.ttl:
+                break
+            if not self._is_busy(key):
+                expired.append(key)
+        for key in expired:
+            self._evict(key)
+            self.expirations += 1
+
+    def _trim(self):
+        excess = len(self._data) - self.max_size
+        if excess <= 0:
+            return
+        evict = []
+        for key in self._data:
+            if excess <= 0:
+                break
+            if self._is_busy(key):
+                continue
+            evict.append(key)
+            excess -= 1
+        for key in evict:
+            self._evict(key)
+            self.evictions += 1
+
+    def get(self,key:str) -> Optional[Any]:
+        now = time.monotonic()
+        entry = self._data.get(key)
+        if entry is None:
+            value = self._refs.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            # evicted, but still held elsewhere: put the same instance back
+            self.revived += 1
+            self.set(key,value)
+            return value
+
+        value,ts = entry
+        if self.ttl and now - ts > self.ttl and not self._is_busy(key):
+            self._evict(key)
+            self.expirations += 1
+            # drop our own references, so that only instances held elsewhere are revived
+            del entry,value
+            return self.get(key)
+
+        self._data[key] = (value,now)
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self,key:str,value:Any):
+        now = time.monotonic()
+        self._data[key] = (value,now)
+        self._data.move_to_end(key)
+        self._refs[key] = value
+        self._purge_expired(now)
+        self._trim()
+
+    def clear(self) -> int:
+        keys = [k for k in self._data if not self._is_busy(k)]
+        for key in keys:
+            self._evict(key)
+        return len(keys)
+
+class SnapshotCache():
+    """
+    A bounded cache of recently fetched API objects, keyed by tag.
+
+    Callers decide how stale a snapshot may be with `max_age`. Concurrent fetches of the same key are coalesced into a single request.
+    """
+    __slots__ = [
+        'name',
+        'max_size',
+        '_data',
+        '_inflight',
+        'hits',
+        'misses',
+        'coalesced',
+        'evictions'
+        ]
+
+    def __init__(self,name:str,max_size:int):
+        self.name = name
+        self.max_size = max_size
+
+        self._data = OrderedDict()
+        self._inflight = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.coalesced + self.misses
+        return (self.hits + self.coalesced) / total if total > 0 else 0.0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'hit_rate': self.hit_rate,
+            'evictions': self.evictions,
+            'inflight': len(self._inflight)
+            }
+
+    def get(self,key:str,max_age:float) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value,ts = entry
+        if time.monotonic() - ts > max_age:
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self,key:str,value:Any):
+        self._data[key] = (value,time.monotonic())
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self,key:str):
+        self._data.pop(key,None)
+
+    def clear(self) -> int:
+        count = len(self._data)
+        self._data.clear()
+        return count
+
+    async def fetch(self,key:str,coro_func:Callable[[],Awaitable[Any]],max_age:float=0) -> Any:
+        """
+        Returns a cached value no older than `max_age` seconds, or awaits `coro_func` to fetch a new one.
+
+        If a fetch for the same key is already in progress, waits on that instead.
+        """
+        if max_age > 0:
+            value = self.get(key,max_age)
+            if value is not None:
+                self.hits += 1
+                return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        async def _fetch():
+            try:
+                value = await coro_func()
+                if value is not None:
+                    self.set(key,value)
+                return value
+            finally:
+                self._inflight.pop(key,None)
+
+        task = asyncio.ensure_future(_fetch())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+class SyncIndex():
+    """
+    An in-memory index of when each tag was last synced, so that recently synced tags can be skipped without reading the database.
+
+    Only syncs within `max_age` seconds matter, so the index is warmed from a single query for recent syncs, and older entries are dropped as they're checked.
+
+    Until warmed, the index is not `ready` and never reports a tag as fresh.
+    """
+    __slots__ = [
+        'name',
+        'max_age',
+        'ready',
+        '_last_sync',
+        'checks',
+        'skips'
+        ]
+
+    def __init__(self,name:str,max_age:int=3600):
+        self.name = name
+        self.max_age = max_age
+        self.ready = False
+
+        self._last_sync:Dict[str,int] = {}
+
+        self.checks = 0
+        self.skips = 0
+
+    def __len__(self):
+        return len(self._last_sync)
+
+    @property
+    def skip_rate(self) -> float:
+        return self.skips / self.checks if self.checks > 0 else 0.0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'ready': self.ready,
+            'size': len(self._last_sync),
+            'checks': self.checks,
+            'skips': self.skips,
+            'skip_rate': self.skip_rate
+            }
+
+    def set(self,key:str,timestamp:int):
+        if timestamp > self._last_sync.get(key,0):
+            self._last_sync[key] = timestamp
+
+    def is_fresh(self,key:str) -> bool:
+        if not self.ready:
+            return False
+        self.checks += 1
+        ts = self._last_sync.get(key)
+        if ts is None:
+            return False
+        if time.time() - ts <= self.max_age:
+            self.skips += 1
+            return True
+        del self._last_sync[key]
+        return False
+
+    async def warm(self,rows:AsyncIterator[Tuple[str,int]]):
+        count = 0
+        async for key,timestamp in rows:
+            self.set(key,timestamp)
+            count += 1
+            if count % 10000 == 0:
+                await asyncio.sleep(0)
+        self.ready = True
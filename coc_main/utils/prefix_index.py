@@ -0,0 +1,216 @@
+import asyncio
+import bisect
+import time
+
+from typing import *
+from collections import defaultdict
+
+def normalize_key(value:Optional[str]) -> str:
+    """
+    Normalizes a tag, name or abbreviation for prefix matching: casefolded, without surrounding whitespace or a leading `#`.
+    """
+    if not value:
+        return ""
+    return str(value).strip().lstrip('#').casefold()
+
+class PrefixIndex():
+    """
+    An in-memory prefix index, used for autocomplete.
+
+    Keys from each entry's `key_fields` are normalized and kept in one sorted array of (key, id) pairs, so a prefix lookup is a binary search followed by a short scan. Entries hold a small set of display attributes alongside their keys.
+
+    If a `group_field` is given, entries are also grouped by that attribute (e.g. all accounts linked to a Discord user).
+
+    The index is empty until `build()` completes. Callers should fall back to the database until `ready` is set.
+    """
+    __slots__ = [
+        'name',
+        'key_fields',
+        'group_field',
+        'ready',
+        'built_in',
+        '_entries',
+        '_keys',
+        '_sorted',
+        '_groups',
+        'lookups'
+        ]
+
+    def __init__(self,name:str,key_fields:List[str],group_field:Optional[str]=None):
+        self.name = name
+        self.key_fields = key_fields
+        self.group_field = group_field
+        self.ready = False
+        self.built_in = 0.0
+
+        self._entries:Dict[str,dict] = {}
+        self._keys:Dict[str,Tuple[str,...]] = {}
+        self._sorted:List[Tuple[str,str]] = []
+        self._groups:Dict[Any,Set[str]] = defaultdict(set)
+
+        self.lookups = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self,entry_id:str):
+        return entry_id in self._entries
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'ready': self.ready,
+            'entries': len(self._entries),
+            'keys': len(self._sorted),
+            'built_in': self.built_in,
+            'lookups': self.lookups
+            }
+
+    def _entry_keys(self,entry_id:str,entry:dict) -> Tuple[str,...]:
+        keys = set([normalize_key(entry_id)])
+        for field in self.key_fields:
+            key = normalize_key(entry.get(field,None))
+            if key:
+                keys.add(key)
+        return tuple(keys)
+
+    def _group_remove(self,entry_id:str,entry:dict):
+        if not self.group_field:
+            return
+        value = entry.get(self.group_field,None)
+        group = self._groups.get(value)
+        if group is not None:
+            group.discard(entry_id)
+            if len(group) == 0:
+                del self._groups[value]
+
+    def _group_add(self,entry_id:str,entry:dict):
+        if not self.group_field:
+            return
+        value = entry.get(self.group_field,None)
+        if value:
+            self._groups[value].add(entry_id)
+
+    ##################################################
+    ##### UPDATES
+    ##################################################
+    def upsert(self,entry_id:str,**attributes):
+        """
+        Adds an entry, or updates attributes on an existing one. Keys are only re-indexed if a key field changed.
+        """
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            entry = self._entries[entry_id] = {}
+        else:
+            self._group_remove(entry_id,entry)
+
+        entry.update(attributes)
+        self._group_add(entry_id,entry)
+
+        keys = self._entry_keys(entry_id,entry)
+        old_keys = self._keys.get(entry_id,())
+        if set(keys) == set(old_keys):
+            return
+
+        for key in old_keys:
+            i = bisect.bisect_left(self._sorted,(key,entry_id))
+            if i < len(self._sorted) and self._sorted[i] == (key,entry_id):
+                del self._sorted[i]
+        for key in keys:
+            bisect.insort(self._sorted,(key,entry_id))
+        self._keys[entry_id] = keys
+
+    def remove(self,entry_id:str):
+        entry = self._entries.pop(entry_id,None)
+        if entry is None:
+            return
+        self._group_remove(entry_id,entry)
+        for key in self._keys.pop(entry_id,()):
+            i = bisect.bisect_left(self._sorted,(key,entry_id))
+            if i < len(self._sorted) and self._sorted[i] == (key,entry_id):
+                del self._sorted[i]
+
+    async def build(self,rows:AsyncIterator[Tuple[str,dict]]):
+        """
+        Rebuilds the index from `(id, attributes)` rows. The sorted array is built once, at the end.
+        """
+        start = time.perf_counter()
+        entries = {}
+        count = 0
+        async for entry_id,attributes in rows:
+            entries[entry_id] = attributes
+            count += 1
+            if count % 10000 == 0:
+                await asyncio.sleep(0)
+
+        # updates made while building take precedence over the loaded rows
+        for entry_id,entry in self._entries.items():
+            entries[entry_id] = {**entries.get(entry_id,{}),**entry}
+
+        keys = {entry_id:self._entry_keys(entry_id,entry) for entry_id,entry in entries.items()}
+        pairs = [(key,entry_id) for entry_id,entry_keys in keys.items() for key in entry_keys]
+        pairs.sort()
+
+        groups = defaultdict(set)
+        if self.group_field:
+            for entry_id,entry in entries.items():
+                value = entry.get(self.group_field,None)
+                if value:
+                    groups[value].add(entry_id)
+
+        self._entries = entries
+        self._keys = keys
+        self._sorted = pairs
+        self._groups = groups
+        self.ready = True
+        self.built_in = time.perf_counter() - start
+
+    ##################################################
+    ##### LOOKUPS
+    ##################################################
+    def get(self,entry_id:str) -> Optional[dict]:
+        return self._entries.get(entry_id)
+
+    def group(self,value:Any) -> List[Tuple[str,dict]]:
+        return [(entry_id,self._entries[entry_id]) for entry_id in self._groups.get(value,set())]
+
+    def search(self,
+        prefix:str,
+        limit:int=8,
+        rank:Optional[Callable[[str,dict],Any]]=None,
+        where:Optional[Callable[[str,dict],bool]]=None,
+        priority:Optional[Iterable[str]]=None,
+        scan_limit:int=2000) -> List[Tuple[str,dict]]:
+        """
+        Returns up to `limit` entries with a key starting with `prefix`, sorted by `rank`.
+
+        At most `scan_limit` matching entries are ranked. Entries in `priority` that match are always considered, even if they fall outside the scanned range.
+        """
+        self.lookups += 1
+        prefix = normalize_key(prefix)
+
+        matches = {}
+        for entry_id in priority or []:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                continue
+            if any(key.startswith(prefix) for key in self._keys.get(entry_id,())):
+                if where is None or where(entry_id,entry):
+                    matches[entry_id] = entry
+
+        i = bisect.bisect_left(self._sorted,(prefix,''))
+        scanned = 0
+        while i < len(self._sorted) and scanned < scan_limit:
+            key,entry_id = self._sorted[i]
+            if not key.startswith(prefix):
+                break
+            i += 1
+            if entry_id in matches:
+                continue
+            entry = self._entries[entry_id]
+            if where is None or where(entry_id,entry):
+                matches[entry_id] = entry
+                scanned += 1
+
+        ranked = sorted(matches.items(),key=lambda m: rank(*m)) if rank else list(matches.items())
+        return ranked[:limit]
@@ -4,6 +4,7 @@ import unicodedata
 import asyncio
 
 from typing import *
+from collections import defaultdict
 from redbot.core.bot import Red
 
 async def convert_seconds_to_str(seconds):
@@ -35,26 +36,91 @@ def check_rtl(text:str):
     else:
         return False
 
-async def get_bot_webhook(bot:Red,channel):
+##################################################
+#####
+##### BOT WEBHOOKS
+#####
+##################################################
+# Webhooks are cached per parent channel. A cached webhook is dropped when Discord reports it as unknown.
+_webhooks:Dict[int,discord.Webhook] = {}
+_webhook_locks = defaultdict(asyncio.Lock)
+_avatar:Dict[str,bytes] = {}
+_http_session:Optional[aiohttp.ClientSession] = None
+
+def get_http_session() -> aiohttp.ClientSession:
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession()
+    return _http_session
+
+async def close_http_session():
+    global _http_session
+    if _http_session and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+async def _get_bot_avatar(bot:Red) -> Optional[bytes]:
+    url = str(bot.user.display_avatar.url)
+    if url not in _avatar:
+        async with get_http_session().get(url) as resp:
+            if resp.status != 200:
+                return None
+            _avatar.clear()
+            _avatar[url] = await resp.read()
+    return _avatar[url]
+
+def _webhook_channel(channel):
     if isinstance(channel,discord.Thread):
-        channel = channel.parent
-    else:
-        channel = channel
+        return channel.parent
+    return channel
+
+def invalidate_bot_webhook(channel):
+    channel = _webhook_channel(channel)
+    _webhooks.pop(channel.id,None)
+
+async def get_bot_webhook(bot:Red,channel):
+    channel = _webhook_channel(channel)
+    if channel.id in _webhooks:
+        return _webhooks[channel.id]
     
-    channel_webhooks = await channel.webhooks()
-    bot_webhook = [webhook for webhook in channel_webhooks if webhook.user == bot.user]
+    async with _webhook_locks[channel.id]:
+        if channel.id in _webhooks:
+            return _webhooks[channel.id]
+        
+        channel_webhooks = await channel.webhooks()
+        bot_webhook = [webhook for webhook in channel_webhooks if webhook.user == bot.user]
+        
+        if len(bot_webhook) > 0:
+            webhook = bot_webhook[0]
+        else:
+            data = await _get_bot_avatar(bot)
+            if not data:
+                return None
+            webhook = await channel.create_webhook(
+                name=f"{bot.user.name} Webhook",
+                avatar=data,
+                reason=f"Webhook for {bot.user.name}."
+                )
+        _webhooks[channel.id] = webhook
+    return webhook
+
+async def send_bot_webhook(bot:Red,channel,**kwargs) -> Optional[discord.WebhookMessage]:
+    """
+    Sends a message to a channel or thread through the bot's webhook.
+
+    If the cached webhook was deleted, it is dropped from the cache and the send is retried once with a fresh webhook.
+    """
+    if isinstance(channel,discord.Thread):
+        kwargs['thread'] = channel
     
-    if len(bot_webhook) > 0:
-        webhook = bot_webhook[0]
-    else:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(bot.user.display_avatar.url) as resp:
-                if resp.status != 200:
-                    return None
-                data = await resp.read()
-        webhook = await channel.create_webhook(
-            name=f"{bot.user.name} Webhook",
-            avatar=data,
-            reason=f"Webhook for {bot.user.name}."
-            )
-    return webhook
\ No newline at end of file
+    for attempt in range(2):
+        webhook = await get_bot_webhook(bot,channel)
+        if not webhook:
+            return None
+        try:
+            return await webhook.send(**kwargs)
+        except discord.NotFound as exc:
+            # 10015: Unknown Webhook
+            if exc.code != 10015 or attempt > 0:
+                raise
+            invalidate_bot_webhook(channel)
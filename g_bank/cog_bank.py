@@ -1184,6 +1184,39 @@ class Bank(commands.Cog,GlobalClient):
         await self.month_end_sweep()
         await msg.edit(content="Month-End Sweep Complete.")
     
+    ############################################################
+    #####
+    ##### COMMAND: BANK ADMIN AUDIT
+    #####
+    ############################################################
+    @cmdgroup_bank_admin.command(name="audit")
+    @commands.guild_only()
+    @commands.is_owner()
+    async def subcmd_bank_admin_audit(self,ctx:commands.Context):
+        """
+        Rebuilds all Account Balances from the last Ledger Checkpoint.
+        """
+        msg = await ctx.reply("Auditing account balances...")
+
+        accounts = [self.current_account,self.sweep_account,self.reserve_account]
+        alliance_clans = await self.coc_client.get_alliance_clans()
+        accounts.extend([await ClanAccount(clan) for clan in alliance_clans])
+
+        drift = {}
+        materialized = []
+        a_iter = AsyncIter(accounts)
+        async for account in a_iter:
+            diff = await account.rebuild_balance()
+            if diff is None:
+                materialized.append(account.id)
+            elif diff != 0:
+                drift[account.id] = diff
+        
+        await msg.edit(content=f"Audited {len(accounts)} accounts. "
+            + (f"Corrected: " + ", ".join([f"`{k}` ({v:+,})" for k,v in drift.items()]) if drift else "No drift found.")
+            + (f" Materialized: " + ", ".join([f"`{k}`" for k in materialized]) if materialized else "")
+            )
+    
     ############################################################
     #####
     ##### COMMAND: BANK ADMIN RUNLEGENDS
@@ -2749,6 +2782,10 @@ class Bank(commands.Cog,GlobalClient):
             user_id=self.bot.user.id,
             comment=f"EOS new funds: {len(query_members)} members."
             )
+
+        checkpoint_accounts = [self.current_account,self.sweep_account,self.reserve_account]
+        checkpoint_accounts.extend([await ClanAccount(clan) for clan in alliance_clans])
+        await bounded_gather(*[account.create_checkpoint() for account in checkpoint_accounts])
     
     ############################################################
     #####
@@ -1,7 +1,11 @@
 import asyncio
+import logging
 import pendulum
 import xlsxwriter
 
+from typing import *
+
+from pymongo import ReturnDocument
 from collections import defaultdict
 from async_property import AwaitLoader
 
@@ -11,6 +15,11 @@ from redbot.core.utils import AsyncIter
 from coc_main.client.global_client import GlobalClient
 from coc_main.coc_objects.clans.clan import aClan
 
+LOG = logging.getLogger("coc.main")
+
+# transactions between ledger checkpoints
+checkpoint_interval = 500
+
 class BankAccount(AwaitLoader,GlobalClient):
     _master_locks = defaultdict(asyncio.Lock)
     _locks = defaultdict(asyncio.Lock)
@@ -30,29 +39,118 @@ class BankAccount(AwaitLoader,GlobalClient):
         return self._locks[self.id]
     
     async def load(self):
-        if self.balance == 0:
+        balance = await self.database.db__bank_balance.find_one({'_id':self.id})
+        if balance:
+            self.balance = balance.get('balance',0)
+        else:
+            await self.rebuild_balance()
+    
+    async def _record_transaction(self,amount:int,user_id:int=None,comment:str=None):
+        # Caller must hold self._lock.
+        ts = pendulum.now().int_timestamp
+        transaction = await self.database.db__bank_transaction.insert_one(
+            {
+                'account': self.id,
+                'amount': amount,
+                'timestamp': ts,
+                'user': user_id if user_id else 99,
+                'comment': comment
+            }
+        )
+        balance = await self.database.db__bank_balance.find_one_and_update(
+            {'_id':self.id},
+            {'$inc': {'balance': amount,'count': 1},
+            '$set': {'last_transaction': transaction.inserted_id,'timestamp': ts}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+            )
+        self.balance = balance['balance']
+
+        if balance['count'] >= checkpoint_interval:
+            await self._create_checkpoint(balance)
+    
+    async def _create_checkpoint(self,balance:dict):
+        if not balance or not balance.get('last_transaction',None):
+            return
+        await self.database.db__bank_checkpoint.insert_one(
+            {
+                'account': self.id,
+                'balance': balance['balance'],
+                'last_transaction': balance['last_transaction'],
+                'timestamp': pendulum.now().int_timestamp
+            }
+        )
+        await self.database.db__bank_balance.update_one(
+            {'_id':self.id},
+            {'$set': {'count': 0}}
+            )
+    
+    async def create_checkpoint(self):
+        async with self._lock:
+            balance = await self.database.db__bank_balance.find_one({'_id':self.id})
+            await self._create_checkpoint(balance)
+    
+    async def rebuild_balance(self) -> Optional[int]:
+        """
+        Audits the stored balance by replaying transactions since the last checkpoint.
+        Returns the difference between the rebuilt and the previously stored balance, or None if no balance was stored before.
+        """
+        async with self._lock:
+            checkpoint = await self.database.db__bank_checkpoint.find_one(
+                {'account': self.id},
+                sort=[('last_transaction',-1)]
+                )
+            match = {'account': self.id,'amount': {'$ne': 0}}
+            if checkpoint:
+                match['_id'] = {'$gt': checkpoint['last_transaction']}
+
             q_pipeline = [
-                {'$match': {'account': self.id,'amount': {'$ne': 0}}},
-                {'$group': {'_id': None, 'total_amount': {'$sum': '$amount'}}}
+                {'$match': match},
+                {'$group': {
+                    '_id': None,
+                    'total_amount': {'$sum': '$amount'},
+                    'count': {'$sum': 1},
+                    'last_transaction': {'$max': '$_id'}
+                    }}
                 ]
-            balance_query = await self.database.db__bank_transaction.aggregate(q_pipeline).to_list(length=None)
-            self.balance = balance_query[0]['total_amount'] if len(balance_query) > 0 else 0
+            replay = await self.database.db__bank_transaction.aggregate(q_pipeline).to_list(length=None)
+            replay = replay[0] if len(replay) > 0 else {}
+
+            new_balance = (checkpoint['balance'] if checkpoint else 0) + replay.get('total_amount',0)
+            last_transaction = replay.get('last_transaction',None) or (checkpoint['last_transaction'] if checkpoint else None)
+
+            stored = await self.database.db__bank_balance.find_one_and_update(
+                {'_id':self.id},
+                {'$set': {
+                    'balance': new_balance,
+                    'count': replay.get('count',0),
+                    'last_transaction': last_transaction,
+                    'timestamp': pendulum.now().int_timestamp
+                    }},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+                )
+            self.balance = new_balance
+
+            if replay.get('count',0) >= checkpoint_interval:
+                balance = await self.database.db__bank_balance.find_one({'_id':self.id})
+                await self._create_checkpoint(balance)
+            
+            if not stored or 'balance' not in stored:
+                LOG.info(f"Bank Account {self.id}: balance materialized at {new_balance:,}.")
+                return None
+
+            drift = new_balance - stored['balance']
+            if drift != 0:
+                LOG.warning(f"Bank Account {self.id}: balance rebuilt with a drift of {drift:,}.")
+            return drift
     
     async def deposit(self,amount:int,user_id:int=None,comment:str=None):
         if self._master_lock.locked():
             async with self._master_lock:
                 await asyncio.sleep(0.1)        
         async with self._lock:
-            await self.database.db__bank_transaction.insert_one(
-                {
-                    'account': self.id,
-                    'amount': amount,
-                    'timestamp': pendulum.now().int_timestamp,
-                    'user': user_id if user_id else 99,
-                    'comment': comment
-                }
-            )
-            self.balance += amount
+            await self._record_transaction(amount,user_id,comment)
 
     async def withdraw(self,amount:int,user_id:int=None,comment:str=None):
         if self._master_lock.locked():
@@ -60,28 +158,11 @@ class BankAccount(AwaitLoader,GlobalClient):
                 await asyncio.sleep(0.1)
 
         async with self._lock:
-            await self.database.db__bank_transaction.insert_one(
-                {
-                    'account': self.id,
-                    'amount': amount * -1,
-                    'timestamp': pendulum.now().int_timestamp,
-                    'user': user_id if user_id else 99,
-                    'comment': comment
-                }
-            )
-            self.balance -= amount
+            await self._record_transaction(amount * -1,user_id,comment)
     
     async def admin_adjust(self,amount:int,user_id:int=None,comment:str=None):
         async with self._lock:
-            await self.database.db__bank_transaction.insert_one(
-                {
-                    'account': self.id,
-                    'amount': amount,
-                    'timestamp': pendulum.now().int_timestamp,
-                    'user': user_id if user_id else 99,
-                    'comment': comment
-                }
-            )            
+            await self._record_transaction(amount,user_id,comment)
     
     async def query_transactions(self):        
         cut_off = pendulum.now().subtract(days=30).int_timestamp
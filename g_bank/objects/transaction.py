@@ -5,4 +5,20 @@
 #     'timestamp': int,
 #     'user': int,
 #     'comment': string
-#     }
\ No newline at end of file
+#     }
+
+# db__bank_balance = {
+#     '_id': string, # account id
+#     'balance': int,
+#     'count': int, # transactions since last checkpoint
+#     'last_transaction': ObjectId,
+#     'timestamp': int
+#     }
+
+# db__bank_checkpoint = {
+#     '_id': ObjectId,
+#     'account': string,
+#     'balance': int,
+#     'last_transaction': ObjectId,
+#     'timestamp': int
+#     }
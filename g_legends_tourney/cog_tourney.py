@@ -22,6 +22,7 @@ from coc_main.coc_objects.season.season import aClashSeason
 from coc_main.coc_objects.players.player import BasicPlayer, aPlayer
 from coc_main.coc_objects.players.player_activity import aPlayerActivity
 from coc_main.discord.add_delete_link import AddLinkMenu
+from coc_main.discord.render_cache import MessageRenderCache
 from coc_main.utils.components import clash_embed, DefaultView, DiscordButton, DiscordSelectMenu, DiscordModal
 from coc_main.utils.constants.ui_emojis import EmojisUI
 from coc_main.utils.constants.coc_emojis import EmojisTownHall, EmojisLeagues
@@ -383,9 +384,14 @@ class LegendsTourney(commands.Cog,GlobalClient):
                 async for i,embed in e_iter.enumerate(start=1):
                     message = await self.lb_channel.send(embed=embed)
                     new_msg.append(message.id)
+                    await MessageRenderCache.record(message.id,MessageRenderCache.fingerprint(embeds=[embed],ignore_timestamps=True))
             else:
                 e_iter = AsyncIter(embeds)
                 async for i,embed in e_iter.enumerate(start=1):
+                    fingerprint = MessageRenderCache.fingerprint(embeds=[embed],ignore_timestamps=True)
+                    if i <= len(messages) and await MessageRenderCache.is_current(messages[i-1],fingerprint):
+                        new_msg.append(messages[i-1])
+                        continue
                     try:
                         message = await self.lb_channel.fetch_message(messages[i-1])
                     except discord.NotFound:
@@ -397,6 +403,7 @@ class LegendsTourney(commands.Cog,GlobalClient):
                     else:
                         await message.edit(embed=embed)
                         new_msg.append(message.id)
+                    await MessageRenderCache.record(message.id,fingerprint)
                 
                 extra_msgs = [m for m in messages if m not in new_msg]
                 m_iter = AsyncIter(extra_msgs)